@@ -1,23 +1,82 @@
 import tkinter as tk
-from tkinter import ttk, messagebox
-from database import Database
+from tkinter import ttk, messagebox, filedialog
+from database import Database, CAR_SORT_COLUMNS
+from importer import import_cars
+from export import export
+from widgets import VirtualTable, ListSource, IteratorSource, IndexedSource
+from inventory import InventorySnapshot, HAVE_NUMPY
+from matcher import RequestMatcher
+from worker import BackgroundExecutor
+from screen_timing import ScreenTimer
 from datetime import datetime
+import os
 import re
 
 class CarDealershipApp:
+    # Сколько строк загружать за один запрос при прокрутке таблиц
+    PAGE_SIZE = 200
+
     def __init__(self, root):
         self.root = root
         self.root.title("AutoTradeCenter - Система управления")
         self.root.geometry("1200x700")
         
         self.db = Database()
+        # Все запросы к БД выполняются в рабочих потоках, окно не зависает
+        self.executor = BackgroundExecutor(self.root)
+        # Снимок автомобилей для фильтрации без запросов к БД (если установлен numpy)
+        self.inventory = InventorySnapshot(self.db) if HAVE_NUMPY else None
+        # Подбор свободных автомобилей под открытые заявки
+        self.matcher = RequestMatcher(self.db)
         self.current_user = None
         self.user_role = None
+        # Замеры переходов по экранам: запросы, форматирование и заполнение таблиц
+        self.screen_timer = ScreenTimer()
+        self.screen_timer.instrument(self, exclude=('show_write_result',))
+        VirtualTable.render_listener = self.screen_timer.record_render
         
         self.show_login_screen()
     
+    def run_in_background(self, func, *args, on_done=None, parent=None, screen_bound=True,
+                          loading_text="Загрузка...", **kwargs):
+        """Выполнить вызов БД в рабочем потоке и передать результат в on_done.
+        
+        Пока запрос выполняется, в parent (по умолчанию главное окно) показывается
+        индикатор загрузки. Результаты запросов экрана, с которого пользователь
+        уже ушел, отбрасываются (screen_bound=True).
+        """
+        parent = parent or self.root
+        loading = ttk.Label(parent, text=loading_text, foreground='gray')
+        loading.place(relx=0.5, rely=0.5, anchor='center')
+        # Запрос, запущенный при переходе на экран, входит в его замер
+        navigation, func = self.screen_timer.track(func)
+        
+        def finish():
+            if loading.winfo_exists():
+                loading.destroy()
+            # Окно диалога могли закрыть, пока шел запрос
+            return parent.winfo_exists()
+        
+        def done(result):
+            try:
+                if finish() and on_done:
+                    on_done(result)
+            finally:
+                self.screen_timer.task_done(navigation)
+        
+        def failed(error):
+            try:
+                if finish():
+                    messagebox.showerror("Ошибка", f"Ошибка обращения к базе данных: {error}")
+            finally:
+                self.screen_timer.task_done(navigation)
+        
+        self.executor.submit(func, *args, on_done=done, on_error=failed,
+                             screen_bound=screen_bound, **kwargs)
+    
     def clear_window(self):
         """Очистка окна"""
+        self.executor.new_generation()
         for widget in self.root.winfo_children():
             widget.destroy()
     
@@ -113,11 +172,6 @@ class CarDealershipApp:
     
     def register(self):
         """Регистрация пользователя"""
-        # Проверяем подключение к БД
-        if not self.db.ensure_connection():
-            messagebox.showerror("Ошибка", "Нет подключения к базе данных. Проверьте настройки подключения.")
-            return
-        
         data = {field: entry.get() for field, entry in self.reg_entries.items()}
         
         # Проверка заполнения полей
@@ -142,17 +196,22 @@ class CarDealershipApp:
         # Получаем email (может быть пустым)
         email = data.get('email', '')
         
-        success, message = self.db.register_user(
+        # Подключение проверяется внутри register_user, уже в рабочем потоке
+        def on_registered(result):
+            success, message = result
+            if success:
+                messagebox.showinfo("Успех", message)
+                self.show_login_screen()
+            else:
+                messagebox.showerror("Ошибка", message)
+        
+        self.run_in_background(
+            self.db.register_user,
             data['first_name'], data['last_name'], data['phone'], 
             email, data['username'], data['password'], 
-            role, position
+            role, position,
+            on_done=on_registered,
         )
-        
-        if success:
-            messagebox.showinfo("Успех", message)
-            self.show_login_screen()
-        else:
-            messagebox.showerror("Ошибка", message)
     
     def login(self):
         """Авторизация пользователя"""
@@ -164,14 +223,16 @@ class CarDealershipApp:
             messagebox.showerror("Ошибка", "Введите логин и пароль")
             return
         
-        user = self.db.login_user(username, password, role)
-        if user:
-            self.current_user = user
-            self.user_role = role
-            messagebox.showinfo("Успех", f"Добро пожаловать, {user[1]} {user[2]}!")
-            self.show_main_screen()
-        else:
-            messagebox.showerror("Ошибка", "Неверный логин или пароль")
+        def on_login(user):
+            if user:
+                self.current_user = user
+                self.user_role = role
+                messagebox.showinfo("Успех", f"Добро пожаловать, {user.first_name} {user.last_name}!")
+                self.show_main_screen()
+            else:
+                messagebox.showerror("Ошибка", "Неверный логин или пароль")
+        
+        self.run_in_background(self.db.login_user, username, password, role, on_done=on_login)
     
     def show_main_screen(self):
         """Главный экран приложения"""
@@ -199,16 +260,19 @@ class CarDealershipApp:
             if self.user_role == "Admin":
                 admin_menu.add_command(label="Клиенты", command=self.show_clients)
                 admin_menu.add_command(label="Сотрудники", command=self.show_employees)
+                admin_menu.add_command(label="Статистика запросов", command=self.show_query_stats)
             
             admin_menu.add_command(label="Продажи", command=self.show_sales)
+            admin_menu.add_command(label="Сводка продаж", command=self.show_sales_dashboard)
             admin_menu.add_command(label="Заявки", command=self.show_purchase_requests)
             admin_menu.add_command(label="Создать заявку", command=self.show_admin_request)
             admin_menu.add_command(label="Оформить продажу", command=self.show_create_sale)
+            admin_menu.add_command(label="Продажа нескольких автомобилей", command=self.show_fleet_sale)
             admin_menu.add_separator()
             admin_menu.add_command(label="Выйти", command=self.logout)
         
         # Приветствие
-        welcome_label = ttk.Label(self.root, text=f"Добро пожаловать, {self.current_user[1]} {self.current_user[2]}!",
+        welcome_label = ttk.Label(self.root, text=f"Добро пожаловать, {self.current_user.first_name} {self.current_user.last_name}!",
                                  font=('Arial', 14))
         welcome_label.pack(pady=20)
         
@@ -223,6 +287,7 @@ class CarDealershipApp:
     
     def clear_content(self):
         """Очистка основного контента"""
+        self.executor.new_generation()
         for widget in self.root.winfo_children():
             if not isinstance(widget, tk.Menu):
                 widget.destroy()
@@ -245,6 +310,29 @@ class CarDealershipApp:
                                 state="readonly", width=15)
         status_combo.pack(side='left', padx=5)
         status_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_cars())
+        
+        # Фильтры по марке, цвету, году и цене
+        criteria_frame = ttk.Frame(self.root)
+        criteria_frame.pack(pady=5)
+        
+        self.car_filter_widgets = {}
+        for name, label, width in (('brand', "Марка:", 14), ('color', "Цвет:", 10),
+                                   ('year_from', "Год с:", 6), ('year_to', "по:", 6),
+                                   ('price_from', "Цена от:", 10), ('price_to', "до:", 10)):
+            ttk.Label(criteria_frame, text=label).pack(side='left', padx=(5, 2))
+            if name in ('brand', 'color'):
+                widget = ttk.Combobox(criteria_frame, width=width)
+                widget.bind('<<ComboboxSelected>>', lambda e: self.refresh_cars())
+            else:
+                widget = ttk.Entry(criteria_frame, width=width)
+            widget.bind('<Return>', lambda e: self.refresh_cars())
+            widget.pack(side='left', padx=(0, 5))
+            self.car_filter_widgets[name] = widget
+        
+        ttk.Button(criteria_frame, text="Применить", 
+                  command=self.refresh_cars).pack(side='left', padx=5)
+        ttk.Button(criteria_frame, text="Сбросить", 
+                  command=self.reset_car_filters).pack(side='left', padx=5)
 
         # Кнопки для администраторов и менеджеров
         if self.user_role != "Client":
@@ -253,6 +341,10 @@ class CarDealershipApp:
             
             ttk.Button(button_frame, text="Добавить автомобиль", 
                       command=self.show_add_car).pack(side='left', padx=5)
+            ttk.Button(button_frame, text="Импорт из файла", 
+                      command=self.import_cars).pack(side='left', padx=5)
+            ttk.Button(button_frame, text="Экспорт", 
+                      command=lambda: self.export_data('cars')).pack(side='left', padx=5)
         
         # Таблица автомобилей
         self.create_cars_table()
@@ -262,11 +354,10 @@ class CarDealershipApp:
     def create_cars_table(self):
         """Создание таблицы автомобилей"""
         columns = ("ID", "Марка", "Модель", "Год", "Цвет", "Цена", "Статус")
-        self.cars_tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
-        
-        for col in columns:
-            self.cars_tree.heading(col, text=col)
-            self.cars_tree.column(col, width=100)
+        # Сортировка выполняется на сервере, щелчок по заголовку меняет колонку/направление
+        self.cars_sort = ('CarID', False)
+        self.cars_tree = VirtualTable(self.root, columns, height=15, on_sort=self.sort_cars,
+                                      executor=self.executor)
         
         self.cars_tree.pack(pady=10, fill='both', expand=True)
         
@@ -280,29 +371,116 @@ class CarDealershipApp:
             ttk.Button(control_frame, text="Удалить", 
                     command=lambda: self.delete_car(self.cars_tree)).pack(side='left', padx=5)
 
+    def sort_cars(self, index, descending):
+        """Сортировка таблицы автомобилей по колонке"""
+        self.cars_sort = (CAR_SORT_COLUMNS[index], descending)
+        self.refresh_cars()
+
+    def car_filters(self):
+        """Условия фильтра автомобилей из полей экрана (ValueError, если год или цена не число)"""
+        status_filter = self.status_filter.get()
+        filters = {'status': None if status_filter == "Все" else status_filter}
+        for name, widget in self.car_filter_widgets.items():
+            value = widget.get().strip()
+            if not value:
+                continue
+            if name in ('year_from', 'year_to'):
+                value = int(value)
+            elif name in ('price_from', 'price_to'):
+                value = float(value)
+            filters[name] = value
+        return filters
+    
+    def reset_car_filters(self):
+        """Очистка фильтров марки, цвета, года и цены"""
+        for widget in self.car_filter_widgets.values():
+            widget.delete(0, tk.END)
+        self.refresh_cars()
+    
     def refresh_cars(self):
         """Обновление списка автомобилей"""
-        for item in self.cars_tree.get_children():
-            self.cars_tree.delete(item)
+        try:
+            filters = self.car_filters()
+        except ValueError:
+            messagebox.showerror("Ошибка", "Год и цена должны быть числами")
+            return
+        sort_by, descending = self.cars_sort
+        
+        if self.inventory is None:
+            # Фильтрация и сортировка выполняются в запросе
+            cursor = self.db.cars_cursor(page_size=self.PAGE_SIZE, sort_by=sort_by,
+                                         descending=descending, **filters)
+            self.load_table(self.cars_tree, IteratorSource(cursor), keep_position=True)
+            self.run_in_background(
+                lambda: (self.db.get_car_brands(), self.db.get_car_colors()),
+                parent=self.cars_tree, on_done=self.set_car_filter_values)
+            return
         
-        status_filter = self.status_filter.get()
-        cars = self.db.get_all_cars()
+        # Снимок подтягивает только изменения, а отбор и сортировка идут в памяти
+        def query():
+            self.inventory.refresh()
+            return self.inventory.query(sort_by, descending, **filters)
         
-        for car in cars:
-            status = car[6]
-            # Фильтрация по статусу
-            if status_filter != "Все" and status != status_filter:
-                continue
-                
-            display_status = status
-            self.cars_tree.insert("", "end", values=(
-                car[0], car[1], car[2], car[3], car[4], car[5], display_status
-            ))
+        def show(car_ids):
+            self.cars_tree.set_source(IndexedSource(car_ids, self.inventory.rows), keep_position=True)
+            self.set_car_filter_values((self.inventory.distinct('brand'), self.inventory.distinct('color')))
+        
+        self.run_in_background(query, parent=self.cars_tree, on_done=show)
+    
+    def set_car_filter_values(self, values):
+        """Варианты марки и цвета в полях фильтра: values - (марки, цвета)"""
+        brands, colors = values
+        self.car_filter_widgets['brand']['values'] = brands
+        self.car_filter_widgets['color']['values'] = colors
+    
+    def load_table(self, table, source, keep_position=False):
+        """Прочитать первую порцию строк в фоне и показать их в таблице"""
+        self.run_in_background(
+            source.preload, table.offset + self.PAGE_SIZE,
+            parent=table,
+            on_done=lambda loaded: table.set_source(loaded, keep_position),
+        )
 
     def show_add_car(self):
         """Окно добавления автомобиля"""
         self.add_edit_car_window()
     
+    def import_cars(self):
+        """Массовый импорт автомобилей из CSV/Excel файла поставщика"""
+        path = filedialog.askopenfilename(
+            title="Импорт автомобилей",
+            filetypes=[("CSV и Excel", "*.csv *.xlsx"), ("Все файлы", "*.*")])
+        if not path:
+            return
+        
+        def on_imported(report):
+            message = report.summary()
+            if report.errors:
+                errors_path = os.path.splitext(path)[0] + "_ошибки.csv"
+                report.write_errors(errors_path)
+                message += f"\n\nОтчет об ошибках сохранен в {errors_path}"
+            messagebox.showinfo("Импорт", message)
+            # Пользователь мог уйти со списка автомобилей, пока шел импорт
+            if self.cars_tree.winfo_exists():
+                self.refresh_cars()
+        
+        self.run_in_background(import_cars, self.db, path, on_done=on_imported,
+                               screen_bound=False, loading_text="Импорт...")
+    
+    def export_data(self, name):
+        """Выгрузка продаж или автомобилей в CSV/Parquet"""
+        path = filedialog.asksaveasfilename(
+            title="Экспорт", initialfile=f"{name}.csv", defaultextension=".csv",
+            filetypes=[("CSV", "*.csv"), ("CSV (gzip)", "*.csv.gz"), ("Parquet", "*.parquet")])
+        if not path:
+            return
+        
+        def on_exported(count):
+            messagebox.showinfo("Экспорт", f"Выгружено строк: {count}\n{path}")
+        
+        self.run_in_background(export, self.db, name, path, on_done=on_exported,
+                               screen_bound=False, loading_text="Выгрузка...")
+    
     def add_edit_car_window(self, car_data=None):
         """Окно добавления/редактирования автомобиля"""
         window = tk.Toplevel(self.root)
@@ -360,13 +538,17 @@ class CarDealershipApp:
                 messagebox.showerror("Ошибка", "Год и цена должны быть числами")
                 return
             
-            if self.db.add_car(brand_entry.get(), model_entry.get(), year, 
-                             color_entry.get(), price, status_combo.get()):
-                messagebox.showinfo("Успех", "Автомобиль добавлен!")
-                window.destroy()
-                self.show_cars()
-            else:
-                messagebox.showerror("Ошибка", "Ошибка при добавлении автомобиля")
+            def on_saved(success):
+                if success:
+                    messagebox.showinfo("Успех", "Автомобиль добавлен!")
+                    window.destroy()
+                    self.show_cars()
+                else:
+                    messagebox.showerror("Ошибка", "Ошибка при добавлении автомобиля")
+            
+            self.run_in_background(self.db.add_car, brand_entry.get(), model_entry.get(), year,
+                                   color_entry.get(), price, status_combo.get(),
+                                   parent=window, screen_bound=False, on_done=on_saved)
         
         def update_car():
             # Валидация данных
@@ -381,13 +563,17 @@ class CarDealershipApp:
                 messagebox.showerror("Ошибка", "Год и цена должны быть числами")
                 return
             
-            if self.db.update_car(car_data[0], brand_entry.get(), model_entry.get(), year,
-                                color_entry.get(), price, status_combo.get()):
-                messagebox.showinfo("Успех", "Автомобиль обновлен!")
-                window.destroy()
-                self.show_cars()
-            else:
-                messagebox.showerror("Ошибка", "Ошибка при обновлении автомобиля")
+            def on_updated(success):
+                if success:
+                    messagebox.showinfo("Успех", "Автомобиль обновлен!")
+                    window.destroy()
+                    self.show_cars()
+                else:
+                    messagebox.showerror("Ошибка", "Ошибка при обновлении автомобиля")
+            
+            self.run_in_background(self.db.update_car, car_data[0], brand_entry.get(), model_entry.get(), year,
+                                   color_entry.get(), price, status_combo.get(),
+                                   parent=window, screen_bound=False, on_done=on_updated)
         
         # Фрейм для кнопок
         button_frame = ttk.Frame(form_frame)
@@ -423,12 +609,51 @@ class CarDealershipApp:
         
         if messagebox.askyesno("Подтверждение", 
                               f"Вы уверены, что хотите удалить автомобиль {car_data[1]} {car_data[2]}?"):
-            success, message = self.db.delete_car(car_data[0])
-            if success:
-                messagebox.showinfo("Успех", message)
-                self.show_cars()
-            else:
-                messagebox.showerror("Ошибка", message)
+            self.run_in_background(self.db.delete_car, car_data[0],
+                                   on_done=lambda result: self.show_write_result(result, self.show_cars))
+    
+    def show_write_result(self, result, on_success):
+        """Сообщение по результату (успех, текст) операции записи"""
+        success, message = result
+        if success:
+            messagebox.showinfo("Успех", message)
+            on_success()
+        else:
+            messagebox.showerror("Ошибка", message)
+    
+    def show_query_stats(self):
+        """Окно со статистикой запросов к базе по методам"""
+        window = tk.Toplevel(self.root)
+        window.title("Статистика запросов")
+        window.geometry("1100x450")
+        
+        text = tk.Text(window, wrap='none', font=('Courier New', 9))
+        
+        def refresh():
+            text.config(state='normal')
+            text.delete('1.0', 'end')
+            text.insert('1.0', self.db.metrics.report() + "\n\n" + self.screen_timer.report())
+            text.config(state='disabled')
+        
+        def save():
+            path = filedialog.asksaveasfilename(parent=window, title="Сохранить статистику",
+                                                initialfile="query_stats.json", defaultextension=".json",
+                                                filetypes=[("JSON", "*.json")])
+            if path:
+                self.db.metrics.dump(path)
+        
+        def reset():
+            self.db.metrics.reset()
+            refresh()
+        
+        button_frame = ttk.Frame(window)
+        button_frame.pack(pady=5)
+        ttk.Button(button_frame, text="Обновить", command=refresh).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Сохранить", command=save).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Сбросить", command=reset).pack(side='left', padx=5)
+        
+        text.pack(fill='both', expand=True, padx=10, pady=5)
+        refresh()
     
     def show_clients(self):
         """Показать список клиентов"""
@@ -437,15 +662,9 @@ class CarDealershipApp:
         ttk.Label(self.root, text="Клиенты", font=('Arial', 16)).pack(pady=10)
         
         columns = ("ID", "Имя", "Фамилия", "Телефон", "Email", "Логин")
-        tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=120)
-        
-        clients = self.db.get_all_clients()
-        for client in clients:
-            tree.insert("", "end", values=client)
+        tree = VirtualTable(self.root, columns, widths={col: 120 for col in columns}, height=15,
+                            executor=self.executor)
+        self.load_table(tree, IteratorSource(self.db.clients_cursor(self.PAGE_SIZE)))
         
         tree.pack(pady=10, fill='both', expand=True)
         
@@ -464,15 +683,8 @@ class CarDealershipApp:
         ttk.Label(self.root, text="Сотрудники", font=('Arial', 16)).pack(pady=10)
         
         columns = ("ID", "Имя", "Фамилия", "Должность", "Телефон", "Email", "Логин", "Роль")
-        tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
-        
-        for col in columns:
-            tree.heading(col, text=col)
-            tree.column(col, width=100)
-        
-        employees = self.db.get_all_employees()
-        for employee in employees:
-            tree.insert("", "end", values=employee)
+        tree = VirtualTable(self.root, columns, height=15, executor=self.executor)
+        self.load_table(tree, IteratorSource(self.db.employees_cursor(self.PAGE_SIZE)))
         
         tree.pack(pady=10, fill='both', expand=True)
         
@@ -508,12 +720,8 @@ class CarDealershipApp:
             
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы уверены, что хотите удалить сотрудника {employee_data[1]} {employee_data[2]}?"):
-                success, message = self.db.delete_employee(employee_id)
-                if success:
-                    messagebox.showinfo("Успех", message)
-                    self.show_employees()
-                else:
-                    messagebox.showerror("Ошибка", message)
+                self.run_in_background(self.db.delete_employee, employee_id,
+                                       on_done=lambda result: self.show_write_result(result, self.show_employees))
         except ValueError as e:
             messagebox.showerror("Ошибка", f"Неверный формат ID сотрудника: {e}")
         except Exception as e:
@@ -531,6 +739,8 @@ class CarDealershipApp:
         
         ttk.Button(button_frame, text="Обновить", 
                 command=self.refresh_sales).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Экспорт", 
+                command=lambda: self.export_data('sales')).pack(side='left', padx=5)
         
         # Создаем таблицу
         self.create_sales_table()
@@ -539,7 +749,6 @@ class CarDealershipApp:
     def create_sales_table(self):
         """Создание таблицы продаж"""
         columns = ("ID", "Марка", "Модель", "Год", "Цвет", "Клиент", "Сотрудник", "Дата", "Цена")
-        self.sales_tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
         
         # Настраиваем колонки
         column_widths = {
@@ -547,49 +756,120 @@ class CarDealershipApp:
             "Цвет": 80, "Клиент": 120, "Сотрудник": 120, "Дата": 100, "Цена": 100
         }
         
-        for col in columns:
-            self.sales_tree.heading(col, text=col)
-            self.sales_tree.column(col, width=column_widths.get(col, 100))
-        
-        # Добавляем скроллбар
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=self.sales_tree.yview)
-        self.sales_tree.configure(yscrollcommand=scrollbar.set)
-        
+        # Таблица со встроенным скроллбаром
+        self.sales_tree = VirtualTable(self.root, columns, widths=column_widths, height=15,
+                                       format_row=self.format_sale_row, executor=self.executor)
         self.sales_tree.pack(pady=10, fill='both', expand=True, padx=10)
-        scrollbar.pack(side='right', fill='y', padx=(0, 10), pady=10)
 
     def refresh_sales(self):
         """Обновление списка продаж"""
-        if hasattr(self, 'sales_tree'):
-            for item in self.sales_tree.get_children():
-                self.sales_tree.delete(item)
+        cursor = self.db.sales_cursor(self.PAGE_SIZE)
+        self.load_table(self.sales_tree, IteratorSource(cursor), keep_position=True)
+    
+    def format_sale_row(self, sale):
+        """Значения строки таблицы продаж"""
+        # Исправление: безопасное форматирование даты
+        if sale.sale_date:
+            try:
+                sale_date = datetime.strptime(sale.sale_date, "%Y-%m-%d").strftime("%d.%m.%Y")
+            except (TypeError, ValueError):
+                sale_date = sale.sale_date  # или установите значение по умолчанию
+        else:
+            sale_date = ""
+        
+        # Форматируем цену
+        sale_price = f"{sale.sale_price:,.2f} руб." if sale.sale_price else ""
+        
+        return (
+            sale.sale_id,
+            sale.brand,
+            sale.model,
+            sale.year,
+            sale.color,
+            sale.client_name,
+            sale.employee_name,
+            sale_date,
+            sale_price
+        )
+    
+    # Разрезы сводки продаж: подпись -> group_by для Database.get_sales_summary
+    SUMMARY_GROUPS = {"По месяцам": 'month', "По маркам": 'brand', "По моделям": 'model',
+                      "По сотрудникам": 'employee'}
+
+    def show_sales_dashboard(self):
+        """Сводка продаж: выручка и число проданных автомобилей по разрезам"""
+        self.clear_content()
         
-        sales = self.db.get_all_sales()
+        ttk.Label(self.root, text="Сводка продаж", font=('Arial', 16)).pack(pady=10)
         
-        for sale in sales:
-            # Исправление: безопасное форматирование даты
-            if sale[7]:
-                try:
-                    sale_date = datetime.strptime(sale[7], "%Y-%m-%d").strftime("%d.%m.%Y")
-                except ValueError:
-                    sale_date = sale[7]  # или установите значение по умолчанию
-            else:
-                sale_date = ""
-            
-            # Форматируем цену
-            sale_price = f"{sale[8]:,.2f} руб." if sale[8] else ""
-            
-            self.sales_tree.insert("", "end", values=(
-                sale[0],  # ID продажи
-                sale[1],  # Марка
-                sale[2],  # Модель
-                sale[3],  # Год
-                sale[4],  # Цвет
-                sale[5],  # Клиент (имя)
-                sale[6],  # Сотрудник (имя)
-                sale_date,
-                sale_price
-            ))
+        control_frame = ttk.Frame(self.root)
+        control_frame.pack(pady=10)
+        
+        ttk.Label(control_frame, text="Разрез:").pack(side='left', padx=5)
+        self.summary_group = ttk.Combobox(control_frame, values=list(self.SUMMARY_GROUPS),
+                                          state='readonly', width=18)
+        self.summary_group.set("По месяцам")
+        self.summary_group.pack(side='left', padx=5)
+        self.summary_group.bind('<<ComboboxSelected>>', lambda e: self.refresh_sales_dashboard())
+        
+        ttk.Button(control_frame, text="Обновить",
+                  command=self.refresh_sales_dashboard).pack(side='left', padx=5)
+        if self.user_role == "Admin":
+            ttk.Button(control_frame, text="Пересчитать",
+                      command=self.rebuild_sales_summary).pack(side='left', padx=5)
+            ttk.Button(control_frame, text="Проверить",
+                      command=self.verify_sales_summary).pack(side='left', padx=5)
+        
+        columns = ("Группа", "Продано", "Выручка")
+        self.summary_tree = VirtualTable(self.root, columns, widths={"Группа": 250, "Продано": 100, "Выручка": 180},
+                                         height=15, format_row=self.format_summary_row, executor=self.executor)
+        self.summary_tree.pack(pady=10, fill='both', expand=True, padx=10)
+        
+        self.summary_total = ttk.Label(self.root, text="")
+        self.summary_total.pack(pady=5)
+        
+        self.refresh_sales_dashboard()
+    
+    def refresh_sales_dashboard(self):
+        """Перечитать сводку в выбранном разрезе"""
+        group_by = self.SUMMARY_GROUPS[self.summary_group.get()]
+        
+        def on_loaded(rows):
+            self.summary_tree.set_source(ListSource(rows))
+            units = sum(row.units for row in rows)
+            revenue = sum(row.revenue for row in rows)
+            self.summary_total.config(text=f"Итого: продано {units}, выручка {revenue:,.2f} руб.")
+        
+        self.run_in_background(self.db.get_sales_summary, group_by, parent=self.summary_tree,
+                               on_done=on_loaded)
+    
+    def format_summary_row(self, row):
+        """Значения строки сводки продаж"""
+        return (row.group, row.units, f"{row.revenue:,.2f} руб.")
+    
+    def rebuild_sales_summary(self):
+        """Пересчитать сводку по всем продажам"""
+        def on_done(result):
+            self.show_write_result(result, self.refresh_sales_dashboard)
+        
+        self.run_in_background(self.db.rebuild_sales_summary, on_done=on_done,
+                               loading_text="Пересчет сводки...")
+    
+    def verify_sales_summary(self):
+        """Сравнить сводку с полным пересчетом по продажам"""
+        def on_done(result):
+            ok, differences = result
+            if ok:
+                messagebox.showinfo("Сводка продаж", "Сводка совпадает с продажами")
+                return
+            lines = [f"{month} {brand} {model}, сотрудник {employee_id}: в сводке {stored}, по продажам {expected}"
+                     for month, brand, model, employee_id, stored, expected in differences[:10]]
+            messagebox.showwarning("Сводка продаж",
+                                   f"Расхождений: {len(differences)}\n" + "\n".join(lines) +
+                                   "\n\nНажмите «Пересчитать», чтобы исправить сводку")
+        
+        self.run_in_background(self.db.verify_sales_summary, on_done=on_done,
+                               loading_text="Проверка сводки...")
     
     def show_purchase_requests(self):
         """Показать заявки на покупку"""
@@ -610,59 +890,91 @@ class CarDealershipApp:
 
         # Получаем заявки в зависимости от роли
         if self.user_role == "Client":
-            requests = self.db.get_all_purchase_requests(self.current_user[0])
+            requests = self.db.purchase_requests_cursor(self.current_user.user_id, self.PAGE_SIZE)
         else:
-            requests = self.db.get_all_purchase_requests()
-        
-        # Создаем таблицу
-        columns = ("ID", "Клиент", "Марка", "Модель", "Макс. цена", "Дата", "Статус")
-        tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
+            requests = self.db.purchase_requests_cursor(page_size=self.PAGE_SIZE)
         
-        # Настраиваем колонки
-        tree.column("ID", width=50)
-        tree.column("Клиент", width=150)
-        tree.column("Марка", width=100)
-        tree.column("Модель", width=100)
-        tree.column("Макс. цена", width=100)
-        tree.column("Дата", width=100)
-        tree.column("Статус", width=100)
+        # Создаем таблицу (скроллбар встроен в VirtualTable)
+        columns = ("ID", "Клиент", "Марка", "Модель", "Макс. цена", "Дата", "Статус", "В наличии")
+        column_widths = {
+            "ID": 50, "Клиент": 150, "Марка": 100, "Модель": 100,
+            "Макс. цена": 100, "Дата": 100, "Статус": 100, "В наличии": 160
+        }
+        tree = VirtualTable(self.root, columns, widths=column_widths, height=15,
+                            format_row=self.format_request_row, executor=self.executor)
         
-        for col in columns:
-            tree.heading(col, text=col)
+        # Заполняем данными; подбор обновляется до показа строк
+        source = IteratorSource(requests)
         
-        # Заполняем данными
-        for req in requests:
-            max_price = f"{req[4]:,.2f} руб." if req[4] else "Не указана"
-            
-            # Безопасное форматирование даты
-            request_date = ""
-            if req[5]:
-                if hasattr(req[5], 'strftime'):
-                    # Если это объект даты
-                    request_date = req[5].strftime("%d.%m.%Y")
-                else:
-                    # Если это строка, оставляем как есть
-                    request_date = str(req[5])
-            
-            tree.insert("", "end", values=(
-                req[0], req[1], req[2], req[3], max_price, request_date, req[6]
-            ))
+        def load():
+            self.matcher.refresh()
+            return source.preload(self.PAGE_SIZE)
         
-        # Добавляем скроллбар
-        scrollbar = ttk.Scrollbar(self.root, orient="vertical", command=tree.yview)
-        tree.configure(yscrollcommand=scrollbar.set)
+        self.run_in_background(load, parent=tree, on_done=tree.set_source)
         
         tree.pack(pady=10, fill='both', expand=True, padx=10)
-        scrollbar.pack(side='right', fill='y', padx=(0, 10), pady=10)
+        
+        control_frame = ttk.Frame(self.root)
+        control_frame.pack(pady=10)
+        
+        ttk.Button(control_frame, text="Подходящие автомобили", 
+                command=lambda: self.show_request_matches(tree)).pack(side='left', padx=5)
         
         # Кнопки управления для администраторов
         if self.user_role != "Client":
-            control_frame = ttk.Frame(self.root)
-            control_frame.pack(pady=10)
-            
             ttk.Button(control_frame, text="Удалить заявку", 
                     command=lambda: self.delete_purchase_request(tree)).pack(side='left', padx=5)
 
+    def format_request_row(self, req):
+        """Значения строки таблицы заявок"""
+        max_price = f"{req.max_price:,.2f} руб." if req.max_price else "Не указана"
+        
+        # Безопасное форматирование даты
+        request_date = ""
+        if req.request_date:
+            if hasattr(req.request_date, 'strftime'):
+                # Если это объект даты
+                request_date = req.request_date.strftime("%d.%m.%Y")
+            else:
+                # Если это строка, оставляем как есть
+                request_date = str(req.request_date)
+        
+        # Подбор есть только у открытых заявок
+        match = self.matcher.match(req.request_id)
+        if match is None:
+            matches = ""
+        elif match.count:
+            matches = f"{match.count} (от {match.best.price:,.0f} руб.)" if match.best.price else str(match.count)
+        else:
+            matches = "Нет"
+        
+        return (req.request_id, req.client_name, req.brand, req.model, max_price, request_date, req.status,
+                matches)
+
+    def show_request_matches(self, tree):
+        """Свободные автомобили, подходящие под выбранную заявку"""
+        selected = tree.selection()
+        if not selected:
+            messagebox.showwarning("Предупреждение", "Выберите заявку")
+            return
+        
+        request_data = tree.item(selected[0])['values']
+        cars = self.matcher.cars_for(request_data[0])
+        if not cars:
+            messagebox.showinfo("Подбор", "Подходящих автомобилей в наличии нет")
+            return
+        
+        window = tk.Toplevel(self.root)
+        window.title(f"Подходящие автомобили для заявки #{request_data[0]}")
+        window.geometry("700x400")
+        
+        columns = ("ID", "Марка", "Модель", "Год", "Цвет", "Цена")
+        table = VirtualTable(window, columns, height=15, executor=self.executor,
+                             format_row=lambda car: (car.car_id, car.brand, car.model, car.year, car.color,
+                                                     f"{car.price:,.2f} руб." if car.price else ""))
+        table.set_source(ListSource(cars))
+        table.pack(pady=10, fill='both', expand=True, padx=10)
+
     def delete_purchase_request(self, tree):
         """Удаление заявки"""
         selected = tree.selection()
@@ -674,12 +986,8 @@ class CarDealershipApp:
         
         if messagebox.askyesno("Подтверждение", 
                             f"Вы уверены, что хотите удалить заявку #{request_data[0]}?"):
-            success, message = self.db.delete_purchase_request(request_data[0])
-            if success:
-                messagebox.showinfo("Успех", message)
-                self.show_purchase_requests()
-            else:
-                messagebox.showerror("Ошибка", message)
+            self.run_in_background(self.db.delete_purchase_request, request_data[0],
+                                   on_done=lambda result: self.show_write_result(result, self.show_purchase_requests))
 
     def delete_client(self, tree):
         """Удаление выбранного клиента"""
@@ -705,12 +1013,8 @@ class CarDealershipApp:
             
             if messagebox.askyesno("Подтверждение", 
                                 f"Вы уверены, что хотите удалить клиента {client_data[1]} {client_data[2]}?"):
-                success, message = self.db.delete_client(client_id)
-                if success:
-                    messagebox.showinfo("Успех", message)
-                    self.show_clients()
-                else:
-                    messagebox.showerror("Ошибка", message)
+                self.run_in_background(self.db.delete_client, client_id,
+                                       on_done=lambda result: self.show_write_result(result, self.show_clients))
         except ValueError as e:
             messagebox.showerror("Ошибка", f"Неверный формат ID клиента: {e}")
         except Exception as e:
@@ -729,24 +1033,18 @@ class CarDealershipApp:
         
         # Выбор клиента
         ttk.Label(main_frame, text="Клиент:").pack(anchor='w', pady=5)
-        clients = self.db.get_all_clients()
         client_var = tk.StringVar()
         client_combo = ttk.Combobox(main_frame, textvariable=client_var, state="readonly", width=50)
-        client_combo['values'] = [f"{client[0]} - {client[1]} {client[2]} ({client[3]})" for client in clients]
-        if clients:
-            client_combo.current(0)
         client_combo.pack(fill='x', pady=5)
         
         # Выбор автомобиля
         ttk.Label(main_frame, text="Автомобиль:").pack(anchor='w', pady=5)
-        available_cars = self.db.get_available_cars()
         car_var = tk.StringVar()
         car_combo = ttk.Combobox(main_frame, textvariable=car_var, state="readonly", width=50)
-        car_combo['values'] = [f"{car[0]} - {car[1]} {car[2]} {car[3]}г. ({car[4]}) - {car[5]:,.2f} руб." for car in available_cars]
-        if available_cars:
-            car_combo.current(0)
         car_combo.pack(fill='x', pady=5)
         
+        self.load_client_and_car_choices(window, client_combo, car_combo)
+        
         # Максимальная цена
         ttk.Label(main_frame, text="Максимальная цена:").pack(anchor='w', pady=5)
         price_entry = ttk.Entry(main_frame, width=30)
@@ -756,12 +1054,21 @@ class CarDealershipApp:
             if car_combo.get():
                 try:
                     car_id = int(car_combo.get().split(' - ')[0])
-                    car = self.db.get_car_by_id(car_id)
+                except ValueError:
+                    return
+                
+                def fill_price(car):
                     if car:
                         price_entry.delete(0, tk.END)
-                        price_entry.insert(0, str(car[5]))
-                except:
-                    pass
+                        price_entry.insert(0, str(car.price))
+                
+                # Обычно автомобиль уже прочитан вместе со списком выбора
+                car = self.db.peek_car(car_id)
+                if car is not None:
+                    fill_price(car)
+                else:
+                    self.run_in_background(self.db.get_car_by_id, car_id, parent=window,
+                                           screen_bound=False, on_done=fill_price)
         
         car_combo.bind('<<ComboboxSelected>>', on_car_select)
         
@@ -789,29 +1096,36 @@ class CarDealershipApp:
                     messagebox.showerror("Ошибка", "Цена должна быть положительным числом")
                     return
                 
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректную цену")
+                return
+            
+            def submit():
                 # Получаем информацию об автомобиле
                 car = self.db.get_car_by_id(car_id)
                 if not car:
-                    messagebox.showerror("Ошибка", "Автомобиль не найден")
-                    return
+                    return None
                 
                 # Создаем заявку
-                success = self.db.add_purchase_request(
+                return self.db.add_purchase_request(
                     client_id,
                     car_id,     # CarID из выбранного автомобиля
-                    car[1],     # Brand
-                    car[2],     # Model
+                    car.brand,
+                    car.model,
                     max_price
                 )
-                
-                if success:
+            
+            def on_created(success):
+                if success is None:
+                    messagebox.showerror("Ошибка", "Автомобиль не найден")
+                elif success:
                     messagebox.showinfo("Успех", "Заявка успешно создана!")
                     window.destroy()
                     self.show_purchase_requests()
                 else:
                     messagebox.showerror("Ошибка", "Ошибка при создании заявки")
-            except ValueError:
-                messagebox.showerror("Ошибка", "Введите корректную цену")
+            
+            self.run_in_background(submit, parent=window, screen_bound=False, on_done=on_created)
         
         # Фрейм для кнопок
         button_frame = ttk.Frame(main_frame)
@@ -822,6 +1136,24 @@ class CarDealershipApp:
         ttk.Button(button_frame, text="Отмена", 
                   command=window.destroy).pack(side='left', padx=5)
     
+    def load_client_and_car_choices(self, window, client_combo, car_combo):
+        """Заполнение списков клиентов и автомобилей диалога (оба запроса идут параллельно)"""
+        def fill_clients(clients):
+            client_combo['values'] = [f"{client.client_id} - {client.first_name} {client.last_name} ({client.phone})"
+                                      for client in clients]
+            if clients:
+                client_combo.current(0)
+        
+        def fill_cars(available_cars):
+            car_combo['values'] = [f"{car.car_id} - {car.brand} {car.model} {car.year}г. ({car.color}) - "
+                                   + (f"{car.price:,.2f} руб." if car.price else "Цена не указана")
+                                   for car in available_cars]
+            if available_cars:
+                car_combo.current(0)
+        
+        self.run_in_background(self.db.get_all_clients, parent=window, screen_bound=False, on_done=fill_clients)
+        self.run_in_background(self.db.get_available_cars, parent=window, screen_bound=False, on_done=fill_cars)
+    
     def show_add_request(self):
         """Окно подачи заявки на покупку для клиента"""
         if self.user_role == "Client":
@@ -836,8 +1168,11 @@ class CarDealershipApp:
         ttk.Label(self.root, text="Мои покупки", font=('Arial', 16)).pack(pady=10)
         
         # Получаем продажи клиента
-        sales = self.db.get_client_sales(self.current_user[0])
-        
+        self.run_in_background(self.db.get_client_sales, self.current_user.user_id,
+                               on_done=self.fill_client_sales)
+    
+    def fill_client_sales(self, sales):
+        """Таблица покупок клиента по результату запроса"""
         if not sales:
             ttk.Label(self.root, text="У вас пока нет покупок", 
                     font=('Arial', 12), foreground='gray').pack(pady=50)
@@ -845,46 +1180,41 @@ class CarDealershipApp:
         
         # Создаем таблицу
         columns = ("ID", "Марка", "Модель", "Год", "Цвет", "Менеджер", "Дата", "Цена")
-        tree = ttk.Treeview(self.root, columns=columns, show='headings', height=15)
-        
-        # Настраиваем колонки
-        tree.column("ID", width=50)
-        tree.column("Марка", width=100)
-        tree.column("Модель", width=100)
-        tree.column("Год", width=70)
-        tree.column("Цвет", width=80)
-        tree.column("Менеджер", width=120)
-        tree.column("Дата", width=100)
-        tree.column("Цена", width=100)
-        
-        for col in columns:
-            tree.heading(col, text=col)
+        column_widths = {
+            "ID": 50, "Марка": 100, "Модель": 100, "Год": 70,
+            "Цвет": 80, "Менеджер": 120, "Дата": 100, "Цена": 100
+        }
+        tree = VirtualTable(self.root, columns, widths=column_widths, height=15,
+                            format_row=self.format_client_sale_row)
         
         # Заполняем данными
-        for sale in sales:
-            # Форматируем дату
-            sale_date = sale[6]
-            if hasattr(sale_date, 'strftime'):
-                # Если это объект даты
-                sale_date = sale_date.strftime("%d.%m.%Y")
-            elif not sale_date:
-                sale_date = ""
-            # Форматируем цену
-            sale_price = f"{sale[7]:,.2f} руб." if sale[7] else ""
-            
-            tree.insert("", "end", values=(
-                sale[0],  # ID
-                sale[1],  # Марка
-                sale[2],  # Модель
-                sale[3],  # Год
-                sale[4],  # Цвет
-                sale[5],  # Менеджер
-                sale_date,
-                sale_price
-            ))
+        tree.set_rows(sales)
         
         tree.pack(pady=10, fill='both', expand=True)
     
+    def format_client_sale_row(self, sale):
+        """Значения строки таблицы покупок клиента"""
+        # Форматируем дату
+        sale_date = sale.sale_date
+        if hasattr(sale_date, 'strftime'):
+            # Если это объект даты
+            sale_date = sale_date.strftime("%d.%m.%Y")
+        elif not sale_date:
+            sale_date = ""
+        # Форматируем цену
+        sale_price = f"{sale.sale_price:,.2f} руб." if sale.sale_price else ""
+        
+        return (
+            sale.sale_id,
+            sale.brand,
+            sale.model,
+            sale.year,
+            sale.color,
+            sale.employee_name,
+            sale_date,
+            sale_price
+        )
+    
     def show_car_selection_for_request(self):
         """Показ доступных автомобилей для выбора (для клиентов)"""
         window = tk.Toplevel(self.root)
@@ -898,8 +1228,11 @@ class CarDealershipApp:
                   font=('Arial', 12, 'bold')).pack(pady=10)
         
         # Получаем доступные автомобили
-        available_cars = self.db.get_available_cars()
-        
+        self.run_in_background(self.db.get_available_cars, parent=window, screen_bound=False,
+                               on_done=lambda cars: self.fill_car_selection(window, main_frame, cars))
+    
+    def fill_car_selection(self, window, main_frame, available_cars):
+        """Таблица доступных автомобилей в окне выбора для заявки"""
         if not available_cars:
             ttk.Label(main_frame, text="Нет доступных автомобилей в наличии", 
                       foreground='red').pack(pady=20)
@@ -925,16 +1258,16 @@ class CarDealershipApp:
         # Заполняем данными (группируем по марке и модели)
         displayed_cars = set()
         for car in available_cars:
-            car_key = (car[1], car[2])  # Марка и модель
+            car_key = (car.brand, car.model)
             
             if car_key not in displayed_cars:
-                price_formatted = f"{car[5]:,.2f} руб." if car[5] else "Цена не указана"
+                price_formatted = f"{car.price:,.2f} руб." if car.price else "Цена не указана"
                 tree.insert("", "end", values=(
-                    car[0],  # ID первого автомобиля с такой маркой/моделью
-                    car[1],  # Марка
-                    car[2],  # Модель
-                    car[3],  # Год
-                    car[4],  # Цвет
+                    car.car_id,  # ID первого автомобиля с такой маркой/моделью
+                    car.brand,
+                    car.model,
+                    car.year,
+                    car.color,
                     price_formatted
                 ))
                 displayed_cars.add(car_key)
@@ -1050,21 +1383,24 @@ class CarDealershipApp:
                 messagebox.showerror("Ошибка", "Введите корректную цену")
                 return
             
+            def on_submitted(success):
+                if success:
+                    messagebox.showinfo("Успех", "Заявка успешно подана!")
+                    window.destroy()
+                    self.show_purchase_requests()
+                else:
+                    messagebox.showerror("Ошибка", "Ошибка при подаче заявки")
+            
             # Создаем заявку с привязкой к CarID
-            success = self.db.add_purchase_request(
-                self.current_user[0],  # ClientID
+            self.run_in_background(
+                self.db.add_purchase_request,
+                self.current_user.user_id,  # ClientID
                 car_data[0],           # CarID (ID автомобиля)
                 car_data[1],           # Brand
                 car_data[2],           # Model
-                max_price
+                max_price,
+                parent=window, screen_bound=False, on_done=on_submitted,
             )
-            
-            if success:
-                messagebox.showinfo("Успех", "Заявка успешно подана!")
-                window.destroy()
-                self.show_purchase_requests()
-            else:
-                messagebox.showerror("Ошибка", "Ошибка при подаче заявки")
         
         # Фрейм для кнопок
         button_frame = ttk.Frame(main_frame)
@@ -1098,24 +1434,18 @@ class CarDealershipApp:
         
         # Выбор клиента
         ttk.Label(main_frame, text="Клиент:").pack(anchor='w', pady=5)
-        clients = self.db.get_all_clients()
         client_var = tk.StringVar()
         client_combo = ttk.Combobox(main_frame, textvariable=client_var, state="readonly", width=50)
-        client_combo['values'] = [f"{client[0]} - {client[1]} {client[2]} ({client[3]})" for client in clients]
-        if clients:
-            client_combo.current(0)
         client_combo.pack(fill='x', pady=5)
         
         # Выбор автомобиля
         ttk.Label(main_frame, text="Автомобиль:").pack(anchor='w', pady=5)
-        available_cars = self.db.get_available_cars()
         car_var = tk.StringVar()
         car_combo = ttk.Combobox(main_frame, textvariable=car_var, state="readonly", width=50)
-        car_combo['values'] = [f"{car[0]} - {car[1]} {car[2]} {car[3]}г. ({car[4]}) - {car[5]:,.2f} руб." for car in available_cars]
-        if available_cars:
-            car_combo.current(0)
         car_combo.pack(fill='x', pady=5)
         
+        self.load_client_and_car_choices(window, client_combo, car_combo)
+        
         # Цена продажи
         ttk.Label(main_frame, text="Цена продажи:").pack(anchor='w', pady=5)
         price_entry = ttk.Entry(main_frame, width=30)
@@ -1125,12 +1455,21 @@ class CarDealershipApp:
             if car_combo.get():
                 try:
                     car_id = int(car_combo.get().split(' - ')[0])
-                    car = self.db.get_car_by_id(car_id)
+                except ValueError:
+                    return
+                
+                def fill_price(car):
                     if car:
                         price_entry.delete(0, tk.END)
-                        price_entry.insert(0, str(car[5]))
-                except:
-                    pass
+                        price_entry.insert(0, str(car.price))
+                
+                # Обычно автомобиль уже прочитан вместе со списком выбора
+                car = self.db.peek_car(car_id)
+                if car is not None:
+                    fill_price(car)
+                else:
+                    self.run_in_background(self.db.get_car_by_id, car_id, parent=window,
+                                           screen_bound=False, on_done=fill_price)
         
         car_combo.bind('<<ComboboxSelected>>', on_car_select)
         
@@ -1138,7 +1477,7 @@ class CarDealershipApp:
         
         # Информация о менеджере
         ttk.Label(main_frame, text="Менеджер:").pack(anchor='w', pady=5)
-        ttk.Label(main_frame, text=f"{self.current_user[1]} {self.current_user[2]}").pack(anchor='w', pady=5)
+        ttk.Label(main_frame, text=f"{self.current_user.first_name} {self.current_user.last_name}").pack(anchor='w', pady=5)
         
         def confirm_sale():
             if not client_combo.get():
@@ -1158,15 +1497,22 @@ class CarDealershipApp:
                     messagebox.showerror("Ошибка", "Цена должна быть положительным числом")
                     return
                 
-                success, message = self.db.create_sale_from_selection(client_id, car_id, self.current_user[0], sale_price)
+            except ValueError:
+                messagebox.showerror("Ошибка", "Введите корректную цену")
+                return
+            
+            def on_sold(result):
+                success, message = result
                 if success:
                     messagebox.showinfo("Успех", message)
                     window.destroy()
                     self.show_sales()
                 else:
                     messagebox.showerror("Ошибка", message)
-            except ValueError:
-                messagebox.showerror("Ошибка", "Введите корректную цену")
+            
+            self.run_in_background(self.db.create_sale_from_selection, client_id, car_id,
+                                   self.current_user.user_id, sale_price,
+                                   parent=window, screen_bound=False, on_done=on_sold)
         
         # Фрейм для кнопок
         button_frame = ttk.Frame(main_frame)
@@ -1177,7 +1523,98 @@ class CarDealershipApp:
         ttk.Button(button_frame, text="Отмена", 
                   command=window.destroy).pack(side='left', padx=5)
 
+    def show_fleet_sale(self):
+        """Окно продажи нескольких автомобилей одному клиенту"""
+        window = tk.Toplevel(self.root)
+        window.title("Продажа нескольких автомобилей")
+        window.geometry("750x550")
+        
+        main_frame = ttk.Frame(window, padding=20)
+        main_frame.pack(fill='both', expand=True)
+        
+        ttk.Label(main_frame, text="Продажа нескольких автомобилей", font=('Arial', 12, 'bold')).pack(pady=10)
+        
+        # Выбор клиента
+        ttk.Label(main_frame, text="Клиент:").pack(anchor='w', pady=5)
+        client_combo = ttk.Combobox(main_frame, state="readonly", width=50)
+        client_combo.pack(fill='x', pady=5)
+        
+        # Автомобили в наличии, можно выбрать несколько (Ctrl/Shift + щелчок)
+        ttk.Label(main_frame, text="Автомобили (выберите несколько):").pack(anchor='w', pady=5)
+        columns = ('ID', 'Марка', 'Модель', 'Год', 'Цвет', 'Цена')
+        cars_table = VirtualTable(main_frame, columns, height=10, selectmode='extended',
+                                  format_row=lambda car: (car.car_id, car.brand, car.model, car.year, car.color,
+                                                          f"{car.price:,.2f}" if car.price else "Не указана"),
+                                  widths={'ID': 50, 'Год': 60}, executor=self.executor)
+        cars_table.pack(fill='both', expand=True, pady=5)
+        
+        total_label = ttk.Label(main_frame, text="Выбрано: 0, сумма: 0.00 руб.")
+        total_label.pack(anchor='w', pady=5)
+        
+        def update_total(event=None):
+            cars = cars_table.selected_rows()
+            total = sum(car.price for car in cars if car.price)
+            unpriced = sum(1 for car in cars if not car.price)
+            note = f", без цены: {unpriced}" if unpriced else ""
+            total_label.config(text=f"Выбрано: {len(cars)}, сумма: {total:,.2f} руб.{note}")
+        
+        cars_table.bind('<<TreeviewSelect>>', update_total, add='+')
+        
+        require_all = tk.BooleanVar(value=False)
+        ttk.Checkbutton(main_frame, text="Продать только все выбранные автомобили сразу",
+                        variable=require_all).pack(anchor='w', pady=5)
+        
+        def fill_clients(clients):
+            client_combo['values'] = [f"{client.client_id} - {client.first_name} {client.last_name} ({client.phone})"
+                                      for client in clients]
+            if clients:
+                client_combo.current(0)
+        
+        self.run_in_background(self.db.get_all_clients, parent=window, screen_bound=False, on_done=fill_clients)
+        self.run_in_background(self.db.get_available_cars, parent=window, screen_bound=False,
+                               on_done=cars_table.set_rows)
+        
+        def confirm_sale():
+            if not client_combo.get():
+                messagebox.showerror("Ошибка", "Выберите клиента")
+                return
+            
+            cars = cars_table.selected_rows()
+            if not cars:
+                messagebox.showerror("Ошибка", "Выберите автомобили")
+                return
+            unpriced = [str(car.car_id) for car in cars if car.price is None]
+            if unpriced:
+                messagebox.showerror("Ошибка", f"Не указана цена у автомобилей: {', '.join(unpriced)}")
+                return
+            
+            client_id = int(client_combo.get().split(' - ')[0])
+            
+            def on_sold(result):
+                success, message, results = result
+                details = "\n".join(f"№{car_id}: {text}" for car_id, sale_id, text in results)
+                if success:
+                    messagebox.showinfo("Успех", f"{message}\n\n{details}")
+                    window.destroy()
+                    self.show_sales()
+                else:
+                    messagebox.showerror("Ошибка", f"{message}\n\n{details}" if details else message)
+            
+            self.run_in_background(self.db.create_fleet_sale, client_id, self.current_user.user_id,
+                                   [(car.car_id, car.price) for car in cars], require_all.get(),
+                                   parent=window, screen_bound=False, on_done=on_sold)
+        
+        button_frame = ttk.Frame(main_frame)
+        button_frame.pack(pady=10)
+        
+        ttk.Button(button_frame, text="Подтвердить продажу", 
+                  command=confirm_sale).pack(side='left', padx=5)
+        ttk.Button(button_frame, text="Отмена", 
+                  command=window.destroy).pack(side='left', padx=5)
+
 if __name__ == "__main__":
     root = tk.Tk()
     app = CarDealershipApp(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
+    app.executor.shutdown()
+    app.db.close()
\ No newline at end of file
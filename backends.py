@@ -0,0 +1,476 @@
+"""Хранилища Database: SQL Server через pyodbc и встроенный SQLite.
+
+Backend открывает соединения и прячет различия диалектов: склейку строк,
+выборку первых N строк, месяц даты, признаки обрыва связи и конфликта
+транзакций, а также пакеты записи. На SQL Server продажа и строка сводки
+пишутся одним пакетом T-SQL (DECLARE, OUTPUT INTO, MERGE) за один обмен
+с сервером; на SQLite те же шаги выполняются отдельными запросами в той
+же транзакции - сервера нет, и обмен ничего не стоит.
+
+Хранилище выбирается параметром backend у Database или переменной
+окружения AUTOTRADE_DATABASE:
+
+    AUTOTRADE_DATABASE=sqlserver              # по умолчанию
+    AUTOTRADE_DATABASE=sqlite:autotrade.db    # файл SQLite, схема создается сама (schema.py)
+"""
+import os
+import sqlite3
+import threading
+
+import schema
+
+try:
+    import pyodbc
+except ImportError:
+    # Без pyodbc доступен только SQLite
+    pyodbc = None
+
+# Переменная окружения с выбором хранилища (см. backend_from_config)
+DATABASE_ENV = 'AUTOTRADE_DATABASE'
+
+CONNECTION_STRINGS = [
+    'DRIVER={SQL Server};SERVER=localhost;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
+    'DRIVER={SQL Server};SERVER=.;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
+    'DRIVER={SQL Server};SERVER=localhost\\SQLEXPRESS;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
+    'DRIVER={SQL Server};SERVER=.\\SQLEXPRESS;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
+]
+
+# Файл SQLite по умолчанию (AUTOTRADE_DATABASE=sqlite без пути)
+SQLITE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'autotrade.db')
+
+# SQLSTATE, которыми ODBC-драйвер сообщает о потере связи с сервером
+DISCONNECT_SQLSTATES = {'08S01', '08001', '08003', '08004', '08007'}
+
+# Взаимоблокировка и таймаут ожидания блокировки: операцию занял другой сеанс
+CONTENTION_SQLSTATES = {'40001', 'HYT00'}
+
+# Добавить (sign='+') или вычесть (sign='-') продажи, выбранные условием where.
+# Строка, в которой после вычитания не осталось продаж, удаляется тем же MERGE
+# (по ключу, без просмотра сводки). Таблицу создает и заполняет миграция 1 (schema.py).
+SALES_SUMMARY_DELTA_SQL = """
+    MERGE SalesSummary AS t
+    USING ({rollup}) AS d
+    ON t.SaleMonth = d.SaleMonth AND t.Brand = d.Brand AND t.Model = d.Model
+       AND t.EmployeeID = d.EmployeeID
+    WHEN MATCHED AND t.Units {sign} d.Units = 0 THEN
+        DELETE
+    WHEN MATCHED THEN
+        UPDATE SET Units = t.Units {sign} d.Units, Revenue = t.Revenue {sign} d.Revenue
+    WHEN NOT MATCHED THEN
+        INSERT (SaleMonth, Brand, Model, EmployeeID, Units, Revenue)
+        VALUES (d.SaleMonth, d.Brand, d.Model, d.EmployeeID, {sign}d.Units, {sign}d.Revenue);
+"""
+
+# То же для SQLite: UPSERT вместо MERGE, строки с нулем удаляются отдельным запросом
+# (SQLITE_SUMMARY_EMPTIED_SQL)
+SQLITE_SUMMARY_DELTA_SQL = """
+    INSERT INTO SalesSummary (SaleMonth, Brand, Model, EmployeeID, Units, Revenue)
+    SELECT SaleMonth, Brand, Model, EmployeeID, {sign}Units, {sign}Revenue
+    FROM ({rollup})
+    WHERE true
+    ON CONFLICT (SaleMonth, Brand, Model, EmployeeID)
+    DO UPDATE SET Units = Units + excluded.Units, Revenue = Revenue + excluded.Revenue
+"""
+
+# Строки сводки, опустевшие после вычитания: только ключи из того же набора продаж,
+# поиск по первичному ключу
+SQLITE_SUMMARY_EMPTIED_SQL = """
+    DELETE FROM SalesSummary
+    WHERE (SaleMonth, Brand, Model, EmployeeID) IN (
+        SELECT SaleMonth, Brand, Model, EmployeeID FROM ({rollup})
+    ) AND Units = 0
+"""
+
+# Настройки каждого соединения SQLite: журнал WAL (читатели не ждут писателя),
+# fsync только на контрольных точках, кэш страниц 64 МБ, временные таблицы в памяти
+SQLITE_PRAGMAS = [
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA foreign_keys = ON",
+    "PRAGMA cache_size = -65536",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA mmap_size = 268435456",
+]
+
+
+class Backend:
+    """Общая часть хранилищ; диалект задают подклассы"""
+
+    name = None
+    # Нужен ли SET IDENTITY_INSERT, чтобы вставить явный ID
+    identity_insert = False
+    # Строки подключения, которые Database пробует по очереди
+    connection_strings = []
+
+    def connect(self, connection_string, timeout=None):
+        raise NotImplementedError
+
+    def concat(self, *parts):
+        """Выражение склейки строк"""
+        raise NotImplementedError
+
+    def full_name(self, alias):
+        """Имя и фамилия строки alias (клиента или сотрудника) через пробел"""
+        return self.concat(f"{alias}.FirstName", "' '", f"{alias}.LastName")
+
+    def month(self, column):
+        """Месяц даты в виде 'ГГГГ-ММ'"""
+        raise NotImplementedError
+
+    def page(self, select, rest, params, limit):
+        """Запрос первых limit строк SELECT select rest и его параметры"""
+        raise NotImplementedError
+
+    def sales_rollup(self, where=""):
+        """Запрос продаж, сгруппированных как сводка SalesSummary"""
+        return schema.SALES_ROLLUP_SQL.format(month=self.month('s.SaleDate'), where=where)
+
+    def is_disconnect_error(self, error):
+        """Признак того, что ошибка вызвана обрывом соединения"""
+        return False
+
+    def is_contention_error(self, error):
+        """Признак того, что запрос проиграл конкурирующей транзакции"""
+        return False
+
+
+class SqlServerBackend(Backend):
+    """SQL Server через pyodbc"""
+
+    name = 'sqlserver'
+    identity_insert = True
+
+    def __init__(self, connection_strings=None):
+        if pyodbc is None:
+            raise RuntimeError("Не установлен пакет pyodbc")
+        self.connection_strings = connection_strings or CONNECTION_STRINGS
+
+    def connect(self, connection_string, timeout=None):
+        return pyodbc.connect(connection_string, timeout=timeout)
+
+    def concat(self, *parts):
+        return ' + '.join(parts)
+
+    def month(self, column):
+        return f"CONVERT(CHAR(7), {column}, 120)"
+
+    def page(self, select, rest, params, limit):
+        return f"SELECT TOP (?) {select}\n{rest}", [int(limit), *params]
+
+    def is_disconnect_error(self, error):
+        if not isinstance(error, pyodbc.Error):
+            return False
+        sqlstate = error.args[0] if error.args else ''
+        return sqlstate in DISCONNECT_SQLSTATES or 'Communication link failure' in str(error)
+
+    def is_contention_error(self, error):
+        if not isinstance(error, pyodbc.Error):
+            return False
+        sqlstate = error.args[0] if error.args else ''
+        return sqlstate in CONTENTION_SQLSTATES or 'deadlock' in str(error).lower()
+
+    def summary_delta(self, where, sign='+'):
+        """Текст пакета, который переносит продажи из условия where в сводку"""
+        return SALES_SUMMARY_DELTA_SQL.format(rollup=self.sales_rollup(f"WHERE {where}"), sign=sign)
+
+    def insert_sale(self, cursor, car_id, client_id, employee_id, sale_price):
+        """Вставить продажу и учесть ее в сводке"""
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @Sale TABLE (SaleID INT);
+
+            INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
+            OUTPUT INSERTED.SaleID INTO @Sale
+            VALUES (?, ?, ?, ?);
+
+            {self.summary_delta("s.SaleID IN (SELECT SaleID FROM @Sale)")}
+        """, car_id, client_id, employee_id, sale_price)
+
+    def claim_sale(self, cursor, car_id, client_id, employee_id, sale_price):
+        """Занять свободный автомобиль и вставить продажу.
+
+        Возвращает (SaleID или None, статус автомобиля или None, если его нет).
+        """
+        # Автомобиль занимается условным UPDATE: из двух одновременных
+        # продаж строку изменит только одна, вторая увидит 0 строк.
+        # Продажа и строка сводки обновляются в том же пакете,
+        # за один обмен с сервером.
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @Sale TABLE (SaleID INT);
+
+            UPDATE Cars SET Status = 'Продано'
+            WHERE CarID = ? AND Status = 'В наличии';
+
+            IF @@ROWCOUNT = 1
+                INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
+                OUTPUT INSERTED.SaleID INTO @Sale
+                VALUES (?, ?, ?, ?);
+
+            {self.summary_delta("s.SaleID IN (SELECT SaleID FROM @Sale)")}
+
+            SELECT (SELECT SaleID FROM @Sale),
+                   (SELECT Status FROM Cars WHERE CarID = ?);
+        """, car_id, car_id, client_id, employee_id, sale_price, car_id)
+        return tuple(cursor.fetchone())
+
+    def sell_fleet(self, cursor, cars, client_id, employee_id):
+        """Занять свободные автомобили из cars [(CarID, цена)] и вставить продажи.
+
+        Возвращает {CarID: (SaleID или None, статус автомобиля или None)}.
+        """
+        # Все автомобили занимаются одним UPDATE, продажи вставляются
+        # одним INSERT ... SELECT только для занятых автомобилей
+        values = ", ".join("(?, ?)" for _ in cars)
+        params = [value for car in cars for value in car]
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            DECLARE @Requested TABLE (CarID INT PRIMARY KEY, SalePrice DECIMAL(18, 2));
+            DECLARE @Claimed TABLE (CarID INT PRIMARY KEY);
+            DECLARE @Sold TABLE (SaleID INT, CarID INT);
+
+            INSERT INTO @Requested (CarID, SalePrice) VALUES {values};
+
+            UPDATE c SET Status = 'Продано'
+            OUTPUT INSERTED.CarID INTO @Claimed
+            FROM Cars c
+            JOIN @Requested r ON r.CarID = c.CarID
+            WHERE c.Status = 'В наличии';
+
+            INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
+            OUTPUT INSERTED.SaleID, INSERTED.CarID INTO @Sold
+            SELECT r.CarID, ?, ?, r.SalePrice
+            FROM @Requested r
+            JOIN @Claimed cl ON cl.CarID = r.CarID;
+
+            {self.summary_delta("s.SaleID IN (SELECT SaleID FROM @Sold)")}
+
+            SELECT r.CarID, s.SaleID, c.Status
+            FROM @Requested r
+            LEFT JOIN @Sold s ON s.CarID = r.CarID
+            LEFT JOIN Cars c ON c.CarID = r.CarID;
+        """, *params, client_id, employee_id)
+        return {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
+
+    def update_car(self, cursor, car_id, brand, model, year, color, price, status):
+        """Обновить автомобиль, перенеся его продажи в нужные строки сводки"""
+        # Если у автомобиля меняются марка или модель, его продажи
+        # переносятся в другие строки сводки в той же транзакции
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+
+            {self.summary_delta("s.CarID = ?", '-')}
+
+            UPDATE Cars SET Brand=?, Model=?, Year=?, Color=?, Price=?, Status=?
+            WHERE CarID=?;
+
+            {self.summary_delta("s.CarID = ?", '+')}
+        """, car_id, brand, model, year, color, price, status, car_id, car_id)
+
+    def rebuild_sales_summary(self, cursor):
+        """Пересчитать сводку по Sales; вернуть число строк"""
+        # Блокировка Sales на время пересчета: продажи, оформленные
+        # параллельно, не потеряются между DELETE и INSERT
+        cursor.execute(f"""
+            SET NOCOUNT ON;
+            SELECT TOP (0) SaleID FROM Sales WITH (TABLOCKX, HOLDLOCK);
+            DELETE FROM SalesSummary;
+            INSERT INTO SalesSummary (SaleMonth, Brand, Model, EmployeeID, Units, Revenue)
+            {self.sales_rollup()};
+            SELECT COUNT(*) FROM SalesSummary;
+        """)
+        return cursor.fetchone()[0]
+
+
+class _SqliteCursor:
+    """Курсор sqlite3 с вызовами в стиле pyodbc: execute(sql, *params)"""
+
+    def __init__(self, raw):
+        self._raw = raw
+        self.arraysize = 1
+        # Для совместимости с кодом, который включает fast_executemany у pyodbc
+        self.fast_executemany = False
+
+    def execute(self, sql, *params):
+        if len(params) == 1 and isinstance(params[0], (list, tuple)):
+            params = params[0]
+        self._raw.execute(sql, params)
+        return self
+
+    def executemany(self, sql, rows):
+        self._raw.executemany(sql, rows)
+
+    def fetchone(self):
+        return self._raw.fetchone()
+
+    def fetchmany(self, size=None):
+        return self._raw.fetchmany(size or self.arraysize)
+
+    def fetchall(self):
+        return self._raw.fetchall()
+
+    def __iter__(self):
+        return iter(self._raw)
+
+    @property
+    def rowcount(self):
+        return self._raw.rowcount
+
+    @property
+    def lastrowid(self):
+        return self._raw.lastrowid
+
+    @property
+    def description(self):
+        return self._raw.description
+
+    def close(self):
+        self._raw.close()
+
+
+class _SqliteConnection:
+    """Соединение sqlite3 в стиле pyodbc: транзакцию открывает первый запрос записи"""
+
+    def __init__(self, raw):
+        self._raw = raw
+
+    def cursor(self):
+        return _SqliteCursor(self._raw.cursor())
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        try:
+            # Обновить статистику планировщика по накопленным запросам
+            self._raw.execute("PRAGMA optimize")
+        except sqlite3.Error:
+            pass
+        self._raw.close()
+
+
+class SqliteBackend(Backend):
+    """Встроенная база SQLite в файле path; схема доводится до последней версии при первом соединении"""
+
+    name = 'sqlite'
+
+    def __init__(self, path=SQLITE_FILE):
+        self.path = path
+        self.connection_strings = [path]
+        self._schema_ready = False
+        self._lock = threading.Lock()
+
+    def connect(self, connection_string, timeout=None):
+        # Пул передает соединения между потоками, но одновременно
+        # соединением пользуется только один из них
+        raw = sqlite3.connect(connection_string, timeout=timeout or 5, check_same_thread=False,
+                              uri=connection_string.startswith('file:'))
+        try:
+            for pragma in SQLITE_PRAGMAS:
+                raw.execute(pragma)
+            with self._lock:
+                if not self._schema_ready:
+                    schema.upgrade(_SqliteConnection(raw), self.name)
+                    self._schema_ready = True
+        except Exception:
+            raw.close()
+            raise
+        return _SqliteConnection(raw)
+
+    def concat(self, *parts):
+        return ' || '.join(parts)
+
+    def month(self, column):
+        return f"substr({column}, 1, 7)"
+
+    def page(self, select, rest, params, limit):
+        return f"SELECT {select}\n{rest}\nLIMIT ?", [*params, int(limit)]
+
+    def is_contention_error(self, error):
+        # Другое соединение держит блокировку записи дольше timeout
+        return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+    def _apply_delta(self, cursor, where, params, sign='+'):
+        rollup = self.sales_rollup(f"WHERE {where}")
+        cursor.execute(SQLITE_SUMMARY_DELTA_SQL.format(rollup=rollup, sign=sign), *params)
+        if sign == '-':
+            # Прибавление не может обнулить строку
+            cursor.execute(SQLITE_SUMMARY_EMPTIED_SQL.format(rollup=rollup), *params)
+
+    def _insert_sale(self, cursor, car_id, client_id, employee_id, sale_price):
+        cursor.execute("""
+            INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
+            VALUES (?, ?, ?, ?)
+        """, car_id, client_id, employee_id, sale_price)
+        return cursor.lastrowid
+
+    def insert_sale(self, cursor, car_id, client_id, employee_id, sale_price):
+        sale_id = self._insert_sale(cursor, car_id, client_id, employee_id, sale_price)
+        self._apply_delta(cursor, "s.SaleID = ?", [sale_id])
+
+    def claim_sale(self, cursor, car_id, client_id, employee_id, sale_price):
+        # UPDATE берет блокировку записи всей базы до конца транзакции,
+        # поэтому вторая продажа того же автомобиля увидит 0 строк
+        cursor.execute("UPDATE Cars SET Status = 'Продано' WHERE CarID = ? AND Status = 'В наличии'", car_id)
+        if cursor.rowcount != 1:
+            row = cursor.execute("SELECT Status FROM Cars WHERE CarID = ?", car_id).fetchone()
+            return None, row[0] if row else None
+        sale_id = self._insert_sale(cursor, car_id, client_id, employee_id, sale_price)
+        self._apply_delta(cursor, "s.SaleID = ?", [sale_id])
+        return sale_id, 'Продано'
+
+    def sell_fleet(self, cursor, cars, client_id, employee_id):
+        sold = {}
+        for car_id, price in cars:
+            cursor.execute("UPDATE Cars SET Status = 'Продано' WHERE CarID = ? AND Status = 'В наличии'", car_id)
+            if cursor.rowcount == 1:
+                sold[car_id] = self._insert_sale(cursor, car_id, client_id, employee_id, price)
+        if sold:
+            # Пока транзакция держит блокировку записи, новые SaleID идут подряд
+            self._apply_delta(cursor, "s.SaleID BETWEEN ? AND ?", [min(sold.values()), max(sold.values())])
+
+        results = {}
+        for car_id, _ in cars:
+            if car_id in sold:
+                results[car_id] = (sold[car_id], 'Продано')
+            else:
+                row = cursor.execute("SELECT Status FROM Cars WHERE CarID = ?", car_id).fetchone()
+                results[car_id] = (None, row[0] if row else None)
+        return results
+
+    def update_car(self, cursor, car_id, brand, model, year, color, price, status):
+        self._apply_delta(cursor, "s.CarID = ?", [car_id], '-')
+        cursor.execute("""
+            UPDATE Cars SET Brand=?, Model=?, Year=?, Color=?, Price=?, Status=?
+            WHERE CarID=?
+        """, brand, model, year, color, price, status, car_id)
+        self._apply_delta(cursor, "s.CarID = ?", [car_id])
+
+    def rebuild_sales_summary(self, cursor):
+        # DELETE открывает транзакцию записи: параллельные продажи ждут ее конца
+        cursor.execute("DELETE FROM SalesSummary")
+        cursor.execute(f"""
+            INSERT INTO SalesSummary (SaleMonth, Brand, Model, EmployeeID, Units, Revenue)
+            {self.sales_rollup()}
+        """)
+        return cursor.execute("SELECT COUNT(*) FROM SalesSummary").fetchone()[0]
+
+
+def backend_from_config(value=None):
+    """Хранилище по строке настройки (по умолчанию - из AUTOTRADE_DATABASE).
+
+    'sqlserver' (или пусто) - SQL Server со строками CONNECTION_STRINGS,
+    'sqlite' - файл SQLITE_FILE, 'sqlite:путь' - указанный файл SQLite.
+    """
+    if value is None:
+        value = os.environ.get(DATABASE_ENV, '')
+    kind, _, location = value.strip().partition(':')
+    kind = kind.lower() or 'sqlserver'
+    if kind == 'sqlserver':
+        return SqlServerBackend()
+    if kind == 'sqlite':
+        return SqliteBackend(location or SQLITE_FILE)
+    raise ValueError(f"Неизвестное хранилище в {DATABASE_ENV}: {value}")
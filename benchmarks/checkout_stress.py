@@ -0,0 +1,147 @@
+"""Нагрузочная проверка оформления продаж.
+
+N продавцов одновременно пытаются продать одни и те же тестовые автомобили.
+Скрипт печатает пропускную способность и проверяет, что ни один автомобиль
+не продан дважды. Тестовые автомобили и продажи после прогона удаляются.
+
+    python benchmarks/checkout_stress.py --client-id 1 --employee-id 1 --sellers 8 --cars 50
+
+С флагом --legacy продажи оформляются прежним способом (SELECT Status,
+INSERT, UPDATE отдельными запросами) для сравнения.
+"""
+import argparse
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+
+TEST_BRAND = 'STRESS-TEST'
+
+
+def legacy_sale(db, client_id, car_id, employee_id, sale_price):
+    """Прежняя продажа: проверка и запись разными запросами"""
+    def work(conn):
+        cursor = conn.cursor()
+        cursor.execute("SELECT Status FROM Cars WHERE CarID = ?", car_id)
+        car = cursor.fetchone()
+        if not car or car[0] != 'В наличии':
+            return False, "Автомобиль уже продан или недоступен"
+        cursor.execute("""
+            INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
+            VALUES (?, ?, ?, ?)
+        """, car_id, client_id, employee_id, sale_price)
+        cursor.execute("UPDATE Cars SET Status='Продано' WHERE CarID=?", car_id)
+        conn.commit()
+        return True, "Продажа успешно оформлена"
+
+    try:
+        return db._run(work)
+    except Exception as e:
+        return False, str(e)
+
+
+def create_cars(db, count):
+    for i in range(count):
+        db.add_car(TEST_BRAND, f"Model {i}", 2024, 'white', 1000 + i)
+    return [car[0] for car in db.query_cars(brand=TEST_BRAND)]
+
+
+def cleanup(db, car_ids):
+    def work(conn):
+        cursor = conn.cursor()
+        for car_id in car_ids:
+            cursor.execute("DELETE FROM Sales WHERE CarID = ?", car_id)
+            cursor.execute("DELETE FROM Cars WHERE CarID = ?", car_id)
+        conn.commit()
+
+    db._run(work)
+
+
+def count_sales(db, car_ids):
+    """Число продаж по каждому тестовому автомобилю"""
+    def work(conn):
+        cursor = conn.cursor()
+        counts = Counter()
+        for car_id in car_ids:
+            cursor.execute("SELECT COUNT(*) FROM Sales WHERE CarID = ?", car_id)
+            counts[car_id] = cursor.fetchone()[0]
+        return counts
+
+    return db._run(work)
+
+
+def run(args):
+    db = Database(pool_size=args.sellers)
+    if db.pool is None:
+        print("Нет соединения с базой данных")
+        return 2
+
+    sell = db.create_sale_from_selection
+    if args.legacy:
+        sell = lambda *sale: legacy_sale(db, *sale)
+
+    car_ids = create_cars(db, args.cars)
+    successes = Counter()
+    failures = Counter()
+    lock = threading.Lock()
+    start_barrier = threading.Barrier(args.sellers)
+
+    def seller(seed):
+        order = list(car_ids)
+        random.Random(seed).shuffle(order)
+        start_barrier.wait()
+        for car_id in order:
+            ok, message = sell(args.client_id, car_id, args.employee_id, 1000)
+            with lock:
+                if ok:
+                    successes[car_id] += 1
+                else:
+                    failures[message] += 1
+
+    threads = [threading.Thread(target=seller, args=(seed,)) for seed in range(args.sellers)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    try:
+        stored = count_sales(db, car_ids)
+        attempts = args.sellers * len(car_ids)
+        double_sales = [car_id for car_id, count in stored.items() if count > 1]
+
+        print(f"Режим: {'legacy' if args.legacy else 'atomic'}")
+        print(f"Продавцов: {args.sellers}, автомобилей: {len(car_ids)}, попыток: {attempts}")
+        print(f"Время: {elapsed:.2f} с, {attempts / elapsed:.1f} попыток/с, "
+              f"{sum(successes.values()) / elapsed:.1f} продаж/с")
+        print(f"Успешных продаж: {sum(successes.values())}, в базе: {sum(stored.values())}")
+        for message, count in failures.most_common():
+            print(f"  отказ ({count}): {message}")
+        print(f"Двойных продаж: {len(double_sales)}")
+        return 1 if double_sales else 0
+    finally:
+        if not args.keep:
+            cleanup(db, car_ids)
+        db.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--client-id', type=int, required=True)
+    parser.add_argument('--employee-id', type=int, required=True)
+    parser.add_argument('--sellers', type=int, default=8)
+    parser.add_argument('--cars', type=int, default=50)
+    parser.add_argument('--legacy', action='store_true', help="старый способ оформления продажи")
+    parser.add_argument('--keep', action='store_true', help="не удалять тестовые данные")
+    sys.exit(run(parser.parse_args()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,295 @@
+"""Замеры всех публичных методов Database на встроенном SQLite (SqliteBackend).
+
+База заполняется синтетическими данными datagen.py нужного масштаба (1k,
+100k, 1m автомобилей; клиентов, продаж и заявок пропорционально меньше) -
+теми же, что и в нагрузочных проверках, затем
+каждый метод вызывается несколько раз: медиана времени и пик памяти
+(tracemalloc, отдельным вызовом) сравниваются с сохраненной базовой
+линией. Если метод стал медленнее или прожорливее допуска, скрипт
+перечисляет регрессии и завершается с кодом 1.
+
+Кэш запросов отключен, карта сущностей очищается перед каждым вызовом,
+поэтому замеряется путь до базы. Методы, завершившиеся ошибкой,
+отмечаются и в сравнение с базовой линией не входят.
+
+    python benchmarks/database_benchmark.py --scale 1k 100k
+    python benchmarks/database_benchmark.py --scale 1m          # ~2 мин
+    python benchmarks/database_benchmark.py --scale 1k --update-baseline
+"""
+import argparse
+import inspect
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+from backends import SqliteBackend  # noqa: E402
+from database import Database  # noqa: E402
+
+BASELINE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Методы, которые не обращаются к базе
+NOT_QUERIES = {'connect', 'ensure_connection', 'close', 'cache_stats', 'query_stats', 'hash_password', 'peek_car'}
+
+PASSWORD = datagen.PASSWORD
+
+
+def seed(path, cars, seed_value=0):
+    """Заполнить базу SQLite данными datagen (cars автомобилей), вернуть {таблица: строк}"""
+    db = Database(backend=SqliteBackend(path), cache_file=None, query_cache_size=0, slow_query_log=None)
+    try:
+        if not db.ensure_connection():
+            raise SystemExit(f"Не удалось открыть {path}")
+        counts = datagen.load(db, datagen.DataGenerator(cars, seed=seed_value))
+        db.rebuild_sales_summary()
+    finally:
+        db.close()
+    return counts
+
+
+class Context:
+    """Сведения о заполненной базе и счетчики для методов записи"""
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.rnd = random.Random(1)
+        self.serial = 0
+
+    def next(self):
+        self.serial += 1
+        return self.serial
+
+    def car_id(self):
+        return self.rnd.randint(1, self.counts['Cars'])
+
+    def client_id(self):
+        return self.rnd.randint(1, self.counts['Clients'])
+
+    def employee_id(self):
+        return self.rnd.randint(1, self.counts['Employees'])
+
+    def request_id(self):
+        return self.rnd.randint(1, self.counts['PurchaseRequests'])
+
+
+def new_car(db, ctx):
+    db.add_car('BENCH', f"Model {ctx.next()}", 2020, 'Белый', 1000000)
+    return db._fetchone("SELECT MAX(CarID) FROM Cars")[0]
+
+
+def new_client(db, ctx):
+    name = f"bench{ctx.next()}"
+    db.register_user('Bench', 'Client', '+70000000000', f"{name}@example.com", name, PASSWORD, 'Client')
+    return db._fetchone("SELECT MAX(ClientID) FROM Clients")[0]
+
+
+def new_employee(db, ctx):
+    name = f"benchemp{ctx.next()}"
+    db.register_user('Bench', 'Employee', '+70000000000', f"{name}@example.com", name, PASSWORD, 'Manager', 'Менеджер')
+    return db._fetchone("SELECT MAX(EmployeeID) FROM Employees")[0]
+
+
+def new_request(db, ctx):
+    db.add_purchase_request(ctx.client_id(), ctx.car_id(), 'Kia', 'Rio', 2000000)
+    return db._fetchone("SELECT MAX(RequestID) FROM PurchaseRequests")[0]
+
+
+def consume(iterator):
+    """Дочитать генератор, вернуть число строк"""
+    return sum(1 for _ in iterator)
+
+
+# Метод -> (подготовка(db, ctx) -> аргументы, вызов(db, *аргументы)).
+# Подготовка не входит в замер.
+CASES = {
+    'login_user': (lambda db, ctx: (f"client{ctx.client_id()}",),
+                   lambda db, username: db.login_user(username, PASSWORD, 'Client')),
+    'register_user': (lambda db, ctx: (f"reg{ctx.next()}",),
+                      lambda db, name: db.register_user('Bench', 'User', '+70000000000', f"{name}@example.com",
+                                                        name, PASSWORD, 'Client')),
+    'get_all_cars': (None, lambda db: db.get_all_cars()),
+    'iter_all_cars': (None, lambda db: consume(db.iter_all_cars())),
+    'iter_car_batches': (None, lambda db: consume(db.iter_car_batches(batch_size=10000))),
+    'get_available_cars': (None, lambda db: db.get_available_cars()),
+    'query_cars': (None, lambda db: db.query_cars(status='В наличии', brand='Kia', price_to=3000000,
+                                                  sort_by='Price')),
+    'get_cars_page': (None, lambda db: db.get_cars_page(limit=200, sort_by='Brand', status='В наличии')),
+    'cars_cursor': (None, lambda db: db.cars_cursor(200, 'Price', True).first()),
+    'add_car': (None, lambda db: db.add_car('BENCH', 'Model', 2020, 'Белый', 1000000)),
+    'add_cars': (None, lambda db: db.add_cars([('BENCH', f"Model {i}", 2020, 'Белый', 1000000.0, 'В наличии')
+                                               for i in range(1000)])),
+    'update_car': (lambda db, ctx: (new_car(db, ctx),),
+                   lambda db, car_id: db.update_car(car_id, 'BENCH', 'Updated', 2021, 'Черный', 1100000,
+                                                    'В наличии')),
+    'delete_car': (lambda db, ctx: (new_car(db, ctx),), lambda db, car_id: db.delete_car(car_id)),
+    'get_car_by_id': (lambda db, ctx: (ctx.car_id(),), lambda db, car_id: db.get_car_by_id(car_id)),
+    'get_car_brands': (None, lambda db: db.get_car_brands()),
+    'get_car_colors': (None, lambda db: db.get_car_colors()),
+    'get_all_clients': (None, lambda db: db.get_all_clients()),
+    'iter_all_clients': (None, lambda db: consume(db.iter_all_clients())),
+    'get_clients_page': (None, lambda db: db.get_clients_page(limit=200)),
+    'get_client_by_id': (lambda db, ctx: (ctx.client_id(),), lambda db, client_id: db.get_client_by_id(client_id)),
+    'clients_cursor': (None, lambda db: db.clients_cursor(200).first()),
+    'delete_client': (lambda db, ctx: (new_client(db, ctx),), lambda db, client_id: db.delete_client(client_id)),
+    'get_all_employees': (None, lambda db: db.get_all_employees()),
+    'iter_all_employees': (None, lambda db: consume(db.iter_all_employees())),
+    'get_employees_page': (None, lambda db: db.get_employees_page(limit=200)),
+    'get_employee_by_id': (lambda db, ctx: (ctx.employee_id(),),
+                           lambda db, employee_id: db.get_employee_by_id(employee_id)),
+    'employees_cursor': (None, lambda db: db.employees_cursor(200).first()),
+    'delete_employee': (lambda db, ctx: (new_employee(db, ctx),),
+                        lambda db, employee_id: db.delete_employee(employee_id)),
+    'get_all_sales': (None, lambda db: db.get_all_sales()),
+    'iter_all_sales': (None, lambda db: consume(db.iter_all_sales())),
+    'iter_sale_batches': (None, lambda db: consume(db.iter_sale_batches(batch_size=5000))),
+    'get_sales_page': (None, lambda db: db.get_sales_page(limit=200)),
+    'sales_cursor': (None, lambda db: db.sales_cursor(200).first()),
+    'add_sale': (lambda db, ctx: (new_car(db, ctx), ctx.client_id(), ctx.employee_id()),
+                 lambda db, car_id, client_id, employee_id: db.add_sale(car_id, client_id, employee_id, 1000000)),
+    'get_all_purchase_requests': (None, lambda db: db.get_all_purchase_requests()),
+    'iter_all_purchase_requests': (None, lambda db: consume(db.iter_all_purchase_requests())),
+    'iter_open_request_batches': (None, lambda db: consume(db.iter_open_request_batches(10000))),
+    'get_purchase_requests_page': (None, lambda db: db.get_purchase_requests_page(limit=200)),
+    'purchase_requests_cursor': (None, lambda db: db.purchase_requests_cursor(page_size=200).first()),
+    'get_purchase_request_by_id': (lambda db, ctx: (ctx.request_id(),),
+                                   lambda db, request_id: db.get_purchase_request_by_id(request_id)),
+    'get_available_cars_by_model': (None, lambda db: db.get_available_cars_by_model('Kia', 'Rio')),
+    'add_purchase_request': (lambda db, ctx: (ctx.client_id(), ctx.car_id()),
+                             lambda db, client_id, car_id: db.add_purchase_request(client_id, car_id, 'Kia', 'Rio',
+                                                                                   2000000)),
+    'delete_purchase_request': (lambda db, ctx: (new_request(db, ctx),),
+                                lambda db, request_id: db.delete_purchase_request(request_id)),
+    'get_client_sales': (lambda db, ctx: (ctx.client_id(),), lambda db, client_id: db.get_client_sales(client_id)),
+    'create_sale_from_selection': (lambda db, ctx: (ctx.client_id(), new_car(db, ctx), ctx.employee_id()),
+                                   lambda db, client_id, car_id, employee_id:
+                                   db.create_sale_from_selection(client_id, car_id, employee_id, 1000000)),
+    'create_fleet_sale': (lambda db, ctx: (ctx.client_id(), ctx.employee_id(),
+                                           [(new_car(db, ctx), 1000000) for _ in range(10)]),
+                          lambda db, client_id, employee_id, cars: db.create_fleet_sale(client_id, employee_id, cars)),
+    'rebuild_sales_summary': (None, lambda db: db.rebuild_sales_summary()),
+    'verify_sales_summary': (None, lambda db: db.verify_sales_summary()),
+    'get_sales_summary': (None, lambda db: db.get_sales_summary('model')),
+}
+
+
+def run_case(db, ctx, name, repeat, budget):
+    """Медиана времени (с), пик памяти (байт) и ошибка метода, если была"""
+    setup, call = CASES[name]
+    errors_before = db.query_stats().get(name, {}).get('errors', 0)
+    timings = []
+    started = time.perf_counter()
+    while len(timings) < repeat and (not timings or time.perf_counter() - started < budget):
+        args = setup(db, ctx) if setup else ()
+        db.identity.clear()
+        call_started = time.perf_counter()
+        call(db, *args)
+        timings.append(time.perf_counter() - call_started)
+
+    # Память замеряется отдельно: tracemalloc сильно замедляет выполнение
+    args = setup(db, ctx) if setup else ()
+    db.identity.clear()
+    tracemalloc.start()
+    try:
+        call(db, *args)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    stats = db.query_stats().get(name, {})
+    error = stats.get('last_error') if stats.get('errors', 0) > errors_before else None
+    return statistics.median(timings), peak, error
+
+
+def check_coverage():
+    """Публичные методы Database, для которых нет замера"""
+    public = {name for name, member in vars(Database).items()
+              if not name.startswith('_') and inspect.isfunction(member)}
+    return sorted(public - set(CASES) - NOT_QUERIES)
+
+
+def compare(results, baseline, tolerance, memory_tolerance):
+    """Список регрессий относительно базовой линии"""
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if base is None or result.get('error') or base.get('error'):
+            continue
+        # Небольшой абсолютный запас, чтобы не срабатывать на шум в доли миллисекунды
+        if result['median_ms'] > base['median_ms'] * (1 + tolerance) + 0.5:
+            regressions.append(f"{key}: {base['median_ms']:.2f} -> {result['median_ms']:.2f} мс")
+        if result['peak_kb'] > base['peak_kb'] * (1 + memory_tolerance) + 64:
+            regressions.append(f"{key}: память {base['peak_kb']:.0f} -> {result['peak_kb']:.0f} КБ")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', nargs='+', choices=SCALES, default=['1k'])
+    parser.add_argument('--methods', nargs='+', choices=sorted(CASES), help="только эти методы")
+    parser.add_argument('--repeat', type=int, default=5, help="вызовов каждого метода (не больше)")
+    parser.add_argument('--budget', type=float, default=2.0, help="секунд на замер одного метода")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--update-baseline', action='store_true', help="записать результаты как базовую линию")
+    parser.add_argument('--tolerance', type=float, default=0.5, help="допустимый рост времени (0.5 = +50%%)")
+    parser.add_argument('--memory-tolerance', type=float, default=0.25, help="допустимый рост памяти")
+    args = parser.parse_args()
+
+    missing = check_coverage()
+    if missing:
+        print(f"Нет замеров для методов: {', '.join(missing)}")
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    results = {}
+    for scale in args.scale:
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'bench.db')
+            started = time.perf_counter()
+            counts = seed(path, SCALES[scale])
+            print(f"\nМасштаб {scale}: {counts} (заполнение {time.perf_counter() - started:.1f} с)")
+
+            db = Database(backend=SqliteBackend(path), cache_file=None,
+                          query_cache_size=0, slow_query_log=None)
+            ctx = Context(counts)
+            try:
+                for name in args.methods or CASES:
+                    median, peak, error = run_case(db, ctx, name, args.repeat, args.budget)
+                    key = f"{scale}/{name}"
+                    results[key] = {'median_ms': median * 1000, 'peak_kb': peak / 1024}
+                    if error:
+                        results[key]['error'] = error
+                    note = f"  ошибка: {error[:60]}" if error else ""
+                    print(f"  {name:<30} {median * 1000:10.2f} мс {peak / 1024:10.0f} КБ{note}")
+            finally:
+                db.close()
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump(dict(sorted(baseline.items())), f, ensure_ascii=False, indent=2)
+        print(f"\nБазовая линия обновлена: {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.tolerance, args.memory_tolerance)
+    if regressions:
+        print("\nРегрессии:")
+        for line in regressions:
+            print(f"  {line}")
+        raise SystemExit(1)
+    print("\nРегрессий нет" if baseline else "\nБазовой линии нет: запустите с --update-baseline")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+"""Скорость массового импорта автомобилей.
+
+Генерирует CSV на 10 000 и 100 000 строк, импортирует их через
+importer.import_cars и печатает число строк в секунду. Для сравнения
+первые строки можно вставить по одной через Database.add_car (--single).
+Импортированные автомобили после замера удаляются.
+
+    python benchmarks/import_benchmark.py --sizes 10000 100000 --commit-size 10000
+"""
+import argparse
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import Database  # noqa: E402
+from importer import import_cars  # noqa: E402
+
+TEST_BRAND = 'IMPORT-BENCH'
+MODELS = ['Camry', 'Corolla', 'Rio', 'Solaris', 'Octavia', 'Polo', 'X5', 'A6']
+COLORS = ['Белый', 'Черный', 'Серый', 'Синий', 'Красный']
+
+
+def write_csv(path, count, seed=0):
+    rnd = random.Random(seed)
+    with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f, delimiter=';')
+        writer.writerow(['Марка', 'Модель', 'Год', 'Цвет', 'Цена', 'Статус'])
+        for _ in range(count):
+            writer.writerow([TEST_BRAND, rnd.choice(MODELS), rnd.randint(2005, 2024),
+                             rnd.choice(COLORS), rnd.randint(500, 9000) * 1000, 'В наличии'])
+
+
+def cleanup(db):
+    def work(conn):
+        conn.cursor().execute("DELETE FROM Cars WHERE Brand = ?", TEST_BRAND)
+        conn.commit()
+
+    db._run(work)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    parser.add_argument('--batch-size', type=int, default=1000)
+    parser.add_argument('--commit-size', type=int, default=10000)
+    parser.add_argument('--single', type=int, default=0,
+                        help="сколько строк вставить по одной через add_car для сравнения")
+    args = parser.parse_args()
+
+    db = Database()
+    if db.pool is None:
+        print("Нет соединения с базой данных")
+        sys.exit(2)
+
+    try:
+        if args.single:
+            started = time.perf_counter()
+            for i in range(args.single):
+                db.add_car(TEST_BRAND, 'Single', 2020, 'Белый', 1000 + i)
+            elapsed = time.perf_counter() - started
+            print(f"add_car по одной: {args.single} строк, {args.single / elapsed:,.0f} строк/с")
+            cleanup(db)
+
+        with tempfile.TemporaryDirectory() as directory:
+            for size in args.sizes:
+                path = os.path.join(directory, f"cars_{size}.csv")
+                write_csv(path, size)
+                report = import_cars(db, path, args.batch_size, args.commit_size)
+                print(f"{size:>7} строк: {report.elapsed:.2f} с, {report.rows_per_second:,.0f} строк/с, "
+                      f"добавлено {report.imported}, ошибок {len(report.errors)}")
+                cleanup(db)
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
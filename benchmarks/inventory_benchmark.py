@@ -0,0 +1,65 @@
+"""Скорость фильтрации и сортировки снимка автомобилей (inventory.py).
+
+Снимок заполняется синтетическими автомобилями без обращения к базе.
+
+    python benchmarks/inventory_benchmark.py --rows 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from inventory import InventorySnapshot  # noqa: E402
+from models import Car  # noqa: E402
+
+BRANDS = ['Toyota', 'Kia', 'Hyundai', 'BMW', 'Audi', 'Lada', 'Skoda', 'Volkswagen']
+COLORS = ['Белый', 'Черный', 'Серый', 'Синий', 'Красный']
+STATUSES = ['В наличии', 'Продано', 'На ремонте']
+
+
+def timed(name, func, repeat=5):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = func()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print(f"{name:<45} {best * 1000:8.2f} мс")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    cars = [Car(i, rnd.choice(BRANDS), f"Model {rnd.randint(1, 40)}", rnd.randint(2000, 2024),
+                rnd.choice(COLORS), float(rnd.randint(300, 9000) * 1000), rnd.choice(STATUSES))
+            for i in range(1, args.rows + 1)]
+
+    snapshot = InventorySnapshot()
+    started = time.perf_counter()
+    snapshot.load_rows(cars)
+    print(f"Загрузка {len(snapshot)} автомобилей: {time.perf_counter() - started:.2f} с")
+
+    timed("цена от 1 до 3 млн", lambda: snapshot.query(price_from=1e6, price_to=3e6))
+    timed("марка + год + цвет + статус", lambda: snapshot.query(
+        brand=['Kia', 'Hyundai'], year_from=2015, color='Белый', status='В наличии'))
+    ids = timed("все условия, сортировка по цене (убыв.)", lambda: snapshot.query(
+        'Price', True, brand='Toyota', year_from=2010, price_to=5e6, status='В наличии'))
+    timed("сортировка всех по марке", lambda: snapshot.query('Brand'))
+    timed("первые 50 строк результата", lambda: snapshot.rows(ids[:50]))
+
+    started = time.perf_counter()
+    expected = [car.car_id for car in cars
+                if car.brand == 'Toyota' and car.year >= 2010 and car.price <= 5e6 and car.status == 'В наличии']
+    print(f"{'тот же отбор циклом Python (без сортировки)':<45} {(time.perf_counter() - started) * 1000:8.2f} мс")
+    assert sorted(ids.tolist()) == expected
+
+
+if __name__ == '__main__':
+    main()
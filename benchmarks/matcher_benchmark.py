@@ -0,0 +1,88 @@
+"""Скорость подбора автомобилей под заявки (matcher.py).
+
+Индекс заполняется синтетическими автомобилями и заявками без обращения
+к базе. Для сравнения та же выборка считается перебором всех автомобилей
+для части заявок (полный перебор 100k x 100k занял бы часы).
+
+    python benchmarks/matcher_benchmark.py --cars 100000 --requests 100000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from matcher import RequestMatcher  # noqa: E402
+from models import Car  # noqa: E402
+
+BRANDS = ['Toyota', 'Kia', 'Hyundai', 'BMW', 'Audi', 'Lada', 'Skoda', 'Volkswagen']
+STATUSES = ['В наличии', 'В наличии', 'В наличии', 'Продано', 'На ремонте']
+
+
+def elapsed_ms(started):
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cars', type=int, default=100000)
+    parser.add_argument('--requests', type=int, default=100000)
+    parser.add_argument('--updates', type=int, default=1000, help="изменений цены и статуса")
+    parser.add_argument('--sample', type=int, default=1000, help="заявок для проверки перебором")
+    args = parser.parse_args()
+
+    rnd = random.Random(0)
+    cars = [Car(i, rnd.choice(BRANDS), f"Model {rnd.randint(1, 40)}", rnd.randint(2000, 2024), 'Белый',
+                float(rnd.randint(300, 9000) * 1000), rnd.choice(STATUSES))
+            for i in range(1, args.cars + 1)]
+    requests = [(i, rnd.choice(BRANDS), f"Model {rnd.randint(1, 40)}",
+                 None if rnd.random() < 0.1 else float(rnd.randint(300, 9000) * 1000))
+                for i in range(1, args.requests + 1)]
+
+    matcher = RequestMatcher()
+    started = time.perf_counter()
+    matcher.load(cars, requests)
+    print(f"Индекс и подбор для всех заявок ({args.cars} x {args.requests}): {elapsed_ms(started):8.1f} мс")
+    print(f"  {matcher.stats()}")
+
+    started = time.perf_counter()
+    matcher.load_requests(requests)
+    print(f"{'повторный подбор всех заявок':<45} {elapsed_ms(started):8.1f} мс")
+
+    updated = []
+    for _ in range(args.updates):
+        car = cars[rnd.randrange(len(cars))]
+        car = car._replace(price=float(rnd.randint(300, 9000) * 1000), status=rnd.choice(STATUSES))
+        cars[car.car_id - 1] = car
+        updated.append(car)
+
+    started = time.perf_counter()
+    changed = set()
+    for car in updated:
+        changed |= matcher.update_cars([car])
+    print(f"{f'{args.updates} изменений по одному':<45} {elapsed_ms(started):8.1f} мс "
+          f"(изменился подбор у {len(changed)} заявок)")
+
+    started = time.perf_counter()
+    for request_id, *_ in requests[:args.sample]:
+        matcher.cars_for(request_id, limit=20)
+    print(f"{f'cars_for для {args.sample} заявок':<45} {elapsed_ms(started):8.1f} мс")
+
+    # Проверка и сравнение с перебором
+    started = time.perf_counter()
+    for request_id, brand, model, max_price in requests[:args.sample]:
+        expected = [car for car in cars if car.status == 'В наличии' and car.brand == brand
+                    and car.model == model and (max_price is None or car.price <= max_price)]
+        match = matcher.match(request_id)
+        assert match.count == len(expected), (request_id, match.count, len(expected))
+        if expected:
+            assert match.best.price == min(car.price for car in expected)
+    naive = elapsed_ms(started)
+    print(f"{f'перебор для {args.sample} заявок':<45} {naive:8.1f} мс "
+          f"(на все заявки ~{naive * len(requests) / args.sample / 1000:.0f} с)")
+
+
+if __name__ == '__main__':
+    main()
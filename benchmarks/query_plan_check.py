@@ -0,0 +1,112 @@
+"""Проверка, что запросы Database идут по индексам (schema.INDEXES).
+
+Методы из database_benchmark.CASES вызываются на заполненной базе SQLite;
+каждый выполненный запрос записывается (InstrumentedCursor.statement_listener)
+и разбирается через schema.query_plan. Полный просмотр таблицы в запросе
+с условием - нарушение: ему нужен индекс. Намеренные полные чтения
+(get_all_*, сводки без фильтра) и страницы, которые читаются по порядку
+индекса, нарушениями не считаются (см. schema.find_scans). При нарушениях
+скрипт завершается с кодом 1.
+
+С --configured методы чтения вызываются на базе из настроек
+(AUTOTRADE_DATABASE), на SQL Server план дает SHOWPLAN_XML.
+
+    python benchmarks/query_plan_check.py --scale 100k
+    python benchmarks/query_plan_check.py --configured
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import schema  # noqa: E402
+from backends import SqliteBackend  # noqa: E402
+from database import Database  # noqa: E402
+from database_benchmark import CASES, SCALES, Context, seed  # noqa: E402
+from metrics import InstrumentedCursor  # noqa: E402
+
+# Методы, которые только читают: их можно вызывать на рабочей базе
+READ_ONLY = {name for name, (setup, _) in CASES.items()
+             if setup is None and not name.startswith(('add_', 'rebuild_'))}
+
+
+def collect(db, ctx, names):
+    """Вызвать методы и вернуть различные запросы: [(метод, sql, параметры)]"""
+    statements = {}
+
+    def listener(name, sql, params):
+        statements.setdefault((name, sql), params)
+
+    InstrumentedCursor.statement_listener = listener
+    try:
+        for name in names:
+            setup, call = CASES[name]
+            args = setup(db, ctx) if setup else ()
+            db.identity.clear()
+            call(db, *args)
+    finally:
+        InstrumentedCursor.statement_listener = None
+    return [(name, sql, params) for (name, sql), params in statements.items() if name in names]
+
+
+def check(db, statements, verbose):
+    """Список нарушений: (метод, sql, [(таблица, индекс)])"""
+    dialect = db.backend.name
+    violations = []
+    for name, sql, params in statements:
+        steps = db._run(lambda conn: schema.query_plan(conn, dialect, sql, params))
+        scans = schema.find_scans(sql, steps)
+        if verbose:
+            plan = ', '.join(f"{operation} {table or ''}{f' ({index})' if index else ''}".strip()
+                             for table, operation, index in steps)
+            print(f"  {name:<30} {plan}")
+        if scans:
+            violations.append((name, sql, scans))
+    return violations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='1k',
+                        help="размер базы SQLite (планировщик учитывает статистику)")
+    parser.add_argument('--methods', nargs='+', choices=sorted(CASES), help="только эти методы")
+    parser.add_argument('--configured', action='store_true',
+                        help="методы чтения на базе из настроек вместо временной SQLite")
+    parser.add_argument('--verbose', action='store_true', help="печатать план каждого запроса")
+    args = parser.parse_args()
+
+    names = args.methods or list(CASES)
+    with tempfile.TemporaryDirectory() as directory:
+        if args.configured:
+            names = [name for name in names if name in READ_ONLY]
+            db = Database(cache_file=None, query_cache_size=0, slow_query_log=None)
+            ctx = None
+        else:
+            path = os.path.join(directory, 'plan.db')
+            ctx = Context(seed(path, SCALES[args.scale]))
+            db = Database(backend=SqliteBackend(path), cache_file=None, query_cache_size=0, slow_query_log=None)
+        try:
+            if not db.ensure_connection():
+                raise SystemExit("Нет соединения с базой данных")
+            if db.backend.name == 'sqlite':
+                # Статистика для планировщика, как после PRAGMA optimize на рабочей базе
+                db._run(lambda conn: conn.cursor().execute("ANALYZE"))
+            statements = collect(db, ctx, names)
+            print(f"Запросов: {len(statements)} из {len(names)} методов ({db.backend.name})")
+            violations = check(db, statements, args.verbose)
+        finally:
+            db.close()
+
+    if violations:
+        print("\nПолные просмотры без индекса:")
+        for name, sql, scans in violations:
+            tables = ', '.join(f"{table} ({index})" if index else table for table, index in scans)
+            print(f"  {name}: {tables}\n    {' '.join(sql.split())[:160]}")
+        raise SystemExit(1)
+    print("Все запросы с условием идут по индексам")
+
+
+if __name__ == '__main__':
+    main()
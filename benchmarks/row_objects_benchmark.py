@@ -0,0 +1,90 @@
+"""Стоимость создания и память записей строк на 1 000 000 строк.
+
+Сравниваются кортеж, запись models.Car (namedtuple), словарь и класс
+со __slots__. С флагом --db дополнительно измеряются строки pyodbc
+(Row), прочитанные из таблицы Cars (нужна база с достаточным числом
+автомобилей).
+
+    python benchmarks/row_objects_benchmark.py --rows 1000000
+"""
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models import Car, to_records  # noqa: E402
+
+FIELDS = Car._fields
+
+
+class SlotsCar:
+    __slots__ = FIELDS
+
+    def __init__(self, car_id, brand, model, year, color, price, status):
+        self.car_id = car_id
+        self.brand = brand
+        self.model = model
+        self.year = year
+        self.color = color
+        self.price = price
+        self.status = status
+
+
+def source_rows(count):
+    # Строки как их отдает курсор: общие строковые объекты, разные числа
+    brands = ['Toyota', 'Kia', 'BMW', 'Lada']
+    return [[i, brands[i % 4], 'Model', 2000 + i % 25, 'Белый', 1000.0 + i, 'В наличии']
+            for i in range(count)]
+
+
+def measure(name, build, rows):
+    # Время и память меряются разными прогонами: tracemalloc замедляет создание
+    gc.collect()
+    started = time.perf_counter()
+    result = build(rows)
+    elapsed = time.perf_counter() - started
+    del result
+
+    gc.collect()
+    tracemalloc.start()
+    result = build(rows)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{name:<22} {elapsed:7.3f} с  {size / len(rows):7.1f} байт/строку  "
+          f"{size / 2 ** 20:8.1f} МБ")
+    del result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--db', action='store_true', help="измерить также строки pyodbc из таблицы Cars")
+    args = parser.parse_args()
+
+    rows = source_rows(args.rows)
+    # Значения полей уже созданы курсором, поэтому считается только память самих записей
+    print(f"Строк: {len(rows)}")
+    measure("tuple", lambda rows: [tuple(row) for row in rows], rows)
+    measure("Car (namedtuple)", lambda rows: to_records(Car, rows), rows)
+    measure("dict", lambda rows: [dict(zip(FIELDS, row)) for row in rows], rows)
+    measure("__slots__ class", lambda rows: [SlotsCar(*row) for row in rows], rows)
+
+    if args.db:
+        from database import Database, ALL_CARS_SQL
+
+        db = Database()
+        try:
+            fetch = lambda sql: [row for batch in db._iter_batches(sql, arraysize=10000)
+                                 for row in batch][:args.rows]
+            measure("pyodbc Row (+чтение)", lambda _: fetch(ALL_CARS_SQL), rows)
+            measure("Car (+чтение)", lambda _: to_records(Car, fetch(ALL_CARS_SQL)), rows)
+        finally:
+            db.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,139 @@
+"""Время открытия экранов приложения без участия пользователя.
+
+Скрипт заполняет временную базу SQLite синтетическими данными
+(datagen.py) выбранного масштаба и зерна, запускает на ней приложение,
+входит под сотрудником (или подставляет администратора без входа), по
+очереди открывает экраны и ждет, пока загрузятся их данные. По каждому
+экрану печатаются медианы total, времени запросов, форматирования строк
+и заполнения таблиц (см. screen_timing.py). Масштаб и зерно печатаются
+вместе с замерами и сохраняются в JSON, поэтому прогоны сравнимы.
+С --configured замер идет на базе из настроек (AUTOTRADE_DATABASE).
+
+Если дисплея нет, а в системе есть Xvfb, скрипт сам запускает
+виртуальный дисплей (или запустите его через xvfb-run):
+
+    python benchmarks/screen_benchmark.py --scale 100k --repeat 5
+    python benchmarks/screen_benchmark.py --scale 1m --username employee1
+    python benchmarks/screen_benchmark.py --configured --username admin --password secret --json screens.json
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import datagen  # noqa: E402
+from backends import DATABASE_ENV  # noqa: E402
+from database_benchmark import SCALES, seed  # noqa: E402
+
+SCREENS = ['show_cars', 'refresh_cars', 'show_clients', 'show_employees', 'show_sales', 'refresh_sales',
+           'show_purchase_requests', 'show_sales_dashboard']
+
+
+def start_virtual_display():
+    """Запустить Xvfb, если дисплея нет; вернуть процесс или None"""
+    if os.environ.get('DISPLAY') or sys.platform == 'win32':
+        return None
+    if shutil.which('Xvfb') is None:
+        raise SystemExit("Нет дисплея и не найден Xvfb: установите xvfb или запустите через xvfb-run")
+    display = ':97'
+    process = subprocess.Popen(['Xvfb', display, '-screen', '0', '1280x800x24', '-nolisten', 'tcp'],
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    os.environ['DISPLAY'] = display
+    time.sleep(1)
+    return process
+
+
+def wait_loaded(root, timer, timeout):
+    """Крутить цикл событий Tk, пока текущий экран не загрузится"""
+    deadline = time.monotonic() + timeout
+    while not timer.current.finished:
+        if time.monotonic() > deadline:
+            return False
+        root.update()
+        time.sleep(0.001)
+    root.update()
+    return True
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--scale', choices=SCALES, default='100k', help="масштаб синтетической базы")
+    parser.add_argument('--seed', type=int, default=0, help="зерно datagen")
+    parser.add_argument('--configured', action='store_true', help="база из настроек вместо синтетической")
+    parser.add_argument('--repeat', type=int, default=5, help="открытий каждого экрана")
+    parser.add_argument('--screens', nargs='+', default=SCREENS)
+    parser.add_argument('--username')
+    parser.add_argument('--password', help="для синтетической базы по умолчанию datagen.PASSWORD")
+    parser.add_argument('--timeout', type=float, default=60, help="сколько ждать загрузки экрана, с")
+    parser.add_argument('--json', help="сохранить замеры каждого перехода в JSON")
+    args = parser.parse_args()
+
+    display = start_virtual_display()
+    directory = None
+    try:
+        if args.configured:
+            database = {'database': os.environ.get(DATABASE_ENV) or 'sqlserver'}
+        else:
+            directory = tempfile.TemporaryDirectory()
+            path = os.path.join(directory.name, 'screens.db')
+            started = time.perf_counter()
+            counts = seed(path, SCALES[args.scale], args.seed)
+            database = {'database': 'sqlite', 'scale': args.scale, 'seed': args.seed, 'rows': counts}
+            print(f"Масштаб {args.scale}, зерно {args.seed}: {counts} "
+                  f"(заполнение {time.perf_counter() - started:.1f} с)")
+            # Приложение создает Database само и берет хранилище из окружения
+            os.environ[DATABASE_ENV] = f"sqlite:{path}"
+
+        import tkinter as tk
+        from app import CarDealershipApp
+        from models import User
+
+        root = tk.Tk()
+        app = CarDealershipApp(root)
+        if args.username:
+            password = args.password or (None if args.configured else datagen.PASSWORD)
+            user = app.db.login_user(args.username, password, 'Employee')
+            if not user:
+                raise SystemExit("Не удалось войти: проверьте логин и пароль")
+        else:
+            user = User(0, 'Замер', 'Экранов', 'Admin')
+        app.current_user, app.user_role = user, user.role
+        app.show_main_screen()
+        wait_loaded(root, app.screen_timer, args.timeout)
+        app.screen_timer.history.clear()
+
+        for name in args.screens:
+            for _ in range(args.repeat):
+                getattr(app, name)()
+                if not wait_loaded(root, app.screen_timer, args.timeout):
+                    print(f"{name}: экран не загрузился за {args.timeout} с")
+                    break
+
+        print(', '.join(f"{key}: {value}" for key, value in database.items()))
+        print(app.screen_timer.report())
+        print()
+        print(app.db.metrics.report())
+        if args.json:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump({**database,
+                           'navigations': [navigation.as_dict() for navigation in app.screen_timer.history]},
+                          f, ensure_ascii=False, indent=2)
+
+        app.executor.shutdown()
+        app.db.close()
+        root.destroy()
+    finally:
+        if display is not None:
+            display.terminate()
+        if directory is not None:
+            directory.cleanup()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+
+
+class QueryCache:
+    """LRU-кэш результатов запросов с TTL и счетчиками попаданий.
+
+    Каждая запись помечена тегами (таблицами, от которых она зависит).
+    invalidate(tag) удаляет все записи с этим тегом и увеличивает версию
+    тега, чтобы результат запроса, начатого до записи, не попал в кэш
+    после нее.
+    """
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def versions(self, tags):
+        """Текущие версии тегов (запоминаются перед выполнением запроса)"""
+        with self._lock:
+            return tuple(self._versions.get(tag, 0) for tag in tags)
+
+    def get(self, key):
+        """Вернуть (найдено, значение)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+
+            expires_at, tags, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.misses += 1
+                return False, None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value, ttl, tags, versions=None):
+        """Сохранить значение, если теги не менялись с момента versions"""
+        with self._lock:
+            if versions is not None and versions != tuple(self._versions.get(tag, 0) for tag in tags):
+                return
+            self._entries[key] = (time.monotonic() + ttl, tags, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *tags):
+        """Удалить записи, зависящие от любого из тегов"""
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+            stale = [key for key, (_, entry_tags, _) in self._entries.items()
+                     if any(tag in entry_tags for tag in tags)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """Счетчики кэша"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / total if total else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+
+def cached(ttl, *tags):
+    """Кэшировать результат метода Database на ttl секунд.
+
+    Пустые результаты ([] или None) не кэшируются: методы Database
+    возвращают их и при ошибке соединения, и она не должна
+    закрепиться в кэше на весь TTL.
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            cache = self.cache
+            if cache is None:
+                return method(self, *args, **kwargs)
+
+            key = (method.__name__, args, tuple(sorted(kwargs.items())))
+            found, value = cache.get(key)
+            if not found:
+                versions = cache.versions(tags)
+                value = method(self, *args, **kwargs)
+                if value:
+                    cache.put(key, value, ttl, tags, versions)
+            # Вызывающий код может сортировать список на месте
+            return list(value) if isinstance(value, list) else value
+        return wrapper
+    return decorator
+
+
+def invalidates(*tags):
+    """Сбросить кэшированные запросы по тегам после выполнения метода записи"""
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                if self.cache is not None:
+                    self.cache.invalidate(*tags)
+        return wrapper
+    return decorator
@@ -1,463 +1,1367 @@
-import pyodbc
 import hashlib
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FuturesTimeout
+
+from backends import backend_from_config
+from pool import ConnectionPool
+from paging import PageCursor, seek_condition
+from cache import QueryCache, cached, invalidates
+from identity import IdentityMap, evicts
+from metrics import QueryMetrics, method_names, caller_name
+from models import (Car, Client, Employee, Sale, ClientSale, PurchaseRequest, PurchaseRequestDetails,
+                    User, SummaryRow, CAR_COLUMNS, CLIENT_COLUMNS, EMPLOYEE_COLUMNS, to_records)
+
+# Файл, в котором запоминается сработавшая строка подключения
+CONNECTION_CACHE_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'connection_cache.json')
+
+# Журнал запросов дольше slow_query_threshold секунд (см. metrics.py)
+SLOW_QUERY_LOG = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'slow_queries.log')
+
+# Колонки, по которым разрешена сортировка списка автомобилей
+CAR_SORT_COLUMNS = ('CarID', 'Brand', 'Model', 'Year', 'Color', 'Price', 'Status')
+
+# Колонки Cars, которые могут быть NULL (см. schema.py): их учитывает keyset-пагинация
+CAR_NULLABLE_COLUMNS = ('Year', 'Color', 'Price')
+
+# Полные выборки таблиц для get_all_* и iter_all_*. В {client_name} и
+# {employee_name} подставляется склейка имени в диалекте хранилища
+ALL_CARS_SQL = f"SELECT {CAR_COLUMNS} FROM Cars ORDER BY CarID"
+ALL_CLIENTS_SQL = f"SELECT {CLIENT_COLUMNS} FROM Clients ORDER BY ClientID"
+ALL_EMPLOYEES_SQL = f"SELECT {EMPLOYEE_COLUMNS} FROM Employees ORDER BY EmployeeID"
+ALL_SALES_SQL = """
+    SELECT s.SaleID, c.Brand, c.Model, c.Year, c.Color,
+           {client_name} as ClientName,
+           {employee_name} as EmployeeName,
+           s.SaleDate, s.SalePrice
+    FROM Sales s
+    JOIN Cars c ON s.CarID = c.CarID
+    JOIN Clients cl ON s.ClientID = cl.ClientID
+    JOIN Employees e ON s.EmployeeID = e.EmployeeID
+    ORDER BY s.SaleID
+"""
+# Продажи с ID автомобиля, клиента и сотрудника (для выгрузки, см. export.py)
+SALES_EXPORT_SQL = """
+    SELECT s.SaleID, s.SaleDate, c.CarID, c.Brand, c.Model, c.Year, c.Color,
+           cl.ClientID, {client_name},
+           e.EmployeeID, {employee_name},
+           s.SalePrice
+    FROM Sales s
+    JOIN Cars c ON s.CarID = c.CarID
+    JOIN Clients cl ON s.ClientID = cl.ClientID
+    JOIN Employees e ON s.EmployeeID = e.EmployeeID
+    ORDER BY s.SaleID
+"""
+PURCHASE_REQUESTS_SQL = """
+    SELECT pr.RequestID,
+        {client_name} as ClientName,
+        pr.Brand, pr.Model, pr.MaxPrice, pr.RequestDate, pr.Status
+    FROM PurchaseRequests pr
+    JOIN Clients cl ON pr.ClientID = cl.ClientID
+    {where}
+    ORDER BY pr.RequestID
+"""
+# Открытые заявки для подбора автомобилей (см. matcher.py). Порядок подбору не
+# нужен, поэтому запрос читает только покрывающий индекс IX_PurchaseRequests_Status
+OPEN_REQUESTS_SQL = """
+    SELECT RequestID, Brand, Model, MaxPrice
+    FROM PurchaseRequests
+    WHERE Status = 'Рассматривается'
+"""
+
+# Сводка продаж по месяцу, марке, модели и сотруднику (таблица SalesSummary).
+# Обновляется в той же транзакции, что и продажа, поэтому панель руководителя
+# не сканирует Sales. Запросы к ней - в backends.py.
+
+# Разрезы панели руководителя: выражение группировки (по хранилищу) и нужное для него соединение
+SUMMARY_DIMENSIONS = {
+    'month': (lambda backend: "ss.SaleMonth", ""),
+    'brand': (lambda backend: "ss.Brand", ""),
+    'model': (lambda backend: backend.concat("ss.Brand", "' '", "ss.Model"), ""),
+    'employee': (lambda backend: backend.full_name('e'), "JOIN Employees e ON e.EmployeeID = ss.EmployeeID"),
+}
+
+
+# Больше автомобилей в одной продаже не передать: у SQL Server предел 2100 параметров
+MAX_FLEET_SIZE = 1000
+
+
+def _close_connection_result(future):
+    """Закрыть соединение, которое открылось уже после выбора победителя"""
+    if future.cancelled() or future.exception() is not None:
+        return
+    try:
+        future.result().close()
+    except Exception:
+        pass
+
 
 class Database:
-    def __init__(self):
-        self.connection = None
+    def __init__(self, pool_size=5, idle_timeout=300, max_lifetime=1800, liveness_interval=30,
+                 connect_timeout=5, cache_file=CONNECTION_CACHE_FILE, query_cache_size=256,
+                 slow_query_threshold=0.5, slow_query_log=SLOW_QUERY_LOG, backend=None, identity_size=50000):
+        # Хранилище (backends.py); по умолчанию - из переменной AUTOTRADE_DATABASE
+        self.backend = backend or backend_from_config()
+        # Имена клиента и сотрудника для запросов с {client_name} и {employee_name}
+        self._names = {'client_name': self.backend.full_name('cl'), 'employee_name': self.backend.full_name('e')}
+        self.connection_string = None
+        self.pool = None
+        self.pool_size = pool_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.liveness_interval = liveness_interval
+        self.connect_timeout = connect_timeout
+        self.cache_file = cache_file
+        self.connect_timings = {}
+        self.reconnects = 0
+        # Кэш справочных запросов; None отключает кэширование
+        self.cache = QueryCache(query_cache_size) if query_cache_size else None
+        # Строки автомобилей, клиентов и сотрудников по ID (не больше identity_size, LRU)
+        self.identity = IdentityMap(max_size=identity_size)
+        # Время, строки и байты каждого запроса по методам
+        self.metrics = QueryMetrics(slow_query_threshold, slow_query_log)
+        self._method_names = method_names(type(self))
         self.connect()
-        
+
     def connect(self):
-        """Установка соединения с базой данных"""
-        connection_strings = [
-            'DRIVER={SQL Server};SERVER=localhost;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
-            'DRIVER={SQL Server};SERVER=.;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
-            'DRIVER={SQL Server};SERVER=localhost\\SQLEXPRESS;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
-            'DRIVER={SQL Server};SERVER=.\\SQLEXPRESS;DATABASE=AutoTradeCenter;Trusted_Connection=yes;',
-        ]
-        
-        for conn_str in connection_strings:
+        """Установка соединения с базой данных.
+
+        Сначала пробуется строка подключения, сохраненная при прошлом запуске,
+        затем все известные варианты опрашиваются параллельно. Время каждой
+        стратегии сохраняется в self.connect_timings.
+        """
+        self.connect_timings = {}
+        cached = self._load_cached_connection_string()
+
+        if cached:
+            started = time.perf_counter()
             try:
-                self.connection = pyodbc.connect(conn_str)
-                print(f"Успешное подключение через: {conn_str}")
-                return True
+                connection = self.backend.connect(cached, timeout=self.connect_timeout)
             except Exception as e:
-                print(f"Не удалось подключиться через {conn_str}: {e}")
-                continue
-        
-        print("Все попытки подключения не удались")
-        return False
-    
+                print(f"Сохраненная строка подключения не подошла: {e}")
+                connection = None
+            self.connect_timings['cached'] = time.perf_counter() - started
+
+            if connection is not None:
+                print(f"Успешное подключение через сохраненную строку: {cached} "
+                      f"({self.connect_timings['cached']:.2f} с)")
+                self._create_pool(cached, connection)
+                return True
+
+        candidates = [conn_str for conn_str in self.backend.connection_strings if conn_str != cached]
+        started = time.perf_counter()
+        conn_str, connection = self._probe_connection_strings(candidates)
+        self.connect_timings['parallel'] = time.perf_counter() - started
+
+        if connection is None:
+            print(f"Все попытки подключения не удались ({self.connect_timings['parallel']:.2f} с)")
+            return False
+
+        print(f"Успешное подключение через: {conn_str} ({self.connect_timings['parallel']:.2f} с)")
+        self._save_cached_connection_string(conn_str)
+        self._create_pool(conn_str, connection)
+        return True
+
+    def _probe_connection_strings(self, candidates):
+        """Параллельная проверка строк подключения, возвращает первую успешную"""
+        if not candidates:
+            return None, None
+
+        executor = ThreadPoolExecutor(max_workers=len(candidates))
+        futures = {
+            executor.submit(self.backend.connect, conn_str, timeout=self.connect_timeout): conn_str
+            for conn_str in candidates
+        }
+        winner = None
+
+        try:
+            for future in as_completed(futures, timeout=self.connect_timeout + 1):
+                conn_str = futures[future]
+                try:
+                    connection = future.result()
+                except Exception as e:
+                    print(f"Не удалось подключиться через {conn_str}: {e}")
+                    continue
+                winner = (conn_str, connection)
+                break
+        except FuturesTimeout:
+            print(f"Превышено время ожидания подключения ({self.connect_timeout} с)")
+        finally:
+            # Опоздавшие успешные попытки больше не нужны
+            for future in futures:
+                if winner is None or futures[future] != winner[0]:
+                    future.add_done_callback(_close_connection_result)
+            executor.shutdown(wait=False)
+
+        return winner if winner else (None, None)
+
+    def _load_cached_connection_string(self):
+        """Строка подключения, сработавшая при прошлом запуске с тем же хранилищем"""
+        if not self.cache_file or not os.path.exists(self.cache_file):
+            return None
+        try:
+            with open(self.cache_file, encoding='utf-8') as f:
+                saved = json.load(f)
+            cached = saved.get('connection_string')
+            # Строка другого хранилища или уже не из списка (например, другой файл SQLite)
+            if saved.get('backend', 'sqlserver') != self.backend.name:
+                return None
+            if cached not in self.backend.connection_strings:
+                return None
+            return cached
+        except Exception as e:
+            print(f"Не удалось прочитать {self.cache_file}: {e}")
+            return None
+
+    def _save_cached_connection_string(self, conn_str):
+        """Запомнить рабочую строку подключения для следующих запусков"""
+        if not self.cache_file:
+            return
+        try:
+            with open(self.cache_file, 'w', encoding='utf-8') as f:
+                json.dump({'backend': self.backend.name, 'connection_string': conn_str}, f, ensure_ascii=False, indent=2)
+        except Exception as e:
+            print(f"Не удалось сохранить {self.cache_file}: {e}")
+
+    def _create_pool(self, conn_str, first_connection):
+        """Создание пула соединений для найденной строки подключения"""
+        if self.pool is not None:
+            self.pool.close()
+
+        self.connection_string = conn_str
+        self.pool = ConnectionPool(
+            lambda: self.backend.connect(conn_str, timeout=self.connect_timeout),
+            max_size=self.pool_size,
+            idle_timeout=self.idle_timeout,
+            max_lifetime=self.max_lifetime,
+            validate=self._ping,
+            validate_interval=self.liveness_interval,
+        )
+        self.pool.add(first_connection)
+
+    def _ping(self, connection):
+        """Проверка живости соединения, простоявшего дольше liveness_interval"""
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        cursor.fetchone()
+        return True
+
     def ensure_connection(self):
-        """Проверка и восстановление соединения"""
-        try:
-            if self.connection is None:
-                return self.connect()
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT 1")
-            return True
-        except Exception:
+        """Проверка наличия пула соединений (без запроса к серверу)"""
+        if self.pool is None:
             return self.connect()
-    
+        return True
+
+    def close(self):
+        """Закрытие всех соединений пула"""
+        if self.pool is not None:
+            self.pool.close()
+            self.pool = None
+
+    def _run(self, work, retry=False):
+        """Выполнить work(connection) на соединении из пула.
+
+        Запрос отправляется сразу, без предварительного SELECT 1. Если связь
+        с сервером оборвалась, соединение выбрасывается из пула, и при
+        retry=True (чтение или идемпотентная запись) work выполняется
+        еще раз на новом соединении.
+        """
+        attempts = 2 if retry else 1
+        with self.metrics.measure(self._operation_name()) as operation:
+            for attempt in range(attempts):
+                conn = self.pool.acquire()
+                try:
+                    result = work(self.metrics.wrap(conn.raw, operation))
+                except Exception as e:
+                    disconnected = self.backend.is_disconnect_error(e)
+                    self.pool.release(conn, broken=disconnected)
+                    if not disconnected:
+                        raise
+                    # Остальные простаивающие соединения, скорее всего, тоже мертвы
+                    self.pool.discard_idle()
+                    if attempt + 1 == attempts:
+                        raise
+                    self.reconnects += 1
+                    operation.reconnects += 1
+                    print(f"Соединение потеряно, повторяем запрос: {e}")
+                    continue
+                self.pool.release(conn)
+                return result
+
+    def _operation_name(self):
+        """Метод Database (или внешняя функция), от имени которого идет запрос"""
+        return caller_name(self._method_names, __file__, depth=3)
+
+    def _fetchall(self, sql, *params, record=None):
+        """Выполнить запрос на чтение и вернуть все строки (записями record, если он задан)"""
+        rows = self._run(lambda conn: conn.cursor().execute(sql, *params).fetchall(), retry=True)
+        return to_records(record, rows) if record is not None else rows
+
+    def _fetchone(self, sql, *params, record=None):
+        """Выполнить запрос на чтение и вернуть одну строку (записью record, если он задан)"""
+        row = self._run(lambda conn: conn.cursor().execute(sql, *params).fetchone(), retry=True)
+        return record._make(row) if record is not None and row is not None else row
+
+    def _iter_batches(self, sql, *params, arraysize=1000):
+        """Выполнить запрос на чтение и отдавать строки пачками по arraysize.
+
+        Соединение занято, пока генератор читают, и возвращается в пул,
+        когда строки кончились или генератор закрыт. Повтор при обрыве
+        связи невозможен: часть строк уже отдана вызывающему коду.
+        """
+        # Метод для замера определяется сразу: генератор начнет работу,
+        # когда вызвавший его метод уже вернет управление
+        return self._stream_batches(self._operation_name(), sql, params, arraysize)
+
+    def _stream_batches(self, name, sql, params, arraysize):
+        if not self.ensure_connection():
+            return
+        # В замер входит только время сервера и драйвера, не обработка пачек
+        operation = self.metrics.start(name)
+        elapsed = 0.0
+        conn = self.pool.acquire()
+        broken = False
+        try:
+            started = time.perf_counter()
+            cursor = self.metrics.wrap(conn.raw, operation).cursor()
+            cursor.arraysize = arraysize
+            cursor.execute(sql, *params)
+            while True:
+                rows = cursor.fetchmany(arraysize)
+                elapsed += time.perf_counter() - started
+                if not rows:
+                    break
+                yield rows
+                started = time.perf_counter()
+        except Exception as e:
+            operation.error = f"{type(e).__name__}: {e}"
+            broken = self.backend.is_disconnect_error(e)
+            raise
+        finally:
+            self.pool.release(conn, broken=broken)
+            self.metrics.finish(operation, elapsed)
+
+    def _iter_rows(self, sql, *params, batch_size=1000, record=None):
+        """То же, что _iter_batches, но по одной строке (записями record, если он задан)"""
+        return self._stream_rows(self._iter_batches(sql, *params, arraysize=batch_size), record)
+
+    @staticmethod
+    def _stream_rows(batches, record):
+        for rows in batches:
+            yield from (map(record._make, rows) if record is not None else rows)
+
+    def _fetch_page(self, select, source, key_columns, conditions=(), params=(),
+                    descending=False, after=None, before=None, limit=100, record=None, nullable=()):
+        """Страница выборки по ключу сортировки (keyset-пагинация).
+
+        Возвращает не более limit строк сразу после ключа after или сразу
+        перед ключом before, в порядке отображения. Сервер читает только
+        нужную страницу по индексу, без OFFSET и без полной выборки.
+        nullable - колонки ключа, которые могут быть NULL (см. seek_condition).
+        """
+        conditions = list(conditions)
+        params = list(params)
+        backwards = after is None and before is not None
+        boundary = before if backwards else after
+
+        if boundary is not None:
+            condition, seek_params = seek_condition(key_columns, list(boundary), descending, backwards, nullable)
+            conditions.append(condition)
+            params.extend(seek_params)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        direction = "DESC" if descending != backwards else "ASC"
+        order = ', '.join(f"{column} {direction}" for column in key_columns)
+
+        sql, params = self.backend.page(select, f"""
+            FROM {source}
+            {where}
+            ORDER BY {order}
+        """, params, limit)
+        rows = self._fetchall(sql, *params, record=record)
+        # При движении назад строки читаются в обратном порядке
+        return rows[::-1] if backwards else rows
+
+    def cache_stats(self):
+        """Счетчики кэша запросов"""
+        return self.cache.stats() if self.cache is not None else {}
+
+    def query_stats(self):
+        """Замеры запросов по методам: вызовы, ошибки, строки, байты, p50/p95/p99"""
+        return self.metrics.snapshot()
+
+    def _remember(self, kind, rows, snapshot):
+        """Сохранить записи списочного запроса в карте сущностей"""
+        self.identity.put_many(kind, rows, snapshot)
+        return rows
+
     def hash_password(self, password):
         """Хеширование пароля"""
         return hashlib.sha256(password.encode()).hexdigest()
-    
+
+    @invalidates('clients', 'employees')
     def register_user(self, first_name, last_name, phone, email, username, password, role, position=None):
         """Регистрация пользователя"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
+
             password_hash = self.hash_password(password)
-            
-            if role == 'Client':
-                cursor.execute("SELECT ClientID FROM Clients WHERE Username = ?", username)
-                if cursor.fetchone():
-                    return False, "Логин уже занят"
-                
-                cursor.execute("""
-                    INSERT INTO Clients (FirstName, LastName, Phone, Email, Username, PasswordHash)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, first_name, last_name, phone, email, username, password_hash)
-            else:
-                cursor.execute("SELECT EmployeeID FROM Employees WHERE Username = ?", username)
-                if cursor.fetchone():
-                    return False, "Логин уже занят"
-                
-                cursor.execute("""
-                    INSERT INTO Employees (FirstName, LastName, Position, Phone, Email, Username, PasswordHash, Role)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """, first_name, last_name, position, phone, email, username, password_hash, role)
-            
-            self.connection.commit()
-            return True, "Регистрация успешна"
+            attempts = []
+
+            def registered(row, expected):
+                # Связь оборвалась после commit первой попытки: строка уже записана
+                # с теми же данными, и логин "занят" самой этой регистрацией
+                return len(attempts) > 1 and tuple(row) == expected
+
+            def work(conn):
+                attempts.append(None)
+                cursor = conn.cursor()
+                if role == 'Client':
+                    cursor.execute("""
+                        SELECT FirstName, LastName, Phone, Email, PasswordHash
+                        FROM Clients WHERE Username = ?
+                    """, username)
+                    row = cursor.fetchone()
+                    if row:
+                        if registered(row, (first_name, last_name, phone, email, password_hash)):
+                            return True, "Регистрация успешна"
+                        return False, "Логин уже занят"
+
+                    cursor.execute("""
+                        INSERT INTO Clients (FirstName, LastName, Phone, Email, Username, PasswordHash)
+                        VALUES (?, ?, ?, ?, ?, ?)
+                    """, first_name, last_name, phone, email, username, password_hash)
+                else:
+                    cursor.execute("""
+                        SELECT FirstName, LastName, Position, Phone, Email, PasswordHash, Role
+                        FROM Employees WHERE Username = ?
+                    """, username)
+                    row = cursor.fetchone()
+                    if row:
+                        if registered(row, (first_name, last_name, position, phone, email, password_hash, role)):
+                            return True, "Регистрация успешна"
+                        return False, "Логин уже занят"
+
+                    cursor.execute("""
+                        INSERT INTO Employees (FirstName, LastName, Position, Phone, Email, Username, PasswordHash, Role)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, first_name, last_name, position, phone, email, username, password_hash, role)
+
+                conn.commit()
+                return True, "Регистрация успешна"
+
+            # Повтор после обрыва связи: если первая попытка успела записать
+            # строку, повтор находит ее и не принимает за чужой логин
+            return self._run(work, retry=True)
         except Exception as e:
             return False, f"Ошибка регистрации: {str(e)}"
-    
+
     def login_user(self, username, password, role):
         """Авторизация пользователя"""
         try:
             if not self.ensure_connection():
                 return None
-            
-            cursor = self.connection.cursor()
+
             password_hash = self.hash_password(password)
-            
+
             if role == 'Client':
-                cursor.execute("""
-                    SELECT ClientID, FirstName, LastName FROM Clients 
+                return self._fetchone("""
+                    SELECT ClientID, FirstName, LastName, 'Client' FROM Clients
                     WHERE Username = ? AND PasswordHash = ?
-                """, username, password_hash)
+                """, username, password_hash, record=User)
             else:
-                cursor.execute("""
-                    SELECT EmployeeID, FirstName, LastName, Role FROM Employees 
+                return self._fetchone("""
+                    SELECT EmployeeID, FirstName, LastName, Role FROM Employees
                     WHERE Username = ? AND PasswordHash = ?
-                """, username, password_hash)
-            
-            return cursor.fetchone()
+                """, username, password_hash, record=User)
         except Exception as e:
             print(f"Ошибка авторизации: {e}")
             return None
-    
+
+    @cached(30, 'cars')
     def get_all_cars(self):
         """Получить все автомобили"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT * FROM Cars ORDER BY CarID")
-            return cursor.fetchall()
+
+            snapshot = self.identity.snapshot('car')
+            return self._remember('car', self._fetchall(ALL_CARS_SQL, record=Car), snapshot)
         except Exception as e:
             print(f"Ошибка получения автомобилей: {e}")
             return []
-    
+
+    def iter_all_cars(self, batch_size=1000):
+        """Все автомобили по одной строке, читаются с сервера пачками по batch_size.
+
+        Соединение занято, пока генератор не дочитан или не закрыт; ошибки
+        базы данных передаются вызывающему коду.
+        """
+        return self._iter_rows(ALL_CARS_SQL, batch_size=batch_size, record=Car)
+
+    def iter_car_batches(self, after_id=None, car_ids=None, status=None, batch_size=1000):
+        """Автомобили пачками (списками Car) по порядку CarID - для снимков в памяти.
+
+        after_id - только CarID больше него, car_ids - только эти автомобили
+        (запрашиваются частями по 1000: у SQL Server не больше 2100
+        параметров), status - только с этим статусом. Соединение занято,
+        пока генератор не дочитан или не закрыт; ошибки базы данных
+        передаются вызывающему коду.
+        """
+        conditions, params = [], []
+        if after_id is not None:
+            conditions.append("CarID > ?")
+            params.append(int(after_id))
+        if status is not None:
+            conditions.append("Status = ?")
+            params.append(status)
+        if car_ids is None:
+            chunks = [None]
+        else:
+            car_ids = [int(car_id) for car_id in car_ids]
+            chunks = [car_ids[start:start + 1000] for start in range(0, len(car_ids), 1000)]
+        for chunk in chunks:
+            chunk_conditions = conditions if chunk is None else \
+                conditions + [f"CarID IN ({', '.join('?' for _ in chunk)})"]
+            where = f"WHERE {' AND '.join(chunk_conditions)}" if chunk_conditions else ""
+            sql = f"SELECT {CAR_COLUMNS} FROM Cars {where} ORDER BY CarID"
+            for rows in self._iter_batches(sql, *params, *(chunk or ()), arraysize=batch_size):
+                yield [Car._make(row) for row in rows]
+
+    @cached(60, 'cars')
     def get_available_cars(self):
         """Получить автомобили в наличии"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT CarID, Brand, Model, Year, Color, Price 
-                FROM Cars 
+
+            snapshot = self.identity.snapshot('car')
+            rows = self._fetchall(f"""
+                SELECT {CAR_COLUMNS}
+                FROM Cars
                 WHERE Status = 'В наличии'
                 ORDER BY Brand, Model
-            """)
-            return cursor.fetchall()
+            """, record=Car)
+            return self._remember('car', rows, snapshot)
         except Exception as e:
             print(f"Ошибка получения доступных автомобилей: {e}")
             return []
-    
+
+    def _car_filters(self, status=None, brand=None, model=None, year_from=None, year_to=None,
+                     price_from=None, price_to=None, color=None):
+        """Условие WHERE и параметры для фильтров списка автомобилей"""
+        conditions = []
+        params = []
+        if status:
+            conditions.append("Status = ?")
+            params.append(status)
+        if brand:
+            conditions.append("Brand = ?")
+            params.append(brand)
+        if model:
+            conditions.append("Model = ?")
+            params.append(model)
+        if color:
+            conditions.append("Color = ?")
+            params.append(color)
+        if year_from is not None:
+            conditions.append("Year >= ?")
+            params.append(int(year_from))
+        if year_to is not None:
+            conditions.append("Year <= ?")
+            params.append(int(year_to))
+        if price_from is not None:
+            conditions.append("Price >= ?")
+            params.append(float(price_from))
+        if price_to is not None:
+            conditions.append("Price <= ?")
+            params.append(float(price_to))
+        return conditions, params
+
+    @cached(30, 'cars')
+    def query_cars(self, status=None, brand=None, model=None, year_from=None, year_to=None,
+                   price_from=None, price_to=None, sort_by='CarID', descending=False, color=None):
+        """Получить автомобили с фильтрацией и сортировкой на стороне сервера"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            if sort_by not in CAR_SORT_COLUMNS:
+                raise ValueError(f"Недопустимая колонка сортировки: {sort_by}")
+
+            conditions, params = self._car_filters(status, brand, model, year_from, year_to,
+                                                   price_from, price_to, color)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+            direction = "DESC" if descending else "ASC"
+            # CarID в конце делает порядок однозначным при равных значениях
+            order = f"{sort_by} {direction}" if sort_by == 'CarID' else f"{sort_by} {direction}, CarID {direction}"
+
+            snapshot = self.identity.snapshot('car')
+            rows = self._fetchall(f"""
+                SELECT {CAR_COLUMNS}
+                FROM Cars
+                {where}
+                ORDER BY {order}
+            """, *params, record=Car)
+            return self._remember('car', rows, snapshot)
+        except Exception as e:
+            print(f"Ошибка получения автомобилей: {e}")
+            return []
+
+    @cached(30, 'cars')
+    def get_cars_page(self, after=None, before=None, limit=100, sort_by='CarID', descending=False, **filters):
+        """Получить страницу автомобилей (фильтры как в query_cars)"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            if sort_by not in CAR_SORT_COLUMNS:
+                raise ValueError(f"Недопустимая колонка сортировки: {sort_by}")
+
+            conditions, params = self._car_filters(**filters)
+            key_columns = ['CarID'] if sort_by == 'CarID' else [sort_by, 'CarID']
+            snapshot = self.identity.snapshot('car')
+            rows = self._fetch_page(
+                CAR_COLUMNS, "Cars", key_columns,
+                conditions, params, descending, after, before, limit, record=Car,
+                nullable=CAR_NULLABLE_COLUMNS,
+            )
+            return self._remember('car', rows, snapshot)
+        except Exception as e:
+            print(f"Ошибка получения страницы автомобилей: {e}")
+            return []
+
+    def cars_cursor(self, page_size=100, sort_by='CarID', descending=False, **filters):
+        """Курсор постраничного просмотра автомобилей"""
+        if sort_by == 'CarID':
+            key = lambda row: (row[0],)
+        else:
+            index = CAR_SORT_COLUMNS.index(sort_by)
+            key = lambda row: (row[index], row[0])
+
+        def fetch(after=None, before=None, limit=page_size):
+            return self.get_cars_page(after, before, limit, sort_by, descending, **filters)
+
+        return PageCursor(fetch, key, page_size)
+
+    @invalidates('cars')
     def add_car(self, brand, model, year, color, price, status='В наличии'):
         """Добавить автомобиль"""
         try:
             if not self.ensure_connection():
                 return False
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                INSERT INTO Cars (Brand, Model, Year, Color, Price, Status)
-                VALUES (?, ?, ?, ?, ?, ?)
-            """, brand, model, int(year), color, float(price), status)
-            self.connection.commit()
-            return True
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO Cars (Brand, Model, Year, Color, Price, Status)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, brand, model, int(year), color, float(price), status)
+                conn.commit()
+                return True
+
+            return self._run(work)
         except Exception as e:
             print(f"Ошибка добавления автомобиля: {e}")
             return False
-    
+
+    @invalidates('cars')
+    def add_cars(self, cars, batch_size=1000):
+        """Добавить несколько автомобилей одной транзакцией.
+
+        cars - список кортежей (Brand, Model, Year, Color, Price, Status).
+        Строки отправляются пачками по batch_size через executemany.
+        Возвращает (успех, число добавленных строк или сообщение об ошибке).
+        """
+        try:
+            if not self.ensure_connection():
+                return False, "Нет соединения с базой данных"
+
+            def work(conn):
+                cursor = conn.cursor()
+                try:
+                    # Все параметры пачки передаются драйверу одним массивом
+                    cursor.fast_executemany = True
+                except AttributeError:
+                    pass  # старые версии pyodbc
+
+                try:
+                    for start in range(0, len(cars), batch_size):
+                        cursor.executemany("""
+                            INSERT INTO Cars (Brand, Model, Year, Color, Price, Status)
+                            VALUES (?, ?, ?, ?, ?, ?)
+                        """, cars[start:start + batch_size])
+                except Exception:
+                    conn.rollback()
+                    raise
+                conn.commit()
+                return True, len(cars)
+
+            return self._run(work)
+        except Exception as e:
+            return False, f"Ошибка добавления автомобилей: {str(e)}"
+
+    @invalidates('cars', 'sales')
+    @evicts('car', 'car_id')
     def update_car(self, car_id, brand, model, year, color, price, status):
         """Обновить автомобиль"""
         try:
             if not self.ensure_connection():
                 return False
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                UPDATE Cars SET Brand=?, Model=?, Year=?, Color=?, Price=?, Status=?
-                WHERE CarID=?
-            """, brand, model, int(year), color, float(price), status, int(car_id))
-            self.connection.commit()
-            return True
+
+            def work(conn):
+                # Продажи автомобиля переносятся в нужные строки сводки в той же транзакции
+                self.backend.update_car(conn.cursor(), int(car_id), brand, model, int(year), color, float(price),
+                                        status)
+                conn.commit()
+                return True
+
+            # UPDATE с абсолютными значениями можно безопасно повторить
+            return self._run(work, retry=True)
         except Exception as e:
             print(f"Ошибка обновления автомобиля: {e}")
             return False
-    
+
+    @invalidates('cars')
+    @evicts('car', 'car_id')
     def delete_car(self, car_id):
         """Удалить автомобиль"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT COUNT(*) FROM Sales WHERE CarID = ?", int(car_id))
-            sales_count = cursor.fetchone()[0]
-            
-            if sales_count > 0:
-                return False, "Нельзя удалить автомобиль, так как есть связанные продажи"
-            
-            cursor.execute("DELETE FROM Cars WHERE CarID=?", int(car_id))
-            self.connection.commit()
-            return True, "Автомобиль успешно удален"
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM Sales WHERE CarID = ?", int(car_id))
+                sales_count = cursor.fetchone()[0]
+
+                if sales_count > 0:
+                    return False, "Нельзя удалить автомобиль, так как есть связанные продажи"
+
+                cursor.execute("DELETE FROM Cars WHERE CarID=?", int(car_id))
+                conn.commit()
+                return True, "Автомобиль успешно удален"
+
+            return self._run(work, retry=True)
         except Exception as e:
             return False, f"Ошибка удаления: {str(e)}"
-    
+
     def get_car_by_id(self, car_id):
         """Получить автомобиль по ID"""
         try:
+            car = self.identity.get('car', car_id)
+            if car is not None:
+                return car
+
             if not self.ensure_connection():
                 return None
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT * FROM Cars WHERE CarID = ?", int(car_id))
-            return cursor.fetchone()
+
+            snapshot = self.identity.snapshot('car')
+            car = self._fetchone(f"SELECT {CAR_COLUMNS} FROM Cars WHERE CarID = ?", int(car_id), record=Car)
+            if car is not None:
+                self.identity.put('car', car, snapshot)
+            return car
         except Exception as e:
             print(f"Ошибка получения автомобиля: {e}")
             return None
-    
+
+    def peek_car(self, car_id):
+        """Автомобиль из карты сущностей без обращения к базе (None, если его там нет)"""
+        return self.identity.get('car', car_id)
+
+    @cached(60, 'clients')
     def get_all_clients(self):
         """Получить всех клиентов"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT ClientID, FirstName, LastName, Phone, Email, Username FROM Clients ORDER BY ClientID")
-            return cursor.fetchall()
+
+            snapshot = self.identity.snapshot('client')
+            rows = self._fetchall(ALL_CLIENTS_SQL, record=Client)
+            return self._remember('client', rows, snapshot)
         except Exception as e:
             print(f"Ошибка получения клиентов: {e}")
             return []
-    
+
+    def iter_all_clients(self, batch_size=1000):
+        """Все клиенты по одной строке (см. iter_all_cars)"""
+        return self._iter_rows(ALL_CLIENTS_SQL, batch_size=batch_size, record=Client)
+
+    @cached(60, 'clients')
+    def get_clients_page(self, after=None, before=None, limit=100):
+        """Получить страницу клиентов"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            snapshot = self.identity.snapshot('client')
+            rows = self._fetch_page(
+                CLIENT_COLUMNS, "Clients", ['ClientID'],
+                after=after, before=before, limit=limit, record=Client,
+            )
+            return self._remember('client', rows, snapshot)
+        except Exception as e:
+            print(f"Ошибка получения страницы клиентов: {e}")
+            return []
+
+    def get_client_by_id(self, client_id):
+        """Получить клиента по ID"""
+        try:
+            client = self.identity.get('client', client_id)
+            if client is not None:
+                return client
+
+            if not self.ensure_connection():
+                return None
+
+            snapshot = self.identity.snapshot('client')
+            client = self._fetchone(f"SELECT {CLIENT_COLUMNS} FROM Clients WHERE ClientID = ?",
+                                    int(client_id), record=Client)
+            if client is not None:
+                self.identity.put('client', client, snapshot)
+            return client
+        except Exception as e:
+            print(f"Ошибка получения клиента: {e}")
+            return None
+
+    def clients_cursor(self, page_size=100):
+        """Курсор постраничного просмотра клиентов"""
+        return PageCursor(lambda **kwargs: self.get_clients_page(**kwargs), page_size=page_size)
+
+    @invalidates('clients')
+    @evicts('client', 'client_id')
     def delete_client(self, client_id):
         """Удалить клиента"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            
-            # Проверяем, нет ли связанных заявок или продаж
-            cursor.execute("SELECT COUNT(*) FROM PurchaseRequests WHERE ClientID = ?", int(client_id))
-            requests_count = cursor.fetchone()[0]
-            
-            cursor.execute("SELECT COUNT(*) FROM Sales WHERE ClientID = ?", int(client_id))
-            sales_count = cursor.fetchone()[0]
-            
-            if requests_count > 0 or sales_count > 0:
-                return False, "Нельзя удалить клиента, так как есть связанные заявки или продажи"
-            
-            cursor.execute("DELETE FROM Clients WHERE ClientID=?", int(client_id))
-            self.connection.commit()
-            return True, "Клиент успешно удален"
+
+            def work(conn):
+                cursor = conn.cursor()
+
+                # Проверяем, нет ли связанных заявок или продаж
+                cursor.execute("SELECT COUNT(*) FROM PurchaseRequests WHERE ClientID = ?", int(client_id))
+                requests_count = cursor.fetchone()[0]
+
+                cursor.execute("SELECT COUNT(*) FROM Sales WHERE ClientID = ?", int(client_id))
+                sales_count = cursor.fetchone()[0]
+
+                if requests_count > 0 or sales_count > 0:
+                    return False, "Нельзя удалить клиента, так как есть связанные заявки или продажи"
+
+                cursor.execute("DELETE FROM Clients WHERE ClientID=?", int(client_id))
+                conn.commit()
+                return True, "Клиент успешно удален"
+
+            return self._run(work, retry=True)
         except Exception as e:
             return False, f"Ошибка удаления: {str(e)}"
-    
+
+    @cached(60, 'employees')
     def get_all_employees(self):
         """Получить всех сотрудников"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT EmployeeID, FirstName, LastName, Position, Phone, Email, Username, Role FROM Employees ORDER BY EmployeeID")
-            return cursor.fetchall()
+
+            snapshot = self.identity.snapshot('employee')
+            rows = self._fetchall(ALL_EMPLOYEES_SQL, record=Employee)
+            return self._remember('employee', rows, snapshot)
         except Exception as e:
             print(f"Ошибка получения сотрудников: {e}")
             return []
-    
+
+    def iter_all_employees(self, batch_size=1000):
+        """Все сотрудники по одной строке (см. iter_all_cars)"""
+        return self._iter_rows(ALL_EMPLOYEES_SQL, batch_size=batch_size, record=Employee)
+
+    @cached(60, 'employees')
+    def get_employees_page(self, after=None, before=None, limit=100):
+        """Получить страницу сотрудников"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            snapshot = self.identity.snapshot('employee')
+            rows = self._fetch_page(
+                EMPLOYEE_COLUMNS, "Employees",
+                ['EmployeeID'], after=after, before=before, limit=limit, record=Employee,
+            )
+            return self._remember('employee', rows, snapshot)
+        except Exception as e:
+            print(f"Ошибка получения страницы сотрудников: {e}")
+            return []
+
+    def get_employee_by_id(self, employee_id):
+        """Получить сотрудника по ID"""
+        try:
+            employee = self.identity.get('employee', employee_id)
+            if employee is not None:
+                return employee
+
+            if not self.ensure_connection():
+                return None
+
+            snapshot = self.identity.snapshot('employee')
+            employee = self._fetchone(f"SELECT {EMPLOYEE_COLUMNS} FROM Employees WHERE EmployeeID = ?",
+                                      int(employee_id), record=Employee)
+            if employee is not None:
+                self.identity.put('employee', employee, snapshot)
+            return employee
+        except Exception as e:
+            print(f"Ошибка получения сотрудника: {e}")
+            return None
+
+    def employees_cursor(self, page_size=100):
+        """Курсор постраничного просмотра сотрудников"""
+        return PageCursor(lambda **kwargs: self.get_employees_page(**kwargs), page_size=page_size)
+
+    @invalidates('employees')
+    @evicts('employee', 'employee_id')
     def delete_employee(self, employee_id):
         """Удалить сотрудника"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            
-            # Проверяем, нет ли связанных продаж
-            cursor.execute("SELECT COUNT(*) FROM Sales WHERE EmployeeID = ?", int(employee_id))
-            sales_count = cursor.fetchone()[0]
-            
-            if sales_count > 0:
-                return False, "Нельзя удалить сотрудника, так как есть связанные продажи. Сначала удалите или перепривяжите продажи."
-            
-            cursor.execute("DELETE FROM Employees WHERE EmployeeID=?", int(employee_id))
-            self.connection.commit()
-            return True, "Сотрудник успешно удален"
+
+            def work(conn):
+                cursor = conn.cursor()
+
+                # Проверяем, нет ли связанных продаж
+                cursor.execute("SELECT COUNT(*) FROM Sales WHERE EmployeeID = ?", int(employee_id))
+                sales_count = cursor.fetchone()[0]
+
+                if sales_count > 0:
+                    return False, "Нельзя удалить сотрудника, так как есть связанные продажи. Сначала удалите или перепривяжите продажи."
+
+                cursor.execute("DELETE FROM Employees WHERE EmployeeID=?", int(employee_id))
+                conn.commit()
+                return True, "Сотрудник успешно удален"
+
+            return self._run(work, retry=True)
         except Exception as e:
             return False, f"Ошибка удаления: {str(e)}"
-    
+
+    @cached(30, 'sales', 'cars', 'clients', 'employees')
     def get_all_sales(self):
         """Получить все продажи с именами клиентов и автомобилей"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT s.SaleID, c.Brand, c.Model, c.Year, c.Color,
-                       cl.FirstName + ' ' + cl.LastName as ClientName,
-                       e.FirstName + ' ' + e.LastName as EmployeeName,
-                       s.SaleDate, s.SalePrice
-                FROM Sales s
-                JOIN Cars c ON s.CarID = c.CarID
-                JOIN Clients cl ON s.ClientID = cl.ClientID
-                JOIN Employees e ON s.EmployeeID = e.EmployeeID
-                ORDER BY s.SaleID
-            """)
-            return cursor.fetchall()
+
+            return self._fetchall(ALL_SALES_SQL.format(**self._names), record=Sale)
         except Exception as e:
             print(f"Ошибка получения продаж: {e}")
             return []
-    
+
+    def iter_all_sales(self, batch_size=1000):
+        """Все продажи по одной строке (см. iter_all_cars)"""
+        return self._iter_rows(ALL_SALES_SQL.format(**self._names), batch_size=batch_size, record=Sale)
+
+    def iter_sale_batches(self, batch_size=1000):
+        """Продажи пачками строк с ID автомобиля, клиента и сотрудника (колонки SALES_EXPORT_SQL)"""
+        return self._iter_batches(SALES_EXPORT_SQL.format(**self._names), arraysize=batch_size)
+
+    @cached(30, 'sales', 'cars', 'clients', 'employees')
+    def get_sales_page(self, after=None, before=None, limit=100):
+        """Получить страницу продаж с именами клиентов и сотрудников"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            return self._fetch_page(f"""
+                    s.SaleID, c.Brand, c.Model, c.Year, c.Color,
+                    {self._names['client_name']} as ClientName,
+                    {self._names['employee_name']} as EmployeeName,
+                    s.SaleDate, s.SalePrice
+                """, """
+                    Sales s
+                    JOIN Cars c ON s.CarID = c.CarID
+                    JOIN Clients cl ON s.ClientID = cl.ClientID
+                    JOIN Employees e ON s.EmployeeID = e.EmployeeID
+                """, ['s.SaleID'], after=after, before=before, limit=limit, record=Sale,
+            )
+        except Exception as e:
+            print(f"Ошибка получения страницы продаж: {e}")
+            return []
+
+    def sales_cursor(self, page_size=100):
+        """Курсор постраничного просмотра продаж"""
+        return PageCursor(lambda **kwargs: self.get_sales_page(**kwargs), page_size=page_size)
+
+    @invalidates('sales', 'cars')
+    @evicts('car', 'car_id')
     def add_sale(self, car_id, client_id, employee_id, sale_price):
         """Добавить продажу"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
-                VALUES (?, ?, ?, ?)
-            """, int(car_id), int(client_id), int(employee_id), float(sale_price))
-            
-            cursor.execute("UPDATE Cars SET Status='Продано' WHERE CarID=?", int(car_id))
-            
-            self.connection.commit()
-            return True, "Продажа успешно оформлена"
+
+            def work(conn):
+                cursor = conn.cursor()
+                self.backend.insert_sale(cursor, int(car_id), int(client_id), int(employee_id), float(sale_price))
+
+                cursor.execute("UPDATE Cars SET Status='Продано' WHERE CarID=?", int(car_id))
+
+                conn.commit()
+                return True, "Продажа успешно оформлена"
+
+            return self._run(work)
         except Exception as e:
             return False, f"Ошибка оформления продажи: {str(e)}"
-    
+
+    @cached(30, 'requests', 'clients')
     def get_all_purchase_requests(self, client_id=None):
         """Получить все заявки на покупку"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            
+
             if client_id:
-                cursor.execute("""
-                    SELECT pr.RequestID, 
-                        cl.FirstName + ' ' + cl.LastName as ClientName,
-                        pr.Brand, pr.Model, pr.MaxPrice, pr.RequestDate, pr.Status
-                    FROM PurchaseRequests pr
-                    JOIN Clients cl ON pr.ClientID = cl.ClientID
-                    WHERE pr.ClientID = ?
-                    ORDER BY pr.RequestID
-                """, int(client_id))
+                return self._fetchall(PURCHASE_REQUESTS_SQL.format(where="WHERE pr.ClientID = ?", **self._names),
+                                      int(client_id), record=PurchaseRequest)
             else:
-                cursor.execute("""
-                    SELECT pr.RequestID, 
-                        cl.FirstName + ' ' + cl.LastName as ClientName,
-                        pr.Brand, pr.Model, pr.MaxPrice, pr.RequestDate, pr.Status
-                    FROM PurchaseRequests pr
-                    JOIN Clients cl ON pr.ClientID = cl.ClientID
-                    ORDER BY pr.RequestID
-                """)
-            
-            return cursor.fetchall()
+                return self._fetchall(PURCHASE_REQUESTS_SQL.format(where="", **self._names),
+                                      record=PurchaseRequest)
         except Exception as e:
             print(f"Ошибка получения заявок: {e}")
             return []
-    
+
+    def iter_all_purchase_requests(self, client_id=None, batch_size=1000):
+        """Заявки на покупку (всех или одного клиента) по одной строке (см. iter_all_cars)"""
+        if client_id:
+            return self._iter_rows(PURCHASE_REQUESTS_SQL.format(where="WHERE pr.ClientID = ?", **self._names),
+                                   int(client_id), batch_size=batch_size, record=PurchaseRequest)
+        return self._iter_rows(PURCHASE_REQUESTS_SQL.format(where="", **self._names), batch_size=batch_size,
+                               record=PurchaseRequest)
+
+    def iter_open_request_batches(self, batch_size=1000):
+        """Открытые заявки пачками строк (RequestID, Brand, Model, MaxPrice) в любом порядке"""
+        return self._iter_batches(OPEN_REQUESTS_SQL, arraysize=batch_size)
+
+    @cached(30, 'requests', 'clients')
+    def get_purchase_requests_page(self, client_id=None, after=None, before=None, limit=100):
+        """Получить страницу заявок на покупку (всех или одного клиента)"""
+        try:
+            if not self.ensure_connection():
+                return []
+
+            conditions, params = [], []
+            if client_id:
+                conditions.append("pr.ClientID = ?")
+                params.append(int(client_id))
+
+            return self._fetch_page(f"""
+                    pr.RequestID,
+                    {self._names['client_name']} as ClientName,
+                    pr.Brand, pr.Model, pr.MaxPrice, pr.RequestDate, pr.Status
+                """, """
+                    PurchaseRequests pr
+                    JOIN Clients cl ON pr.ClientID = cl.ClientID
+                """, ['pr.RequestID'], conditions, params, after=after, before=before, limit=limit,
+                record=PurchaseRequest,
+            )
+        except Exception as e:
+            print(f"Ошибка получения страницы заявок: {e}")
+            return []
+
+    def purchase_requests_cursor(self, client_id=None, page_size=100):
+        """Курсор постраничного просмотра заявок на покупку"""
+        return PageCursor(lambda **kwargs: self.get_purchase_requests_page(client_id, **kwargs),
+                          page_size=page_size)
+
+    @cached(30, 'requests')
     def get_purchase_request_by_id(self, request_id):
         """Получить заявку по ID"""
         try:
             if not self.ensure_connection():
                 return None
-            
-            cursor = self.connection.cursor()
-            cursor.execute("SELECT * FROM PurchaseRequests WHERE RequestID = ?", int(request_id))
-            return cursor.fetchone()
+
+            return self._fetchone("""
+                SELECT RequestID, ClientID, CarID, Brand, Model, MaxPrice, RequestDate, Status
+                FROM PurchaseRequests WHERE RequestID = ?
+            """, int(request_id), record=PurchaseRequestDetails)
         except Exception as e:
             print(f"Ошибка получения заявки: {e}")
             return None
-    
+
+    @cached(60, 'cars')
     def get_available_cars_by_model(self, brand, model):
         """Получить доступные автомобили по марке и модели"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
-                SELECT CarID, Brand, Model, Year, Color, Price 
-                FROM Cars 
+
+            snapshot = self.identity.snapshot('car')
+            rows = self._fetchall(f"""
+                SELECT {CAR_COLUMNS}
+                FROM Cars
                 WHERE Status = 'В наличии' AND Brand = ? AND Model = ?
                 ORDER BY Year DESC
-            """, brand, model)
-            return cursor.fetchall()
+            """, brand, model, record=Car)
+            return self._remember('car', rows, snapshot)
         except Exception as e:
             print(f"Ошибка получения автомобилей по модели: {e}")
             return []
-    
+
+    @cached(300, 'cars')
+    def get_car_brands(self):
+        """Марки автомобилей в базе по алфавиту (для фильтра списка)"""
+        return self._distinct_car_values('Brand')
+
+    @cached(300, 'cars')
+    def get_car_colors(self):
+        """Цвета автомобилей в базе по алфавиту (для фильтра списка)"""
+        return self._distinct_car_values('Color')
+
+    def _distinct_car_values(self, column):
+        try:
+            if not self.ensure_connection():
+                return []
+
+            rows = self._fetchall(f"SELECT DISTINCT {column} FROM Cars ORDER BY {column}")
+            return [row[0] for row in rows if row[0] is not None]
+        except Exception as e:
+            print(f"Ошибка получения значений {column}: {e}")
+            return []
+
+    @invalidates('requests')
     def add_purchase_request(self, client_id, car_id, brand, model, max_price):
         """Добавить заявку на покупку"""
         try:
             if not self.ensure_connection():
                 return False
-            
-            cursor = self.connection.cursor()
+
             price_value = float(max_price) if max_price and max_price > 0 else None
-                
-            cursor.execute("""
-                INSERT INTO PurchaseRequests (ClientID, CarID, Brand, Model, MaxPrice, Status)
-                VALUES (?, ?, ?, ?, ?, 'Рассматривается')
-            """, int(client_id), int(car_id), brand, model, price_value)
-            
-            self.connection.commit()
-            return True
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("""
+                    INSERT INTO PurchaseRequests (ClientID, CarID, Brand, Model, MaxPrice, Status)
+                    VALUES (?, ?, ?, ?, ?, 'Рассматривается')
+                """, int(client_id), int(car_id), brand, model, price_value)
+
+                conn.commit()
+                return True
+
+            return self._run(work)
         except Exception as e:
             print(f"Ошибка добавления заявки: {e}")
             return False
-    
+
+    @invalidates('requests')
     def delete_purchase_request(self, request_id):
         """Удалить заявку на покупку"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            cursor.execute("DELETE FROM PurchaseRequests WHERE RequestID=?", int(request_id))
-            self.connection.commit()
-            return True, "Заявка успешно удалена"
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("DELETE FROM PurchaseRequests WHERE RequestID=?", int(request_id))
+                conn.commit()
+                return True, "Заявка успешно удалена"
+
+            return self._run(work, retry=True)
         except Exception as e:
             return False, f"Ошибка удаления: {str(e)}"
-    
+
+    @cached(30, 'sales', 'cars', 'employees')
     def get_client_sales(self, client_id):
         """Получить продажи конкретного клиента"""
         try:
             if not self.ensure_connection():
                 return []
-            
-            cursor = self.connection.cursor()
-            cursor.execute("""
+
+            return self._fetchall(f"""
                 SELECT s.SaleID, c.Brand, c.Model, c.Year, c.Color,
-                    e.FirstName + ' ' + e.LastName as EmployeeName,
+                    {self._names['employee_name']} as EmployeeName,
                     s.SaleDate, s.SalePrice
                 FROM Sales s
                 JOIN Cars c ON s.CarID = c.CarID
                 JOIN Employees e ON s.EmployeeID = e.EmployeeID
                 WHERE s.ClientID = ?
                 ORDER BY s.SaleDate DESC
-            """, int(client_id))
-            return cursor.fetchall()
+            """, int(client_id), record=ClientSale)
         except Exception as e:
             print(f"Ошибка получения продаж клиента: {e}")
             return []
-    
+
+    @invalidates('sales', 'cars')
+    @evicts('car', 'car_id')
     def create_sale_from_selection(self, client_id, car_id, employee_id, sale_price):
         """Создать продажу из выбранных клиента и автомобиля"""
         try:
             if not self.ensure_connection():
                 return False, "Нет соединения с базой данных"
-            
-            cursor = self.connection.cursor()
-            
-            # Проверяем, доступен ли автомобиль
-            cursor.execute("SELECT Status FROM Cars WHERE CarID = ?", int(car_id))
-            car = cursor.fetchone()
-            
-            if not car:
-                return False, "Автомобиль не найден"
-            
-            if car[0] != 'В наличии':
-                return False, "Автомобиль уже продан или недоступен"
-            
-            # Создаем продажу
-            cursor.execute("""
-                INSERT INTO Sales (CarID, ClientID, EmployeeID, SalePrice)
-                VALUES (?, ?, ?, ?)
-            """, int(car_id), int(client_id), int(employee_id), float(sale_price))
-            
-            # Обновляем статус автомобиля
-            cursor.execute("UPDATE Cars SET Status='Продано' WHERE CarID=?", int(car_id))
-            
-            self.connection.commit()
-            return True, "Продажа успешно оформлена"
-        except Exception as e:
-            return False, f"Ошибка оформления продажи: {str(e)}"
\ No newline at end of file
+
+            def work(conn):
+                # Автомобиль занимается условным UPDATE: из двух одновременных
+                # продаж строку изменит только одна (см. backends.py)
+                sale_id, status = self.backend.claim_sale(conn.cursor(), int(car_id), int(client_id),
+                                                          int(employee_id), float(sale_price))
+
+                if sale_id is None:
+                    conn.rollback()
+                    if status is None:
+                        return False, "Автомобиль не найден"
+                    return False, "Автомобиль уже продан или недоступен"
+
+                conn.commit()
+                return True, f"Продажа №{sale_id} успешно оформлена"
+
+            return self._run(work)
+        except Exception as e:
+            if self.backend.is_contention_error(e):
+                return False, "Автомобиль сейчас оформляет другой менеджер, попробуйте еще раз"
+            return False, f"Ошибка оформления продажи: {str(e)}"
+
+    @invalidates('sales', 'cars')
+    @evicts('car', 'cars', lambda cars: [car_id for car_id, _ in cars])
+    def create_fleet_sale(self, client_id, employee_id, cars, require_all=False):
+        """Продать несколько автомобилей одному клиенту одной транзакцией.
+
+        cars - список пар (CarID, цена продажи). Возвращает (успех, сообщение,
+        результаты), где результаты - список (CarID, SaleID или None, сообщение)
+        по каждому автомобилю. Если require_all, продажа отменяется целиком,
+        когда хотя бы один автомобиль уже недоступен. Автомобиль без цены
+        продать нельзя: такая продажа отклоняется целиком.
+        """
+        results = []
+        try:
+            unpriced = [int(car_id) for car_id, price in cars if price is None]
+            if unpriced:
+                results.extend((car_id, None, "Не указана цена продажи") for car_id in unpriced)
+                return False, "Не у всех автомобилей указана цена продажи", results
+            cars = [(int(car_id), float(price)) for car_id, price in cars]
+            if not cars:
+                return False, "Не выбраны автомобили", results
+            if len(cars) > MAX_FLEET_SIZE:
+                return False, f"За один раз можно продать не более {MAX_FLEET_SIZE} автомобилей", results
+            if len({car_id for car_id, _ in cars}) != len(cars):
+                return False, "Автомобиль выбран несколько раз", results
+
+            if not self.ensure_connection():
+                return False, "Нет соединения с базой данных", results
+
+            def work(conn):
+                rows = self.backend.sell_fleet(conn.cursor(), cars, int(client_id), int(employee_id))
+
+                sold = 0
+                for car_id, _ in cars:
+                    sale_id, status = rows.get(car_id, (None, None))
+                    if sale_id is not None:
+                        results.append((car_id, sale_id, "Продано"))
+                        sold += 1
+                    elif status is None:
+                        results.append((car_id, None, "Автомобиль не найден"))
+                    else:
+                        results.append((car_id, None, "Автомобиль уже продан или недоступен"))
+
+                if sold == 0 or (require_all and sold < len(cars)):
+                    conn.rollback()
+                    if sold:
+                        # Продажа отменена целиком: отмечаем и те автомобили, что были свободны
+                        results[:] = [(car_id, None, "Продажа отменена: не все автомобили доступны")
+                                      if sale_id is not None else (car_id, sale_id, message)
+                                      for car_id, sale_id, message in results]
+                    return False, "Ни один автомобиль не продан", results
+
+                conn.commit()
+                if sold < len(cars):
+                    return True, f"Продано автомобилей: {sold} из {len(cars)}", results
+                return True, f"Продажа оформлена, автомобилей: {sold}", results
+
+            return self._run(work)
+        except Exception as e:
+            results.clear()
+            if self.backend.is_contention_error(e):
+                return False, "Автомобили сейчас оформляет другой менеджер, попробуйте еще раз", results
+            return False, f"Ошибка оформления продажи: {str(e)}", results
+
+    @invalidates('sales')
+    def rebuild_sales_summary(self):
+        """Пересчитать сводку продаж по таблице Sales"""
+        try:
+            if not self.ensure_connection():
+                return False, "Нет соединения с базой данных"
+
+            def work(conn):
+                groups = self.backend.rebuild_sales_summary(conn.cursor())
+                conn.commit()
+                return True, f"Сводка пересчитана, строк: {groups}"
+
+            return self._run(work)
+        except Exception as e:
+            return False, f"Ошибка пересчета сводки: {str(e)}"
+
+    def verify_sales_summary(self):
+        """Сравнить сводку с полным пересчетом по Sales.
+
+        Возвращает (совпадает, расхождения), где расхождения - список
+        (месяц, марка, модель, EmployeeID, в сводке, по продажам), а в
+        последних двух полях - пары (штук, выручка) или None.
+        """
+        try:
+            if not self.ensure_connection():
+                return False, []
+
+            def work(conn):
+                cursor = conn.cursor()
+                cursor.execute("SELECT SaleMonth, Brand, Model, EmployeeID, Units, Revenue FROM SalesSummary")
+                stored = {tuple(row[:4]): (row[4], float(row[5])) for row in cursor.fetchall()}
+                cursor.execute(self.backend.sales_rollup())
+                expected = {tuple(row[:4]): (row[4], float(row[5])) for row in cursor.fetchall()}
+                return stored, expected
+
+            stored, expected = self._run(work, retry=True)
+            differences = [
+                (*key, stored.get(key), expected.get(key))
+                for key in sorted(set(stored) | set(expected))
+                if stored.get(key) is None or expected.get(key) is None
+                or stored[key][0] != expected[key][0] or abs(stored[key][1] - expected[key][1]) > 0.005
+            ]
+            return not differences, differences
+        except Exception as e:
+            print(f"Ошибка проверки сводки: {e}")
+            return False, []
+
+    @cached(30, 'sales')
+    def get_sales_summary(self, group_by='month', month_from=None, month_to=None):
+        """Выручка и число проданных автомобилей по разрезу group_by.
+
+        group_by - 'month', 'brand', 'model' или 'employee'; month_from
+        и month_to - месяцы в виде 'ГГГГ-ММ'. Читается только сводка.
+        """
+        try:
+            if not self.ensure_connection():
+                return []
+
+            if group_by not in SUMMARY_DIMENSIONS:
+                raise ValueError(f"Недопустимый разрез сводки: {group_by}")
+            expression, join = SUMMARY_DIMENSIONS[group_by]
+            column = expression(self.backend)
+
+            conditions, params = [], []
+            if month_from:
+                conditions.append("ss.SaleMonth >= ?")
+                params.append(month_from)
+            if month_to:
+                conditions.append("ss.SaleMonth <= ?")
+                params.append(month_to)
+            where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+            return self._fetchall(f"""
+                SELECT {column} AS GroupName, SUM(ss.Units), SUM(ss.Revenue)
+                FROM SalesSummary ss
+                {join}
+                {where}
+                GROUP BY {column}
+                ORDER BY {'GroupName' if group_by == 'month' else 'SUM(ss.Revenue) DESC'}
+            """, *params, record=SummaryRow)
+        except Exception as e:
+            print(f"Ошибка получения сводки продаж: {e}")
+            return []
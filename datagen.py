@@ -0,0 +1,364 @@
+"""Синтетические данные автосалона для нагрузочных проверок.
+
+Генератор детерминирован: одно и то же зерно (--seed) дает те же строки.
+Распределения приближены к реальным: популярность марок и моделей
+убывает по закону Ципфа, год выпуска смещен к новым машинам, цена
+зависит от модели, возраста и логнормального разброса, а продано
+около трети автомобилей. У всех клиентов и сотрудников пароль PASSWORD.
+
+Строки загружаются в базу пачками executemany (fast_executemany у pyodbc)
+с фиксацией каждые commit_size строк или пишутся в файлы CSV/Parquet:
+
+    python datagen.py --cars 1000000                      # в базу из database.py
+    python datagen.py --cars 100000 --out fixtures        # fixtures/Cars.csv.gz и т.д.
+    python datagen.py --cars 100000 --out fixtures --format parquet
+"""
+import argparse
+import hashlib
+import os
+import random
+import time
+from array import array
+from datetime import date, timedelta
+from itertools import accumulate
+
+from export import CsvExportWriter, ParquetExportWriter
+
+PASSWORD = 'password'
+
+# Марка -> (модели с базовой ценой в рублях), по убыванию популярности
+BRANDS = [
+    ('Lada', [('Vesta', 1400000), ('Granta', 900000), ('Niva Travel', 1200000), ('Largus', 1300000)]),
+    ('Kia', [('Rio', 1700000), ('Sportage', 3200000), ('K5', 3000000), ('Seltos', 2600000)]),
+    ('Hyundai', [('Solaris', 1600000), ('Creta', 2400000), ('Tucson', 3300000)]),
+    ('Toyota', [('Camry', 3800000), ('RAV4', 3900000), ('Corolla', 2500000), ('Land Cruiser', 9000000)]),
+    ('Haval', [('Jolion', 2100000), ('F7', 2800000), ('H6', 2600000)]),
+    ('Chery', [('Tiggo 7 Pro', 2400000), ('Tiggo 4', 1900000), ('Tiggo 8', 3000000)]),
+    ('Skoda', [('Octavia', 2600000), ('Rapid', 1700000), ('Kodiaq', 3600000)]),
+    ('Volkswagen', [('Polo', 1800000), ('Tiguan', 3700000), ('Passat', 3100000)]),
+    ('Renault', [('Logan', 1200000), ('Duster', 1900000), ('Arkana', 2200000)]),
+    ('BMW', [('X5', 9500000), ('3 Series', 5200000), ('5 Series', 7000000)]),
+    ('Mercedes-Benz', [('E-Class', 7500000), ('GLC', 7800000), ('C-Class', 5500000)]),
+    ('Audi', [('A4', 4800000), ('Q5', 6200000), ('A6', 6500000)]),
+]
+
+COLORS = [('Белый', 30), ('Черный', 22), ('Серый', 18), ('Серебристый', 12), ('Синий', 8),
+          ('Красный', 5), ('Коричневый', 3), ('Зеленый', 2)]
+
+FIRST_NAMES = ['Александр', 'Дмитрий', 'Максим', 'Сергей', 'Андрей', 'Алексей', 'Иван', 'Михаил',
+               'Анна', 'Мария', 'Елена', 'Ольга', 'Наталья', 'Татьяна', 'Екатерина', 'Ирина']
+LAST_NAMES = ['Иванов', 'Смирнов', 'Кузнецов', 'Попов', 'Васильев', 'Петров', 'Соколов', 'Михайлов',
+              'Новиков', 'Федоров', 'Морозов', 'Волков', 'Алексеев', 'Лебедев', 'Семенов', 'Егоров']
+POSITIONS = [('Менеджер по продажам', 'Manager', 80), ('Старший менеджер', 'Manager', 15),
+             ('Руководитель отдела', 'Admin', 5)]
+REQUEST_STATUSES = [('Рассматривается', 70), ('Выполнена', 20), ('Отклонена', 10)]
+
+# Таблица -> колонки (имя, тип для Parquet), в порядке загрузки
+TABLES = {
+    'Employees': [('EmployeeID', 'int'), ('FirstName', 'string'), ('LastName', 'string'),
+                  ('Position', 'string'), ('Phone', 'string'), ('Email', 'string'),
+                  ('Username', 'string'), ('PasswordHash', 'string'), ('Role', 'string')],
+    'Clients': [('ClientID', 'int'), ('FirstName', 'string'), ('LastName', 'string'), ('Phone', 'string'),
+                ('Email', 'string'), ('Username', 'string'), ('PasswordHash', 'string')],
+    'Cars': [('CarID', 'int'), ('Brand', 'string'), ('Model', 'string'), ('Year', 'int'),
+             ('Color', 'string'), ('Price', 'float'), ('Status', 'string')],
+    'Sales': [('SaleID', 'int'), ('CarID', 'int'), ('ClientID', 'int'), ('EmployeeID', 'int'),
+              ('SaleDate', 'string'), ('SalePrice', 'float')],
+    'PurchaseRequests': [('RequestID', 'int'), ('ClientID', 'int'), ('CarID', 'int'), ('Brand', 'string'),
+                         ('Model', 'string'), ('MaxPrice', 'float'), ('RequestDate', 'string'),
+                         ('Status', 'string')],
+}
+
+
+def _zipf_weights(count, exponent=1.1):
+    return [1 / (rank ** exponent) for rank in range(1, count + 1)]
+
+
+class DataGenerator:
+    """Строки всех таблиц пачками по batch_size.
+
+    cars - число автомобилей; клиентов, сотрудников и заявок по умолчанию
+    берется пропорционально. first_ids - первый ID каждой таблицы (чтобы
+    дописывать к уже заполненной базе). Продажи ссылаются на проданные
+    автомобили, поэтому cars() нужно прочитать раньше sales().
+    """
+
+    def __init__(self, cars, clients=None, employees=None, requests=None, sold_share=0.35, seed=0,
+                 start_date=date(2020, 1, 1), end_date=date(2024, 12, 31), first_ids=None):
+        self.counts = {
+            'Cars': cars,
+            'Clients': clients if clients is not None else max(cars // 5, 10),
+            'Employees': employees if employees is not None else max(cars // 2000, 5),
+            'PurchaseRequests': requests if requests is not None else max(cars // 10, 10),
+        }
+        self.sold_share = sold_share
+        self.seed = seed
+        self.start_date = start_date
+        self.days = (end_date - start_date).days
+        self.end_year = end_date.year
+        self.first_ids = {table: 1 for table in TABLES}
+        self.first_ids.update(first_ids or {})
+        self.password_hash = hashlib.sha256(PASSWORD.encode()).hexdigest()
+
+        # Плоский список (марка, модель, цена) и накопленные веса для random.choices
+        self.models = []
+        weights = []
+        for (brand, models), brand_weight in zip(BRANDS, _zipf_weights(len(BRANDS))):
+            model_weights = _zipf_weights(len(models), 0.8)
+            for (model, price), model_weight in zip(models, model_weights):
+                self.models.append((brand, model, price))
+                weights.append(brand_weight * model_weight / sum(model_weights))
+        self.model_weights = list(accumulate(weights))
+        self.colors = [color for color, _ in COLORS]
+        self.color_weights = list(accumulate(weight for _, weight in COLORS))
+
+        # Проданные автомобили: ID и цена (заполняются в cars())
+        self.sold_ids = array('q')
+        self.sold_prices = array('d')
+
+    def _random(self, table):
+        # У каждой таблицы свой поток случайных чисел: таблицы не зависят от порядка чтения
+        return random.Random(f"{self.seed}:{table}")
+
+    def _phone(self, rnd):
+        return f"+79{rnd.randrange(10 ** 9):09d}"
+
+    def employees(self, batch_size=10000):
+        rnd = self._random('Employees')
+        positions = [(position, role) for position, role, _ in POSITIONS]
+        position_weights = list(accumulate(weight for _, _, weight in POSITIONS))
+        first = self.first_ids['Employees']
+        rows = []
+        for employee_id in range(first, first + self.counts['Employees']):
+            position, role = rnd.choices(positions, cum_weights=position_weights)[0]
+            rows.append((employee_id, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES), position,
+                         self._phone(rnd), f"employee{employee_id}@autotrade.example",
+                         f"employee{employee_id}", self.password_hash, role))
+            if len(rows) == batch_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def clients(self, batch_size=10000):
+        rnd = self._random('Clients')
+        first = self.first_ids['Clients']
+        rows = []
+        for client_id in range(first, first + self.counts['Clients']):
+            rows.append((client_id, rnd.choice(FIRST_NAMES), rnd.choice(LAST_NAMES), self._phone(rnd),
+                         f"client{client_id}@mail.example", f"client{client_id}", self.password_hash))
+            if len(rows) == batch_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def cars(self, batch_size=10000):
+        rnd = self._random('Cars')
+        first = self.first_ids['Cars']
+        self.sold_ids = array('q')
+        self.sold_prices = array('d')
+        for start in range(first, first + self.counts['Cars'], batch_size):
+            ids = range(start, min(start + batch_size, first + self.counts['Cars']))
+            models = rnd.choices(self.models, cum_weights=self.model_weights, k=len(ids))
+            colors = rnd.choices(self.colors, cum_weights=self.color_weights, k=len(ids))
+            rows = []
+            for car_id, (brand, model, base_price), color in zip(ids, models, colors):
+                # Больше новых машин, но встречаются и 15-летние
+                age = min(int(rnd.expovariate(0.25)), 15)
+                price = round(base_price * 0.88 ** age * rnd.lognormvariate(0, 0.15), -3)
+                if rnd.random() < self.sold_share:
+                    status = 'Продано'
+                    self.sold_ids.append(car_id)
+                    self.sold_prices.append(price)
+                else:
+                    status = 'На ремонте' if rnd.random() < 0.08 else 'В наличии'
+                rows.append((car_id, brand, model, self.end_year - age, color, price, status))
+            yield rows
+
+    def sales(self, batch_size=10000):
+        """Продажи проданных автомобилей (после чтения cars())"""
+        rnd = self._random('Sales')
+        clients, employees = self.counts['Clients'], self.counts['Employees']
+        first_client, first_employee = self.first_ids['Clients'], self.first_ids['Employees']
+        sale_id = self.first_ids['Sales']
+        rows = []
+        for car_id, price in zip(self.sold_ids, self.sold_prices):
+            # Постоянные клиенты покупают чаще: ID смещены к началу
+            client_id = first_client + int(clients * rnd.random() ** 2)
+            # Продаж становится больше к концу периода
+            sale_date = self.start_date + timedelta(days=int(self.days * rnd.random() ** 0.7))
+            rows.append((sale_id, car_id, client_id, first_employee + rnd.randrange(employees),
+                         sale_date.isoformat(), round(price * rnd.uniform(0.92, 1.0), -3)))
+            sale_id += 1
+            if len(rows) == batch_size:
+                yield rows
+                rows = []
+        if rows:
+            yield rows
+
+    def purchase_requests(self, batch_size=10000):
+        rnd = self._random('PurchaseRequests')
+        statuses = [status for status, _ in REQUEST_STATUSES]
+        status_weights = list(accumulate(weight for _, weight in REQUEST_STATUSES))
+        first = self.first_ids['PurchaseRequests']
+        first_car, cars = self.first_ids['Cars'], self.counts['Cars']
+        first_client, clients = self.first_ids['Clients'], self.counts['Clients']
+        for start in range(first, first + self.counts['PurchaseRequests'], batch_size):
+            ids = range(start, min(start + batch_size, first + self.counts['PurchaseRequests']))
+            models = rnd.choices(self.models, cum_weights=self.model_weights, k=len(ids))
+            rows = []
+            for request_id, (brand, model, base_price) in zip(ids, models):
+                max_price = None if rnd.random() < 0.1 else round(base_price * rnd.lognormvariate(-0.1, 0.2), -3)
+                request_date = self.start_date + timedelta(days=rnd.randrange(self.days))
+                rows.append((request_id, first_client + rnd.randrange(clients), first_car + rnd.randrange(cars),
+                             brand, model, max_price, request_date.isoformat(),
+                             rnd.choices(statuses, cum_weights=status_weights)[0]))
+            yield rows
+
+    def tables(self, batch_size=10000):
+        """(таблица, генератор пачек) в порядке, допустимом для внешних ключей"""
+        return [
+            ('Employees', self.employees(batch_size)),
+            ('Clients', self.clients(batch_size)),
+            ('Cars', self.cars(batch_size)),
+            ('Sales', self.sales(batch_size)),
+            ('PurchaseRequests', self.purchase_requests(batch_size)),
+        ]
+
+
+def next_ids(db):
+    """Первые свободные ID таблиц базы (для first_ids генератора)"""
+    ids = {}
+    for table, columns in TABLES.items():
+        key = columns[0][0]
+        ids[table] = (db._fetchone(f"SELECT MAX({key}) FROM {table}")[0] or 0) + 1
+    return ids
+
+
+def load(db, generator, batch_size=10000, commit_size=100000, progress=None):
+    """Загрузить строки генератора в базу, вернуть {таблица: число строк}.
+
+    progress(таблица, загружено строк) вызывается после каждой транзакции.
+    """
+    loaded = {}
+    # SQL Server не дает вставить явный ID в IDENTITY-колонку без SET IDENTITY_INSERT
+    identity_insert = db.backend.identity_insert
+    for table, batches in generator.tables(batch_size):
+        columns = [name for name, _ in TABLES[table]]
+        sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)})"
+        loaded[table] = 0
+        pending = []
+
+        def flush():
+            def work(conn):
+                cursor = conn.cursor()
+                try:
+                    cursor.fast_executemany = True
+                except AttributeError:
+                    pass  # старые версии pyodbc
+                if identity_insert:
+                    cursor.execute(f"SET IDENTITY_INSERT {table} ON")
+                try:
+                    for rows in pending:
+                        cursor.executemany(sql, rows)
+                finally:
+                    if identity_insert:
+                        cursor.execute(f"SET IDENTITY_INSERT {table} OFF")
+                conn.commit()
+
+            db._run(work)
+            loaded[table] += sum(len(rows) for rows in pending)
+            pending.clear()
+            if progress:
+                progress(table, loaded[table])
+
+        for rows in batches:
+            pending.append(rows)
+            if sum(len(rows) for rows in pending) >= commit_size:
+                flush()
+        if pending:
+            flush()
+    return loaded
+
+
+def write_files(generator, directory, fmt='csv', compression=None, batch_size=10000, progress=None):
+    """Записать строки генератора в файлы таблиц, вернуть {таблица: путь}.
+
+    CSV по умолчанию сжимается gzip; compression='none' - без сжатия.
+    """
+    os.makedirs(directory, exist_ok=True)
+    paths = {}
+    for table, batches in generator.tables(batch_size):
+        if fmt == 'parquet':
+            path = os.path.join(directory, f"{table}.parquet")
+            writer = ParquetExportWriter(path, TABLES[table], compression)
+        else:
+            gzip = compression in (None, 'gzip')
+            path = os.path.join(directory, f"{table}.csv" + ('.gz' if gzip else ''))
+            writer = CsvExportWriter(path, TABLES[table], 'gzip' if gzip else None)
+        written = 0
+        try:
+            for rows in batches:
+                writer.write(rows)
+                written += len(rows)
+                if progress:
+                    progress(table, written)
+        finally:
+            writer.close()
+        paths[table] = path
+    return paths
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--cars', type=int, default=100000)
+    parser.add_argument('--clients', type=int, help="по умолчанию cars/5")
+    parser.add_argument('--employees', type=int, help="по умолчанию cars/2000")
+    parser.add_argument('--requests', type=int, help="по умолчанию cars/10")
+    parser.add_argument('--sold-share', type=float, default=0.35, help="доля проданных автомобилей")
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=10000, help="строк в одном executemany")
+    parser.add_argument('--commit-size', type=int, default=100000, help="строк в одной транзакции")
+    parser.add_argument('--out', help="каталог для файлов вместо загрузки в базу")
+    parser.add_argument('--format', choices=('csv', 'parquet'), default='csv')
+    parser.add_argument('--compression', help="gzip (по умолчанию) или none для CSV; snappy, zstd для Parquet")
+    args = parser.parse_args()
+
+    options = dict(clients=args.clients, employees=args.employees, requests=args.requests,
+                   sold_share=args.sold_share, seed=args.seed)
+    started = time.perf_counter()
+
+    def report(table, count):
+        print(f"  {table}: {count} строк ({time.perf_counter() - started:.0f} с)".ljust(60), end='\r')
+
+    if args.out:
+        generator = DataGenerator(args.cars, **options)
+        try:
+            paths = write_files(generator, args.out, args.format, args.compression, args.batch_size, report)
+        except ValueError as e:
+            raise SystemExit(str(e))
+        print()
+        for table, path in paths.items():
+            print(f"{table}: {path}")
+    else:
+        from database import Database
+
+        db = Database()
+        try:
+            if not db.ensure_connection():
+                raise SystemExit("Нет соединения с базой данных")
+            generator = DataGenerator(args.cars, first_ids=next_ids(db), **options)
+            loaded = load(db, generator, args.batch_size, args.commit_size, report)
+        finally:
+            db.close()
+        print()
+        print(', '.join(f"{table}: {count}" for table, count in loaded.items()))
+
+    total = sum(generator.counts.values()) + len(generator.sold_ids)
+    elapsed = time.perf_counter() - started
+    print(f"Строк: {total}, {elapsed:.1f} с ({total / elapsed:,.0f} строк/с)")
+
+
+if __name__ == '__main__':
+    main()
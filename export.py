@@ -0,0 +1,154 @@
+"""Потоковая выгрузка продаж и автомобилей в CSV и Parquet.
+
+Строки читаются из базы пачками (fetchmany) и сразу записываются в файл,
+поэтому память не зависит от размера выборки. CSV можно сжать gzip
+(расширение .gz), Parquet требует пакета pyarrow.
+
+    python export.py sales sales.csv.gz
+    python export.py cars cars.parquet --compression zstd
+"""
+import argparse
+import csv
+import gzip
+from datetime import date, datetime
+
+# Выгрузка: колонки (заголовок, тип для Parquet) и метод Database, отдающий строки пачками
+EXPORTS = {
+    'sales': (
+        [('SaleID', 'int'), ('SaleDate', 'timestamp'), ('CarID', 'int'), ('Brand', 'string'),
+         ('Model', 'string'), ('Year', 'int'), ('Color', 'string'), ('ClientID', 'int'),
+         ('ClientName', 'string'), ('EmployeeID', 'int'), ('EmployeeName', 'string'),
+         ('SalePrice', 'float')],
+        'iter_sale_batches',
+    ),
+    'cars': (
+        [('CarID', 'int'), ('Brand', 'string'), ('Model', 'string'), ('Year', 'int'),
+         ('Color', 'string'), ('Price', 'float'), ('Status', 'string')],
+        'iter_car_batches',
+    ),
+}
+
+FORMATS = ('csv', 'parquet')
+
+
+class CsvExportWriter:
+    """Запись пачек строк в CSV (со сжатием gzip при compression='gzip')"""
+
+    def __init__(self, path, columns, compression=None):
+        if compression == 'gzip':
+            self.file = gzip.open(path, 'wt', newline='', encoding='utf-8')
+        else:
+            # BOM нужен, чтобы Excel правильно открыл кириллицу
+            self.file = open(path, 'w', newline='', encoding='utf-8-sig')
+        self.writer = csv.writer(self.file, delimiter=';')
+        self.writer.writerow([name for name, _ in columns])
+
+    def write(self, rows):
+        self.writer.writerows(rows)
+
+    def close(self):
+        self.file.close()
+
+
+def _to_timestamp(value):
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    if isinstance(value, date) and not isinstance(value, datetime):
+        return datetime(value.year, value.month, value.day)
+    return value
+
+
+class ParquetExportWriter:
+    """Запись пачек строк в Parquet, каждая пачка - отдельная row group"""
+
+    def __init__(self, path, columns, compression=None):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise ValueError("Для выгрузки в Parquet установите пакет pyarrow")
+
+        self.pa = pa
+        types = {
+            'int': (pa.int64(), int),
+            'float': (pa.float64(), float),
+            'string': (pa.string(), str),
+            'timestamp': (pa.timestamp('ms'), _to_timestamp),
+        }
+        self.converters = [types[kind][1] for _, kind in columns]
+        self.schema = pa.schema([(name, types[kind][0]) for name, kind in columns])
+        self.writer = pq.ParquetWriter(path, self.schema, compression=compression or 'snappy')
+
+    def write(self, rows):
+        arrays = []
+        for index, (field, convert) in enumerate(zip(self.schema, self.converters)):
+            values = [None if row[index] is None else convert(row[index]) for row in rows]
+            arrays.append(self.pa.array(values, type=field.type))
+        self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def guess_format(path):
+    """Формат и сжатие по расширению файла"""
+    lower = path.lower()
+    if lower.endswith('.parquet'):
+        return 'parquet', None
+    if lower.endswith('.gz'):
+        return 'csv', 'gzip'
+    return 'csv', None
+
+
+def export(db, name, path, fmt=None, compression=None, arraysize=5000, progress=None):
+    """Выгрузить name ('sales' или 'cars') в файл, вернуть число строк.
+
+    progress(число записанных строк) вызывается после каждой пачки.
+    """
+    if name not in EXPORTS:
+        raise ValueError(f"Неизвестная выгрузка: {name}")
+    guessed_format, guessed_compression = guess_format(path)
+    fmt = fmt or guessed_format
+    compression = compression or guessed_compression
+    if fmt not in FORMATS:
+        raise ValueError(f"Неизвестный формат: {fmt}")
+
+    columns, method = EXPORTS[name]
+    writer_class = ParquetExportWriter if fmt == 'parquet' else CsvExportWriter
+    writer = writer_class(path, columns, compression)
+    written = 0
+    try:
+        for rows in getattr(db, method)(batch_size=arraysize):
+            writer.write(rows)
+            written += len(rows)
+            if progress:
+                progress(written)
+    finally:
+        writer.close()
+    return written
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('name', choices=sorted(EXPORTS))
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=FORMATS, help="по умолчанию определяется по расширению")
+    parser.add_argument('--compression', help="gzip для CSV; snappy, zstd, gzip для Parquet")
+    parser.add_argument('--arraysize', type=int, default=5000, help="строк в одной пачке")
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database()
+    try:
+        count = export(db, args.name, args.path, args.format, args.compression, args.arraysize,
+                       progress=lambda written: print(f"  выгружено строк: {written}", end='\r'))
+    except ValueError as e:
+        raise SystemExit(str(e))
+    finally:
+        db.close()
+    print(f"\nВыгружено строк: {count} -> {args.path}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,119 @@
+import functools
+import inspect
+import threading
+import time
+from collections import OrderedDict
+
+
+class IdentityMap:
+    """Карта сущностей (автомобили, клиенты, сотрудники) по первичному ключу.
+
+    Списочные запросы складывают сюда прочитанные строки, а выборка
+    по ID сначала смотрит в карту. Запись сущности удаляет ее строку,
+    поэтому следующее обращение прочитает ее из базы заново, и увеличивает
+    номер версии ее вида: запрос, начатый до записи, не положит в карту
+    старые данные (snapshot). Версий отдельных сущностей карта не хранит,
+    поэтому записи не оставляют в ней следов. Строки старше max_age секунд
+    тоже перечитываются, чтобы подхватить изменения других пользователей.
+    Карта хранит не больше max_size строк: при переполнении вытесняются
+    те, к которым дольше всего не обращались (LRU), поэтому длинная сессия
+    с прокруткой больших таблиц не держит в памяти все прочитанное.
+    """
+
+    def __init__(self, max_age=60, max_size=50000):
+        self.max_age = max_age
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()  # (вид, id) -> (время загрузки, строка)
+        self._kind_versions = {}  # вид -> число записей сущностей этого вида
+        self._listeners = {}      # вид -> обработчики изменения сущности
+        self._lock = threading.Lock()
+
+    def subscribe(self, kind, callback):
+        """Вызывать callback(id) при каждом изменении сущности вида kind"""
+        with self._lock:
+            self._listeners.setdefault(kind, []).append(callback)
+
+    def snapshot(self, kind):
+        """Запомнить состояние перед запросом (передается в put/put_many)"""
+        with self._lock:
+            return self._kind_versions.get(kind, 0)
+
+    def get(self, kind, entity_id):
+        """Строка сущности или None, если ее нет в карте или она устарела"""
+        key = (kind, int(entity_id))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                loaded_at, row = entry
+                if time.monotonic() - loaded_at <= self.max_age:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return row
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, kind, row, snapshot=None):
+        """Сохранить строку (ID в первой колонке)"""
+        self.put_many(kind, [row], snapshot)
+
+    def put_many(self, kind, rows, snapshot=None):
+        """Сохранить строки, если с момента snapshot сущности этого вида не менялись"""
+        now = time.monotonic()
+        with self._lock:
+            # Запрос начался до записи и мог прочитать старые данные
+            if snapshot is not None and snapshot != self._kind_versions.get(kind, 0):
+                return
+            for row in rows:
+                key = (kind, int(row[0]))
+                # Записи (namedtuple) сохраняются как есть, строки pyodbc - кортежем
+                row = row if isinstance(row, tuple) else tuple(row)
+                self._entries[key] = (now, row)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def evict(self, kind, entity_id):
+        """Отметить сущность измененной"""
+        key = (kind, int(entity_id))
+        with self._lock:
+            self._kind_versions[kind] = self._kind_versions.get(kind, 0) + 1
+            self._entries.pop(key, None)
+            listeners = list(self._listeners.get(kind, ()))
+        for callback in listeners:
+            callback(key[1])
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {'size': len(self._entries), 'max_size': self.max_size, 'hits': self.hits,
+                    'misses': self.misses, 'evictions': self.evictions}
+
+
+def evicts(kind, argument, ids=None):
+    """Отметить измененной сущность, ID которой передан методу записи в argument.
+
+    Если метод меняет несколько сущностей, ids(значение аргумента)
+    возвращает их ID.
+    """
+    def decorator(method):
+        signature = inspect.signature(method)
+
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            try:
+                return method(self, *args, **kwargs)
+            finally:
+                value = signature.bind(self, *args, **kwargs).arguments.get(argument)
+                if value is not None:
+                    for entity_id in (ids(value) if ids else [value]):
+                        self.identity.evict(kind, entity_id)
+        return wrapper
+    return decorator
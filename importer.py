@@ -0,0 +1,205 @@
+"""Массовый импорт автомобилей из CSV или Excel.
+
+Файл читается построчно, каждая строка проверяется так же, как форма
+добавления автомобиля, а корректные строки вставляются пачками через
+Database.add_cars. Ошибочные строки не прерывают импорт и попадают
+в отчет.
+
+    python importer.py stock.csv --commit-size 5000 --errors errors.csv
+"""
+import argparse
+import csv
+import os
+import time
+
+CAR_STATUSES = ("В наличии", "Продано", "На ремонте")
+
+# Заголовки колонок файла поставщика -> поле автомобиля
+HEADER_ALIASES = {
+    'марка': 'brand', 'brand': 'brand',
+    'модель': 'model', 'model': 'model',
+    'год': 'year', 'year': 'year',
+    'цвет': 'color', 'color': 'color',
+    'цена': 'price', 'price': 'price',
+    'статус': 'status', 'status': 'status',
+}
+
+
+class ImportReport:
+    """Итоги импорта: число строк, ошибки по строкам и скорость"""
+
+    def __init__(self):
+        self.rows_read = 0
+        self.imported = 0
+        self.errors = []  # (номер строки файла, сообщение)
+        self.elapsed = 0.0
+
+    @property
+    def rows_per_second(self):
+        return self.rows_read / self.elapsed if self.elapsed else 0.0
+
+    def summary(self):
+        return (f"Прочитано строк: {self.rows_read}, добавлено: {self.imported}, "
+                f"ошибок: {len(self.errors)} ({self.rows_per_second:,.0f} строк/с)")
+
+    def write_errors(self, path):
+        """Сохранить ошибки в CSV (строка файла, сообщение)"""
+        with open(path, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';')
+            writer.writerow(['Строка', 'Ошибка'])
+            writer.writerows(self.errors)
+
+
+def _normalize_header(header):
+    fields = []
+    for name in header:
+        name = (name or '').strip().lower()
+        fields.append(HEADER_ALIASES.get(name, name))
+    missing = {'brand', 'model', 'year', 'price'} - set(fields)
+    if missing:
+        raise ValueError(f"В файле нет обязательных колонок: {', '.join(sorted(missing))}")
+    return fields
+
+
+def _read_csv(path):
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        sample = f.read(4096)
+        f.seek(0)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=';,\t')
+        except csv.Error:
+            dialect = csv.excel
+        reader = csv.reader(f, dialect)
+        header = next(reader, None)
+        if header is None:
+            return
+        fields = _normalize_header(header)
+        for line, values in enumerate(reader, start=2):
+            if any(value.strip() for value in values):
+                yield line, dict(zip(fields, values))
+
+
+def _read_excel(path):
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        raise ValueError("Для импорта из Excel установите пакет openpyxl")
+
+    # read_only читает лист потоково, не загружая его в память целиком
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = next(rows, None)
+        if header is None:
+            return
+        fields = _normalize_header([str(value) if value is not None else '' for value in header])
+        for line, values in enumerate(rows, start=2):
+            values = ['' if value is None else str(value) for value in values]
+            if any(value.strip() for value in values):
+                yield line, dict(zip(fields, values))
+    finally:
+        workbook.close()
+
+
+def read_rows(path):
+    """Строки файла как (номер строки, словарь полей)"""
+    if os.path.splitext(path)[1].lower() in ('.xlsx', '.xlsm'):
+        return _read_excel(path)
+    return _read_csv(path)
+
+
+def validate_car(fields):
+    """Кортеж для вставки в Cars или ValueError с описанием ошибки"""
+    brand = (fields.get('brand') or '').strip()
+    model = (fields.get('model') or '').strip()
+    year = (fields.get('year') or '').strip()
+    price = (fields.get('price') or '').strip()
+    if not all([brand, model, year, price]):
+        raise ValueError("Заполните все обязательные поля")
+
+    try:
+        year = int(float(year))
+        price = float(price.replace(' ', '').replace(',', '.'))
+    except ValueError:
+        raise ValueError("Год и цена должны быть числами")
+
+    status = (fields.get('status') or '').strip() or "В наличии"
+    if status not in CAR_STATUSES:
+        raise ValueError(f"Неизвестный статус: {status}")
+
+    return brand, model, year, (fields.get('color') or '').strip(), price, status
+
+
+def import_cars(db, path, batch_size=1000, commit_size=10000, progress=None):
+    """Импортировать автомобили из файла, вернуть ImportReport.
+
+    Каждые commit_size корректных строк фиксируются отдельной транзакцией.
+    Если транзакция не прошла (например, из-за ограничения в базе), ее строки
+    вставляются по одной, чтобы в отчет попали только ошибочные.
+    progress(report) вызывается после каждой транзакции.
+    """
+    report = ImportReport()
+    started = time.perf_counter()
+    pending = []  # (номер строки, кортеж)
+
+    def flush():
+        ok, result = db.add_cars([car for _, car in pending], batch_size)
+        if ok:
+            report.imported += result
+        else:
+            for line, car in pending:
+                ok, result = db.add_cars([car])
+                if ok:
+                    report.imported += result
+                else:
+                    report.errors.append((line, result))
+        pending.clear()
+        report.elapsed = time.perf_counter() - started
+        if progress:
+            progress(report)
+
+    try:
+        for line, fields in read_rows(path):
+            report.rows_read += 1
+            try:
+                pending.append((line, validate_car(fields)))
+            except ValueError as e:
+                report.errors.append((line, str(e)))
+            if len(pending) >= commit_size:
+                flush()
+        if pending:
+            flush()
+    except ValueError as e:
+        report.errors.append((0, str(e)))
+
+    report.elapsed = time.perf_counter() - started
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('path', help="CSV или XLSX файл")
+    parser.add_argument('--batch-size', type=int, default=1000, help="строк в одном executemany")
+    parser.add_argument('--commit-size', type=int, default=10000, help="строк в одной транзакции")
+    parser.add_argument('--errors', help="куда сохранить отчет об ошибках (CSV)")
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database()
+    try:
+        report = import_cars(db, args.path, args.batch_size, args.commit_size,
+                             progress=lambda r: print(f"  добавлено {r.imported} из {r.rows_read}"))
+    finally:
+        db.close()
+
+    print(report.summary())
+    for line, message in report.errors[:20]:
+        print(f"  строка {line}: {message}")
+    if args.errors and report.errors:
+        report.write_errors(args.errors)
+        print(f"Отчет об ошибках: {args.errors}")
+
+
+if __name__ == '__main__':
+    main()
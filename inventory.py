@@ -0,0 +1,281 @@
+"""Колоночный снимок таблицы Cars в памяти для мгновенной фильтрации.
+
+Каждая колонка хранится массивом NumPy, строковые колонки (марка, модель,
+цвет, статус) - кодами словаря, пустые год и цена - как NaN: условия на
+них не выполняются, а при сортировке они идут первыми, как NULL в
+query_cars. Фильтры и сортировка выполняются над
+массивами целиком, без цикла по строкам, поэтому отбор из миллиона
+автомобилей занимает миллисекунды. Нужен пакет numpy.
+
+Снимок обновляется по изменениям: дочитываются новые автомобили
+(CarID больше последнего известного) и перечитываются те, что меняло
+это приложение (через карту сущностей Database). Изменения из других
+программ подхватываются полной перезагрузкой раз в max_age секунд.
+"""
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+HAVE_NUMPY = np is not None
+
+from models import Car
+
+# Колонки, по которым снимок умеет сортировать (как CAR_SORT_COLUMNS в database)
+SORT_COLUMNS = {'CarID': 'car_id', 'Brand': 'brand', 'Model': 'model', 'Year': 'year',
+                'Color': 'color', 'Price': 'price', 'Status': 'status'}
+
+ENCODED_COLUMNS = ('brand', 'model', 'color', 'status')
+
+
+class _Dictionary:
+    """Словарь кодирования строковой колонки: значение <-> целый код"""
+
+    def __init__(self):
+        self.values = []
+        self.codes = {}
+        self._ranks = None
+
+    def encode(self, values):
+        codes = self.codes
+        result = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.values)
+                self.values.append(value)
+                self._ranks = None
+            result[i] = code
+        return result
+
+    def lookup(self, values):
+        """Коды известных значений (неизвестные отбрасываются)"""
+        return np.array([self.codes[v] for v in values if v in self.codes], dtype=np.int32)
+
+    def ranks(self):
+        """Место каждого кода в алфавитном порядке значений (для сортировки)"""
+        if self._ranks is None:
+            # None - первым, как NULL в ORDER BY
+            order = sorted(range(len(self.values)),
+                           key=lambda code: (self.values[code] is not None, self.values[code] or ''))
+            ranks = np.empty(len(order), dtype=np.int32)
+            ranks[order] = np.arange(len(order), dtype=np.int32)
+            self._ranks = ranks
+        return self._ranks
+
+
+class InventorySnapshot:
+    """Снимок автомобилей в колонках NumPy"""
+
+    def __init__(self, db=None, max_age=300, batch_size=10000):
+        if np is None:
+            raise RuntimeError("Для снимка автомобилей нужен пакет numpy")
+        self.db = db
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.loaded_at = None
+        self.dictionaries = {name: _Dictionary() for name in ENCODED_COLUMNS}
+        self.columns = self._empty_columns()
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        if db is not None:
+            db.identity.subscribe('car', self._mark_dirty)
+
+    def __len__(self):
+        return len(self.columns['car_id'])
+
+    @staticmethod
+    def _empty_columns():
+        return {
+            'car_id': np.empty(0, dtype=np.int64),
+            'year': np.empty(0, dtype=np.float32),
+            'price': np.empty(0, dtype=np.float64),
+            **{name: np.empty(0, dtype=np.int32) for name in ENCODED_COLUMNS},
+        }
+
+    def _mark_dirty(self, car_id):
+        with self._lock:
+            self._dirty.add(int(car_id))
+
+    def _encode(self, rows):
+        """Строки Car -> колонки"""
+        return {
+            'car_id': np.fromiter((row.car_id for row in rows), dtype=np.int64, count=len(rows)),
+            'year': np.fromiter((np.nan if row.year is None else row.year for row in rows),
+                                dtype=np.float32, count=len(rows)),
+            'price': np.fromiter((np.nan if row.price is None else float(row.price) for row in rows),
+                                 dtype=np.float64, count=len(rows)),
+            **{name: self.dictionaries[name].encode([getattr(row, name) for row in rows])
+               for name in ENCODED_COLUMNS},
+        }
+
+    # --- загрузка и обновление ---
+
+    def load_rows(self, rows):
+        """Добавить или заменить строки (Car), снимок остается упорядоченным по CarID.
+
+        Из повторов одного CarID действует последний.
+        """
+        rows = sorted({row.car_id: row for row in rows}.values(), key=lambda row: row.car_id)
+        if not rows:
+            return
+        with self._lock:
+            new = self._encode(rows)
+            current = self.columns
+            positions = np.searchsorted(current['car_id'], new['car_id'])
+            found = positions < len(current['car_id'])
+            found[found] = current['car_id'][positions[found]] == new['car_id'][found]
+
+            # Уже известные автомобили обновляются на месте
+            if found.any():
+                for name, column in current.items():
+                    column[positions[found]] = new[name][found]
+
+            # Новые вставляются с сохранением порядка CarID
+            added = ~found
+            if added.any():
+                columns = {}
+                insert_at = positions[added]
+                for name, column in current.items():
+                    columns[name] = np.insert(column, insert_at, new[name][added])
+                self.columns = columns
+
+    def remove(self, car_ids):
+        """Убрать автомобили из снимка"""
+        with self._lock:
+            keep = ~np.isin(self.columns['car_id'], np.asarray(list(car_ids), dtype=np.int64))
+            if not keep.all():
+                self.columns = {name: column[keep] for name, column in self.columns.items()}
+
+    def _read(self, **conditions):
+        """Автомобили из базы (условия - как у Database.iter_car_batches)"""
+        rows = []
+        for batch in self.db.iter_car_batches(batch_size=self.batch_size, **conditions):
+            rows.extend(batch)
+        return rows
+
+    def refresh(self, full=False):
+        """Подтянуть изменения из базы, вернуть число прочитанных строк.
+
+        full=True перечитывает таблицу целиком. Запросы к базе выполняются
+        без блокировки снимка, поэтому фильтрация в это время не ждет.
+        """
+        if not self.db.ensure_connection():
+            raise RuntimeError("Нет соединения с базой данных")
+
+        with self._refresh_lock:
+            with self._lock:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+                    full = True
+                # Изменения, отмеченные во время чтения, дождутся следующего обновления
+                dirty, self._dirty = sorted(self._dirty), set()
+                last_id = int(self.columns['car_id'][-1]) if len(self) else 0
+
+            if full:
+                rows = self._read()
+                with self._lock:
+                    self.dictionaries = {name: _Dictionary() for name in ENCODED_COLUMNS}
+                    self.columns = self._empty_columns()
+                    self.load_rows(rows)
+                    self.loaded_at = time.monotonic()
+                return len(rows)
+
+            # Автомобиль, добавленный и измененный после прошлого обновления, попадает
+            # в обе выборки; верна вторая, она прочитана позже
+            dirty_ids = set(dirty)
+            rows = [row for row in self._read(after_id=last_id) if row.car_id not in dirty_ids]
+
+            # Измененные этим приложением автомобили перечитываются
+            changed = self._read(car_ids=dirty)
+            deleted = dirty_ids - {row.car_id for row in changed}
+
+            with self._lock:
+                if deleted:
+                    self.remove(deleted)
+                self.load_rows(rows + changed)
+            return len(rows) + len(changed)
+
+    # --- запросы ---
+
+    def filter(self, brand=None, model=None, color=None, status=None, year_from=None, year_to=None,
+               price_from=None, price_to=None):
+        """Маска строк, подходящих под все условия.
+
+        brand, model, color и status - значение или список значений.
+        """
+        with self._lock:
+            columns = self.columns
+            mask = np.ones(len(self), dtype=bool)
+            for name, value in (('brand', brand), ('model', model), ('color', color), ('status', status)):
+                if value:
+                    values = [value] if isinstance(value, str) else list(value)
+                    dictionary = self.dictionaries[name]
+                    # Таблица "код -> подходит", выборка по ней быстрее np.isin
+                    allowed = np.zeros(len(dictionary.values), dtype=bool)
+                    allowed[dictionary.lookup(values)] = True
+                    mask &= allowed[columns[name]]
+            if year_from is not None:
+                mask &= columns['year'] >= int(year_from)
+            if year_to is not None:
+                mask &= columns['year'] <= int(year_to)
+            if price_from is not None:
+                mask &= columns['price'] >= float(price_from)
+            if price_to is not None:
+                mask &= columns['price'] <= float(price_to)
+            return mask
+
+    def query(self, sort_by='CarID', descending=False, **filters):
+        """CarID автомобилей, подходящих под фильтры, в порядке сортировки"""
+        if sort_by not in SORT_COLUMNS:
+            raise ValueError(f"Недопустимая колонка сортировки: {sort_by}")
+        with self._lock:
+            mask = self.filter(**filters)
+            car_ids = self.columns['car_id'][mask]
+            name = SORT_COLUMNS[sort_by]
+            if name == 'car_id':
+                order = np.arange(len(car_ids))
+            else:
+                key = self.columns[name][mask]
+                if name in ENCODED_COLUMNS:
+                    key = self.dictionaries[name].ranks()[key]
+                else:
+                    # lexsort ставит NaN в конец, а query_cars - NULL в начало
+                    key = np.where(np.isnan(key), -np.inf, key)
+                # CarID делает порядок однозначным при равных значениях, как в query_cars
+                order = np.lexsort((car_ids, key))
+            if descending:
+                order = order[::-1]
+            return car_ids[order]
+
+    def rows(self, car_ids):
+        """Записи Car для списка CarID (отсутствующие в снимке пропускаются)"""
+        with self._lock:
+            columns = self.columns
+            car_ids = np.asarray(car_ids, dtype=np.int64)
+            if not len(self) or not len(car_ids):
+                return []
+            positions = np.minimum(np.searchsorted(columns['car_id'], car_ids), len(self) - 1)
+            positions = positions[columns['car_id'][positions] == car_ids]
+
+            decoded = {name: [self.dictionaries[name].values[code] for code in columns[name][positions]]
+                       for name in ENCODED_COLUMNS}
+            years = columns['year'][positions].tolist()
+            prices = columns['price'][positions].tolist()
+            return [
+                Car(car_id, brand, model, None if year != year else int(year), color,
+                    None if price != price else price, status)
+                for car_id, brand, model, year, color, price, status in zip(
+                    columns['car_id'][positions].tolist(), decoded['brand'], decoded['model'],
+                    years, decoded['color'], prices, decoded['status'])
+            ]
+
+    def distinct(self, name):
+        """Значения строковой колонки, встречающиеся в снимке, по алфавиту"""
+        with self._lock:
+            codes = np.unique(self.columns[name])
+            values = self.dictionaries[name].values
+            return sorted((values[code] for code in codes if values[code] is not None), key=str)
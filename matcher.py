@@ -0,0 +1,226 @@
+"""Подбор свободных автомобилей под открытые заявки на покупку.
+
+Автомобили "В наличии" индексируются по (марка, модель), внутри группы -
+списком, упорядоченным по цене. Подходящие под заявку автомобили (та же
+марка и модель, цена не выше MaxPrice) - это начало такого списка, его
+длина находится двоичным поиском (bisect). Все открытые заявки
+сопоставляются за один проход: заявки группы сортируются по MaxPrice
+и сливаются со списком цен.
+
+Индекс обновляется по изменениям, как снимок inventory: дочитываются
+новые автомобили и перечитываются те, что меняло это приложение (через
+карту сущностей Database), а пересчитываются только заявки затронутых
+групп. Заявки перечитываются, когда приложение их меняло (тег 'requests'
+кэша запросов), и вместе со всем индексом - раз в max_age секунд.
+"""
+import bisect
+import threading
+import time
+from collections import namedtuple
+
+AVAILABLE_STATUS = 'В наличии'
+
+# Итог подбора для заявки: сколько автомобилей подходит и самый дешевый из них (Car)
+Match = namedtuple('Match', 'request_id count best')
+
+_NO_PRICE = float('inf')
+
+
+def match_key(brand, model):
+    """Ключ группы: марка и модель без учета регистра и пробелов по краям"""
+    return (brand or '').strip().casefold(), (model or '').strip().casefold()
+
+
+def _price(value):
+    # Автомобиль без цены подходит только заявкам без ограничения цены
+    return _NO_PRICE if value is None else float(value)
+
+
+class RequestMatcher:
+    """Индекс свободных автомобилей и подбор для открытых заявок"""
+
+    def __init__(self, db=None, max_age=300, batch_size=10000):
+        self.db = db
+        self.max_age = max_age
+        self.batch_size = batch_size
+        self.loaded_at = None
+        self._stock = {}     # (марка, модель) -> [(цена, CarID)] по возрастанию
+        self._cars = {}      # CarID -> Car (только свободные)
+        self._requests = {}  # RequestID -> ((марка, модель), MaxPrice)
+        self._groups = {}    # (марка, модель) -> [(MaxPrice, RequestID)] по возрастанию
+        self._matches = {}   # RequestID -> Match
+        self._last_car_id = 0
+        self._requests_version = None
+        self._dirty = set()
+        self._lock = threading.RLock()
+        self._refresh_lock = threading.Lock()
+        if db is not None:
+            db.identity.subscribe('car', self._mark_dirty)
+
+    def _mark_dirty(self, car_id):
+        with self._lock:
+            self._dirty.add(int(car_id))
+
+    # --- загрузка и обновление ---
+
+    def load(self, cars, requests):
+        """Заменить индекс: cars - записи Car, requests - (RequestID, марка, модель, MaxPrice)"""
+        with self._lock:
+            self._stock, self._cars = {}, {}
+            for car in cars:
+                if car.status == AVAILABLE_STATUS:
+                    self._cars[car.car_id] = car
+                    self._stock.setdefault(match_key(car.brand, car.model), []).append(
+                        (_price(car.price), car.car_id))
+            for prices in self._stock.values():
+                prices.sort()
+            self._last_car_id = max(self._cars, default=0)
+            self.load_requests(requests)
+
+    def load_requests(self, requests):
+        """Заменить открытые заявки и сопоставить их все"""
+        with self._lock:
+            self._requests, self._groups = {}, {}
+            for request_id, brand, model, max_price in requests:
+                key = match_key(brand, model)
+                self._requests[request_id] = (key, max_price)
+                self._groups.setdefault(key, []).append((_price(max_price), request_id))
+            self._matches = {}
+            for key, group in self._groups.items():
+                group.sort()
+                self._match_group(key)
+
+    def update_cars(self, cars, removed=()):
+        """Учесть измененные автомобили (Car) и удаленные (CarID).
+
+        Пересчитываются только заявки на те марки и модели, которых
+        коснулось изменение. Возвращает множество RequestID, у которых
+        изменился результат подбора.
+        """
+        # Из повторов одного CarID действует последний
+        cars = list({car.car_id: car for car in cars}.values())
+        with self._lock:
+            touched = set()
+            for car_id in list(removed) + [car.car_id for car in cars]:
+                old = self._cars.pop(car_id, None)
+                if old is not None:
+                    key = match_key(old.brand, old.model)
+                    prices = self._stock[key]
+                    del prices[bisect.bisect_left(prices, (_price(old.price), car_id))]
+                    touched.add(key)
+            for car in cars:
+                if car.status == AVAILABLE_STATUS:
+                    key = match_key(car.brand, car.model)
+                    bisect.insort(self._stock.setdefault(key, []), (_price(car.price), car.car_id))
+                    self._cars[car.car_id] = car
+                    self._last_car_id = max(self._last_car_id, car.car_id)
+                    touched.add(key)
+
+            changed = set()
+            for key in touched:
+                if not self._stock.get(key):
+                    self._stock.pop(key, None)
+                before = {request_id: self._matches.get(request_id) for _, request_id in self._groups.get(key, ())}
+                self._match_group(key)
+                changed.update(request_id for request_id, match in before.items()
+                               if match != self._matches.get(request_id))
+            return changed
+
+    def _read_cars(self, **conditions):
+        """Автомобили из базы (условия - как у Database.iter_car_batches)"""
+        rows = []
+        for batch in self.db.iter_car_batches(batch_size=self.batch_size, **conditions):
+            rows.extend(batch)
+        return rows
+
+    def _read_requests(self):
+        rows = []
+        for batch in self.db.iter_open_request_batches(batch_size=self.batch_size):
+            rows.extend(tuple(row) for row in batch)
+        return rows
+
+    def refresh(self, full=False):
+        """Подтянуть изменения из базы и пересопоставить затронутые заявки.
+
+        Возвращает множество RequestID, у которых изменился подбор (после
+        полной перезагрузки - все открытые заявки).
+        """
+        if not self.db.ensure_connection():
+            raise RuntimeError("Нет соединения с базой данных")
+
+        with self._refresh_lock:
+            with self._lock:
+                if self.loaded_at is None or time.monotonic() - self.loaded_at > self.max_age:
+                    full = True
+                dirty, self._dirty = sorted(self._dirty), set()
+                last_id = self._last_car_id
+            if self.db.cache is not None:
+                requests_version = self.db.cache.versions(('requests',))
+            else:
+                # Без кэша запросов изменения заявок не отследить: перечитываем каждый раз
+                requests_version = object()
+
+            if full:
+                cars = self._read_cars(status=AVAILABLE_STATUS)
+                requests = self._read_requests()
+                with self._lock:
+                    self.load(cars, requests)
+                    self.loaded_at = time.monotonic()
+                    self._requests_version = requests_version
+                    return set(self._requests)
+
+            cars = self._read_cars(after_id=last_id, status=AVAILABLE_STATUS)
+            # Автомобиль, добавленный и измененный после прошлого обновления, попадает
+            # в обе выборки; верна вторая, она прочитана позже
+            dirty_ids = set(dirty)
+            cars = [car for car in cars if car.car_id not in dirty_ids]
+            # Измененные автомобили перечитываются
+            cars.extend(self._read_cars(car_ids=dirty))
+            removed = dirty_ids - {car.car_id for car in cars}
+            requests = self._read_requests() if requests_version != self._requests_version else None
+
+            with self._lock:
+                if requests is not None:
+                    self._requests_version = requests_version
+                    before = dict(self._matches)
+                    self.update_cars(cars, removed)
+                    self.load_requests(requests)
+                    return {request_id for request_id, match in self._matches.items()
+                            if before.get(request_id) != match}
+                return self.update_cars(cars, removed)
+
+    # --- подбор ---
+
+    def _match_group(self, key):
+        """Сопоставить все заявки группы одним проходом по списку цен"""
+        prices = self._stock.get(key, [])
+        position = 0
+        for limit, request_id in self._groups.get(key, ()):
+            # Заявки идут по возрастанию MaxPrice, поэтому граница только растет
+            while position < len(prices) and prices[position][0] <= limit:
+                position += 1
+            best = self._cars[prices[0][1]] if position else None
+            self._matches[request_id] = Match(request_id, position, best)
+
+    def match(self, request_id):
+        """Match для открытой заявки или None, если заявка не открыта"""
+        with self._lock:
+            return self._matches.get(request_id)
+
+    def cars_for(self, request_id, limit=None):
+        """Подходящие под заявку автомобили (Car), от дешевых к дорогим"""
+        with self._lock:
+            request = self._requests.get(request_id)
+            if request is None:
+                return []
+            key, max_price = request
+            prices = self._stock.get(key, [])
+            count = bisect.bisect_right(prices, (_price(max_price), _NO_PRICE))
+            if limit is not None:
+                count = min(count, limit)
+            return [self._cars[car_id] for _, car_id in prices[:count]]
+
+    def stats(self):
+        with self._lock:
+            return {'cars': len(self._cars), 'requests': len(self._requests),
+                    'matched': sum(1 for match in self._matches.values() if match.count)}
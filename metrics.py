@@ -0,0 +1,324 @@
+"""Замеры запросов Database: время, строки, байты, переподключения.
+
+Каждый вызов _run и _iter_batches записывается как операция того
+публичного метода Database, из которого он сделан (get_all_cars,
+add_sale...), или, если запрос пришел снаружи, как операция вызвавшей
+функции (datagen.load). По каждому методу копится гистограмма
+времени с логарифмическими корзинами, по ней считаются p50/p95/p99.
+
+Операции дольше порога и завершившиеся ошибкой пишутся в журнал
+медленных запросов - по JSON объекту на строку. Статистику можно
+получить в любой момент: Database.query_stats(), report() - таблицей,
+dump() - в JSON файл.
+"""
+import bisect
+import inspect
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+# Верхние границы корзин гистограммы: от 0.1 мс до 100 с, шаг 10^(1/8) (~33%)
+BUCKETS = [10 ** (exponent / 8) / 10000 for exponent in range(49)]
+
+# Строк, по которым оценивается размер большой пачки
+SIZE_SAMPLE = 64
+
+
+def _value_size(value):
+    """Примерный размер значения на линии (NVARCHAR - 2 байта на символ)"""
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return 2 * len(value)
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return 8
+
+
+def rows_size(rows):
+    """Примерный объем строк в байтах; большие пачки оцениваются по выборке"""
+    if len(rows) <= SIZE_SAMPLE:
+        sample = rows
+    else:
+        sample = rows[::len(rows) // SIZE_SAMPLE]
+    if not sample:
+        return 0
+    total = sum(sum(map(_value_size, row)) for row in sample)
+    return total * len(rows) // len(sample)
+
+
+def method_names(cls):
+    """Код функции -> имя для публичных методов класса (под декораторами)"""
+    names = {}
+    for name, member in vars(cls).items():
+        if not name.startswith('_') and inspect.isfunction(member):
+            names[inspect.unwrap(member).__code__] = name
+    return names
+
+
+def _code_name(code):
+    # co_qualname есть только с Python 3.11
+    return getattr(code, 'co_qualname', code.co_name)
+
+
+def caller_name(names, own_file, depth=2):
+    """Имя ближайшего по стеку метода из names.
+
+    Просматриваются только кадры файла own_file: публичный метод всегда
+    ниже первого внешнего кадра, поэтому стек вызывающего кода (главный
+    цикл Tk, рабочие потоки) не обходится. Если метода нет, берется
+    первая функция вне own_file.
+    """
+    frame = sys._getframe(depth)
+    while frame is not None:
+        code = frame.f_code
+        name = names.get(code)
+        if name is not None:
+            return name
+        if code.co_filename != own_file:
+            return _code_name(code)
+        frame = frame.f_back
+    return '?'
+
+
+class Operation:
+    """Замер одной операции; строки и байты добавляют курсоры, пока она идет"""
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.elapsed = 0.0
+        self.rows = 0
+        self.bytes = 0
+        self.reconnects = 0
+        self.statements = []
+        self.error = None
+
+    def add_rows(self, rows):
+        self.rows += len(rows)
+        self.bytes += rows_size(rows)
+
+
+class _Proxy:
+    """Обертка объекта pyodbc: все, что не переопределено, уходит в raw"""
+
+    __slots__ = ('_raw', '_operation')
+
+    def __init__(self, raw, operation):
+        object.__setattr__(self, '_raw', raw)
+        object.__setattr__(self, '_operation', operation)
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._raw, name, value)
+
+
+class InstrumentedCursor(_Proxy):
+    """Курсор, который записывает выполненные запросы и прочитанные строки"""
+
+    __slots__ = ()
+
+    # Обработчик всех запросов: statement_listener(name, sql, params), где
+    # name - метод Database (см. benchmarks/query_plan_check.py)
+    statement_listener = None
+
+    def execute(self, sql, *params):
+        self._operation.statements.append(sql)
+        if InstrumentedCursor.statement_listener is not None:
+            InstrumentedCursor.statement_listener(self._operation.name, sql, params)
+        self._raw.execute(sql, *params)
+        return self
+
+    def executemany(self, sql, params):
+        self._operation.statements.append(sql)
+        return self._raw.executemany(sql, params)
+
+    def fetchone(self):
+        row = self._raw.fetchone()
+        if row is not None:
+            self._operation.add_rows([row])
+        return row
+
+    def fetchmany(self, *size):
+        rows = self._raw.fetchmany(*size)
+        self._operation.add_rows(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._raw.fetchall()
+        self._operation.add_rows(rows)
+        return rows
+
+    def __iter__(self):
+        for row in self._raw:
+            self._operation.add_rows([row])
+            yield row
+
+
+class InstrumentedConnection(_Proxy):
+    """Соединение, курсоры которого ведут замеры операции"""
+
+    __slots__ = ()
+
+    def cursor(self):
+        return InstrumentedCursor(self._raw.cursor(), self._operation)
+
+
+class MethodStats:
+    """Накопленные замеры одного метода"""
+
+    def __init__(self):
+        self.calls = 0
+        self.errors = 0
+        self.rows = 0
+        self.bytes = 0
+        self.reconnects = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.last_error = None
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, operation):
+        self.calls += 1
+        self.rows += operation.rows
+        self.bytes += operation.bytes
+        self.reconnects += operation.reconnects
+        self.total += operation.elapsed
+        self.max = max(self.max, operation.elapsed)
+        self.histogram[bisect.bisect_left(BUCKETS, operation.elapsed)] += 1
+        if operation.error is not None:
+            self.errors += 1
+            self.last_error = operation.error
+
+    def percentile(self, fraction):
+        """Верхняя граница корзины, в которую попал fraction-квантиль"""
+        if not self.calls:
+            return 0.0
+        target = fraction * self.calls
+        seen = 0
+        for index, count in enumerate(self.histogram):
+            seen += count
+            if seen >= target:
+                return min(BUCKETS[index], self.max) if index < len(BUCKETS) else self.max
+        return self.max
+
+    def as_dict(self):
+        return {
+            'calls': self.calls,
+            'errors': self.errors,
+            'rows': self.rows,
+            'bytes': self.bytes,
+            'reconnects': self.reconnects,
+            'total': self.total,
+            'mean': self.total / self.calls if self.calls else 0.0,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+            'max': self.max,
+            'last_error': self.last_error,
+        }
+
+
+class QueryMetrics:
+    """Статистика запросов по методам и журнал медленных запросов.
+
+    slow_threshold - порог в секундах, slow_log - путь к журналу
+    (None - не вести журнал).
+    """
+
+    def __init__(self, slow_threshold=0.5, slow_log=None):
+        self.slow_threshold = slow_threshold
+        self.slow_log = slow_log
+        self.slow_queries = 0
+        self.started_at = datetime.now()
+        self._methods = {}
+        self._lock = threading.Lock()
+        self._log_lock = threading.Lock()
+
+    def start(self, name):
+        return Operation(name)
+
+    def wrap(self, connection, operation):
+        """Соединение pyodbc, запросы которого попадут в замер operation"""
+        return InstrumentedConnection(connection, operation)
+
+    def finish(self, operation, elapsed=None):
+        """Записать завершенную операцию (elapsed - если время считали сами)"""
+        operation.elapsed = time.perf_counter() - operation.started if elapsed is None else elapsed
+        with self._lock:
+            stats = self._methods.get(operation.name)
+            if stats is None:
+                stats = self._methods[operation.name] = MethodStats()
+            stats.add(operation)
+        if operation.error is not None or operation.elapsed >= self.slow_threshold:
+            self._log(operation)
+
+    @contextmanager
+    def measure(self, name):
+        """Замер блока: with metrics.measure('get_all_cars') as operation"""
+        operation = self.start(name)
+        try:
+            yield operation
+        except Exception as e:
+            operation.error = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            self.finish(operation)
+
+    def _log(self, operation):
+        with self._lock:
+            self.slow_queries += 1
+        if not self.slow_log:
+            return
+        entry = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'method': operation.name,
+            'elapsed': round(operation.elapsed, 4),
+            'rows': operation.rows,
+            'bytes': operation.bytes,
+            'reconnects': operation.reconnects,
+            'error': operation.error,
+            # Параметры не пишутся: среди них бывают пароли и личные данные
+            'sql': [' '.join(sql.split())[:1000] for sql in operation.statements],
+        }
+        try:
+            with self._log_lock, open(self.slow_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + '\n')
+        except OSError as e:
+            print(f"Не удалось записать журнал медленных запросов {self.slow_log}: {e}")
+
+    def snapshot(self):
+        """Статистика по методам: имя -> словарь (время в секундах)"""
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self._methods.items()}
+
+    def reset(self):
+        with self._lock:
+            self._methods.clear()
+            self.slow_queries = 0
+            self.started_at = datetime.now()
+
+    def report(self):
+        """Статистика таблицей, самые затратные методы сверху"""
+        stats = sorted(self.snapshot().items(), key=lambda item: item[1]['total'], reverse=True)
+        lines = [f"Запросы с {self.started_at:%d.%m.%Y %H:%M:%S}, медленных: {self.slow_queries}",
+                 f"{'Метод':<32} {'вызовов':>8} {'ошибок':>7} {'p50 мс':>9} {'p95 мс':>9} "
+                 f"{'p99 мс':>9} {'max мс':>9} {'всего с':>9} {'строк':>10} {'КБ':>10} {'перепод.':>8}"]
+        for name, s in stats:
+            lines.append(
+                f"{name[:32]:<32} {s['calls']:>8} {s['errors']:>7} {s['p50'] * 1000:>9.1f} {s['p95'] * 1000:>9.1f} "
+                f"{s['p99'] * 1000:>9.1f} {s['max'] * 1000:>9.1f} {s['total']:>9.2f} {s['rows']:>10} "
+                f"{s['bytes'] // 1024:>10} {s['reconnects']:>8}")
+        return '\n'.join(lines)
+
+    def dump(self, path):
+        """Сохранить статистику в JSON файл"""
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump({'started_at': self.started_at.isoformat(timespec='seconds'),
+                       'slow_queries': self.slow_queries, 'methods': self.snapshot()},
+                      f, ensure_ascii=False, indent=2)
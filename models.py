@@ -0,0 +1,42 @@
+"""Записи, в которые Database превращает строки результатов запросов.
+
+Это namedtuple: памяти на строку уходит столько же, сколько на кортеж
+(у namedtuple пустые __slots__), поля доступны по имени, а доступ
+по индексу (car[5]) продолжает работать.
+"""
+from collections import namedtuple
+
+Car = namedtuple('Car', 'car_id brand model year color price status')
+
+Client = namedtuple('Client', 'client_id first_name last_name phone email username')
+
+Employee = namedtuple('Employee', 'employee_id first_name last_name position phone email username role')
+
+# Строка списка продаж (с именами клиента и сотрудника)
+Sale = namedtuple('Sale', 'sale_id brand model year color client_name employee_name sale_date sale_price')
+
+# Строка списка покупок клиента
+ClientSale = namedtuple('ClientSale', 'sale_id brand model year color employee_name sale_date sale_price')
+
+# Строка списка заявок (с именем клиента)
+PurchaseRequest = namedtuple('PurchaseRequest', 'request_id client_name brand model max_price request_date status')
+
+# Заявка целиком, как она хранится в PurchaseRequests
+PurchaseRequestDetails = namedtuple(
+    'PurchaseRequestDetails', 'request_id client_id car_id brand model max_price request_date status')
+
+# Вошедший пользователь: клиент (role='Client') или сотрудник
+User = namedtuple('User', 'user_id first_name last_name role')
+
+# Строка панели руководителя: группа (месяц, марка, модель, сотрудник) и итоги
+SummaryRow = namedtuple('SummaryRow', 'group units revenue')
+
+# Колонки запросов, из которых собираются записи
+CAR_COLUMNS = "CarID, Brand, Model, Year, Color, Price, Status"
+CLIENT_COLUMNS = "ClientID, FirstName, LastName, Phone, Email, Username"
+EMPLOYEE_COLUMNS = "EmployeeID, FirstName, LastName, Position, Phone, Email, Username, Role"
+
+
+def to_records(record, rows):
+    """Список строк результата -> список записей"""
+    return list(map(record._make, rows))
@@ -0,0 +1,101 @@
+def seek_condition(columns, values, descending=False, backwards=False, nullable=()):
+    """Условие keyset-пагинации для составного ключа сортировки.
+
+    Для колонок (a, b) и значений (x, y) при прямом проходе по возрастанию
+    получается "(a > ?) OR (a = ? AND b > ?)". Возвращает текст условия
+    и список параметров.
+
+    NULL считается меньше любого значения, как при сортировке в SQL Server
+    и SQLite (по возрастанию NULL идут первыми). Колонки, которые могут
+    быть NULL, перечисляются в nullable: при движении к меньшим значениям
+    условие захватывает и строки с NULL. Граничное значение None
+    сравнивается через IS NULL / IS NOT NULL.
+    """
+    greater = descending == backwards
+    alternatives = []
+    params = []
+    for i, column in enumerate(columns):
+        parts = []
+        part_params = []
+        for prev, value in zip(columns[:i], values[:i]):
+            if value is None:
+                parts.append(f"{prev} IS NULL")
+            else:
+                parts.append(f"{prev} = ?")
+                part_params.append(value)
+        value = values[i]
+        if value is None:
+            if not greater:
+                continue  # меньше NULL ничего нет
+            parts.append(f"{column} IS NOT NULL")
+        else:
+            smaller = f"{column} < ?"
+            if not greater and column in nullable:
+                smaller = f"({smaller} OR {column} IS NULL)"
+            parts.append(f"{column} > ?" if greater else smaller)
+            part_params.append(value)
+        alternatives.append(f"({' AND '.join(parts)})")
+        params.extend(part_params)
+    if not alternatives:
+        return "(1 = 0)", []
+    return f"({' OR '.join(alternatives)})", params
+
+
+class PageCursor:
+    """Постраничный просмотр выборки по ключу сортировки (keyset/seek).
+
+    fetch(after=None, before=None, limit=N) должен вернуть не более N строк,
+    идущих сразу после ключа after или сразу перед ключом before,
+    в порядке отображения. key(row) возвращает ключ сортировки строки.
+    """
+
+    def __init__(self, fetch, key=lambda row: (row[0],), page_size=100):
+        self.fetch = fetch
+        self.key = key
+        self.page_size = page_size
+        self.rows = []
+        self.has_next = False
+        self.has_previous = False
+
+    def __iter__(self):
+        """Все строки выборки, страница за страницей, начиная с первой"""
+        rows = self.first()
+        while rows:
+            yield from rows
+            rows = self.next()
+
+    def first(self):
+        """Первая страница"""
+        rows = list(self.fetch(limit=self.page_size + 1))
+        self.has_next = len(rows) > self.page_size
+        self.has_previous = False
+        self.rows = rows[:self.page_size]
+        return self.rows
+
+    def next(self):
+        """Следующая страница (пустой список, если дальше строк нет)"""
+        if not self.rows:
+            return self.first()
+        if not self.has_next:
+            return []
+        rows = list(self.fetch(after=self.key(self.rows[-1]), limit=self.page_size + 1))
+        if not rows:
+            self.has_next = False
+            return []
+        self.has_next = len(rows) > self.page_size
+        self.has_previous = True
+        self.rows = rows[:self.page_size]
+        return self.rows
+
+    def previous(self):
+        """Предыдущая страница (пустой список, если это начало выборки)"""
+        if not self.rows or not self.has_previous:
+            return []
+        rows = list(self.fetch(before=self.key(self.rows[0]), limit=self.page_size + 1))
+        if not rows:
+            self.has_previous = False
+            return []
+        self.has_previous = len(rows) > self.page_size
+        self.has_next = True
+        self.rows = rows[-self.page_size:]
+        return self.rows
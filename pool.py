@@ -0,0 +1,225 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class PoolTimeoutError(Exception):
+    """Не удалось получить соединение из пула за отведенное время"""
+
+
+class PooledConnection:
+    """Соединение из пула вместе с его состоянием"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.created_at = time.monotonic()
+        self.last_used = self.created_at
+        self.uses = 0
+        self.healthy = True
+
+    def age(self, now):
+        return now - self.created_at
+
+    def idle_time(self, now):
+        return now - self.last_used
+
+    def close(self):
+        self.healthy = False
+        try:
+            self.raw.close()
+        except Exception:
+            pass
+
+
+class ConnectionPool:
+    """Ограниченный пул соединений с выдачей и возвратом.
+
+    Простаивающие дольше idle_timeout секунд соединения закрываются,
+    соединения старше max_lifetime секунд пересоздаются, а соединения,
+    на которых произошла ошибка, в пул не возвращаются.
+    """
+
+    def __init__(self, factory, max_size=5, idle_timeout=300, max_lifetime=1800,
+                 acquire_timeout=30, validate=None, validate_interval=30):
+        self.factory = factory
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_lifetime = max_lifetime
+        self.acquire_timeout = acquire_timeout
+        self.validate = validate
+        self.validate_interval = validate_interval
+
+        self._idle = deque()
+        self._in_use = set()
+        self._opening = 0
+        self._closed = False
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+
+    @property
+    def size(self):
+        """Общее число открытых соединений"""
+        with self._lock:
+            return len(self._idle) + len(self._in_use) + self._opening
+
+    def stats(self):
+        """Текущее состояние пула"""
+        with self._lock:
+            return {
+                'idle': len(self._idle),
+                'in_use': len(self._in_use),
+                'opening': self._opening,
+                'max_size': self.max_size,
+            }
+
+    def add(self, raw):
+        """Добавить в пул уже открытое соединение"""
+        conn = PooledConnection(raw)
+        with self._lock:
+            if self._closed or len(self._idle) + len(self._in_use) + self._opening >= self.max_size:
+                conn.close()
+                return
+            self._idle.append(conn)
+            self._available.notify()
+
+    def _expired(self, conn, now):
+        if not conn.healthy:
+            return True
+        if self.max_lifetime is not None and conn.age(now) > self.max_lifetime:
+            return True
+        if self.idle_timeout is not None and conn.idle_time(now) > self.idle_timeout:
+            return True
+        return False
+
+    def _evict_expired(self):
+        """Убрать из простаивающих устаревшие соединения (вызывается под блокировкой)"""
+        now = time.monotonic()
+        expired = [conn for conn in self._idle if self._expired(conn, now)]
+        for conn in expired:
+            self._idle.remove(conn)
+        return expired
+
+    def acquire(self):
+        """Получить соединение из пула"""
+        deadline = time.monotonic() + self.acquire_timeout
+        while True:
+            with self._lock:
+                if self._closed:
+                    raise PoolTimeoutError("Пул соединений закрыт")
+
+                expired = self._evict_expired()
+                conn = None
+                create = False
+
+                while not conn and not create:
+                    if self._idle:
+                        # Берем последнее возвращенное соединение: оно "теплее" остальных
+                        conn = self._idle.pop()
+                    elif len(self._in_use) + self._opening < self.max_size:
+                        self._opening += 1
+                        create = True
+                    else:
+                        remaining = deadline - time.monotonic()
+                        if remaining <= 0:
+                            raise PoolTimeoutError("Нет свободных соединений в пуле")
+                        self._available.wait(remaining)
+                        expired.extend(self._evict_expired())
+
+                if conn:
+                    self._in_use.add(conn)
+
+            for old in expired:
+                old.close()
+
+            if create:
+                try:
+                    conn = PooledConnection(self.factory())
+                except Exception:
+                    with self._lock:
+                        self._opening -= 1
+                        self._available.notify()
+                    raise
+                with self._lock:
+                    self._opening -= 1
+                    self._in_use.add(conn)
+            elif self._needs_validation(conn) and not self._check(conn):
+                self._discard(conn)
+                continue
+
+            conn.uses += 1
+            return conn
+
+    def _needs_validation(self, conn):
+        """Проверять соединение не чаще одного раза в validate_interval секунд простоя"""
+        if self.validate is None:
+            return False
+        return conn.idle_time(time.monotonic()) >= self.validate_interval
+
+    def _check(self, conn):
+        try:
+            return bool(self.validate(conn))
+        except Exception:
+            return False
+
+    def _discard(self, conn):
+        with self._lock:
+            self._in_use.discard(conn)
+            self._available.notify()
+        conn.close()
+
+    def discard_idle(self):
+        """Закрыть все простаивающие соединения (например, после обрыва связи с сервером)"""
+        with self._lock:
+            idle = list(self._idle)
+            self._idle.clear()
+        for conn in idle:
+            conn.close()
+
+    def release(self, conn, broken=False):
+        """Вернуть соединение в пул"""
+        if not broken:
+            # Незавершенная транзакция не должна попасть к следующему владельцу
+            try:
+                conn.raw.rollback()
+            except Exception:
+                broken = True
+
+        if broken:
+            conn.healthy = False
+            self._discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._lock:
+            self._in_use.discard(conn)
+            if self._closed or self._expired(conn, conn.last_used):
+                conn.healthy = False
+            else:
+                self._idle.append(conn)
+            self._available.notify()
+
+        if not conn.healthy:
+            conn.close()
+
+    @contextmanager
+    def connection(self):
+        """Взять соединение на время блока with"""
+        conn = self.acquire()
+        try:
+            yield conn.raw
+        except Exception:
+            self.release(conn, broken=not conn.healthy)
+            raise
+        else:
+            self.release(conn)
+
+    def close(self):
+        """Закрыть все простаивающие соединения и запретить выдачу новых"""
+        with self._lock:
+            self._closed = True
+            idle = list(self._idle)
+            self._idle.clear()
+            self._available.notify_all()
+        for conn in idle:
+            conn.close()
@@ -0,0 +1,104 @@
+from bisect import bisect_left
+
+
+def _longest_increasing_run(positions):
+    """Индексы элементов, образующих наибольшую возрастающую подпоследовательность"""
+    tails = []        # последние значения подпоследовательностей каждой длины
+    tail_indexes = []
+    previous = [-1] * len(positions)
+
+    for i, value in enumerate(positions):
+        length = bisect_left(tails, value)
+        if length == len(tails):
+            tails.append(value)
+            tail_indexes.append(i)
+        else:
+            tails[length] = value
+            tail_indexes[length] = i
+        previous[i] = tail_indexes[length - 1] if length > 0 else -1
+
+    result = set()
+    i = tail_indexes[-1] if tail_indexes else -1
+    while i != -1:
+        result.add(i)
+        i = previous[i]
+    return result
+
+
+class TreeReconciler:
+    """Приведение содержимого ttk.Treeview к новому набору строк по ключу.
+
+    Вместо удаления всех элементов и повторной вставки вычисляются
+    вставки, обновления, удаления и перемещения относительно текущего
+    содержимого, и в виджет отправляются только они. Элементы, которые
+    остались на месте, не трогаются, поэтому сохраняются выделение
+    и позиция прокрутки.
+    """
+
+    def __init__(self, tree, key=lambda row: row[0], format_row=tuple):
+        self.tree = tree
+        self.key = key
+        self.format_row = format_row
+        # Значения, последними записанные в каждый элемент
+        self.values = {}
+
+    def apply(self, rows):
+        """Применить новый набор строк, вернуть число выполненных операций"""
+        stats = {'inserted': 0, 'updated': 0, 'deleted': 0, 'moved': 0}
+        tree = self.tree
+
+        desired = []
+        new_values = {}
+        for row in rows:
+            iid = str(self.key(row))
+            if iid not in new_values:
+                desired.append(iid)
+            new_values[iid] = tuple(self.format_row(row))
+
+        current = list(tree.get_children())
+        deleted = [iid for iid in current if iid not in new_values]
+        if deleted:
+            tree.delete(*deleted)
+            for iid in deleted:
+                self.values.pop(iid, None)
+            stats['deleted'] = len(deleted)
+
+        order = [iid for iid in current if iid in new_values]
+        position = {iid: i for i, iid in enumerate(order)}
+
+        # Элементы, уже стоящие в правильном относительном порядке, не перемещаются
+        existing = [iid for iid in desired if iid in position]
+        stable_indexes = _longest_increasing_run([position[iid] for iid in existing])
+        stable = {existing[i] for i in stable_indexes}
+
+        predecessor = None
+        for iid in desired:
+            if iid not in stable:
+                # Ставим элемент сразу за его предшественником в новом порядке
+                if iid in position:
+                    order.remove(iid)
+                target = order.index(predecessor) + 1 if predecessor is not None else 0
+                order.insert(target, iid)
+
+                if iid in position:
+                    tree.detach(iid)
+                    tree.move(iid, '', target)
+                    stats['moved'] += 1
+                else:
+                    tree.insert('', target, iid=iid, values=new_values[iid])
+                    self.values[iid] = new_values[iid]
+                    stats['inserted'] += 1
+
+            if self.values.get(iid) != new_values[iid]:
+                tree.item(iid, values=new_values[iid])
+                self.values[iid] = new_values[iid]
+                stats['updated'] += 1
+
+            predecessor = iid
+
+        return stats
+
+    def clear(self):
+        """Удалить все элементы"""
+        self.tree.delete(*self.tree.get_children())
+        self.values = {}
@@ -0,0 +1,468 @@
+"""Схема базы AutoTradeCenter: миграции для SQL Server и SQLite.
+
+Миграция - номер версии, описание и шаги для каждого диалекта (по имени
+хранилища из backends.py). Примененные версии записываются в таблицу
+SchemaVersion; upgrade выполняет недостающие миграции по порядку, каждую
+в своей транзакции. Шаги принимают уже существующую базу (IF OBJECT_ID
+... IS NULL, IF NOT EXISTS), поэтому база, созданная до миграций,
+доводится до текущей версии без потери данных.
+
+SQLite обновляется сам при первом соединении; SQL Server - командой
+
+    python schema.py status     # текущая и последняя версии
+    python schema.py upgrade    # применить недостающие миграции
+
+План выполнения запросов (EXPLAIN QUERY PLAN на SQLite, SHOWPLAN_XML на
+SQL Server) разбирает query_plan, а find_scans находит в нем полные
+просмотры таблиц (см. benchmarks/query_plan_check.py).
+"""
+import argparse
+import re
+import xml.etree.ElementTree as ElementTree
+
+TABLES = ('Cars', 'Clients', 'Employees', 'Sales', 'PurchaseRequests', 'SalesSummary')
+
+SQLSERVER_TABLES = [
+    """
+    IF OBJECT_ID('Cars', 'U') IS NULL
+    CREATE TABLE Cars (
+        CarID INT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Cars PRIMARY KEY,
+        Brand NVARCHAR(100) NOT NULL,
+        Model NVARCHAR(100) NOT NULL,
+        Year INT NULL,
+        Color NVARCHAR(50) NULL,
+        Price DECIMAL(18, 2) NULL CONSTRAINT CK_Cars_Price CHECK (Price >= 0),
+        Status NVARCHAR(50) NOT NULL CONSTRAINT DF_Cars_Status DEFAULT N'В наличии'
+    )
+    """,
+    """
+    IF OBJECT_ID('Clients', 'U') IS NULL
+    CREATE TABLE Clients (
+        ClientID INT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Clients PRIMARY KEY,
+        FirstName NVARCHAR(100) NOT NULL,
+        LastName NVARCHAR(100) NOT NULL,
+        Phone NVARCHAR(50) NULL,
+        Email NVARCHAR(200) NULL,
+        Username NVARCHAR(100) NOT NULL,
+        PasswordHash NVARCHAR(64) NOT NULL
+    )
+    """,
+    """
+    IF OBJECT_ID('Employees', 'U') IS NULL
+    CREATE TABLE Employees (
+        EmployeeID INT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Employees PRIMARY KEY,
+        FirstName NVARCHAR(100) NOT NULL,
+        LastName NVARCHAR(100) NOT NULL,
+        Position NVARCHAR(100) NULL,
+        Phone NVARCHAR(50) NULL,
+        Email NVARCHAR(200) NULL,
+        Username NVARCHAR(100) NOT NULL,
+        PasswordHash NVARCHAR(64) NOT NULL,
+        Role NVARCHAR(20) NOT NULL CONSTRAINT DF_Employees_Role DEFAULT N'Manager'
+    )
+    """,
+    """
+    IF OBJECT_ID('Sales', 'U') IS NULL
+    CREATE TABLE Sales (
+        SaleID INT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_Sales PRIMARY KEY,
+        CarID INT NOT NULL CONSTRAINT FK_Sales_Cars REFERENCES Cars (CarID),
+        ClientID INT NOT NULL CONSTRAINT FK_Sales_Clients REFERENCES Clients (ClientID),
+        EmployeeID INT NOT NULL CONSTRAINT FK_Sales_Employees REFERENCES Employees (EmployeeID),
+        SaleDate DATETIME NOT NULL CONSTRAINT DF_Sales_SaleDate DEFAULT GETDATE(),
+        SalePrice DECIMAL(18, 2) NOT NULL CONSTRAINT CK_Sales_SalePrice CHECK (SalePrice >= 0)
+    )
+    """,
+    """
+    IF OBJECT_ID('PurchaseRequests', 'U') IS NULL
+    CREATE TABLE PurchaseRequests (
+        RequestID INT IDENTITY(1, 1) NOT NULL CONSTRAINT PK_PurchaseRequests PRIMARY KEY,
+        ClientID INT NOT NULL CONSTRAINT FK_PurchaseRequests_Clients REFERENCES Clients (ClientID),
+        CarID INT NULL CONSTRAINT FK_PurchaseRequests_Cars REFERENCES Cars (CarID),
+        Brand NVARCHAR(100) NULL,
+        Model NVARCHAR(100) NULL,
+        MaxPrice DECIMAL(18, 2) NULL,
+        RequestDate DATETIME NOT NULL CONSTRAINT DF_PurchaseRequests_RequestDate DEFAULT GETDATE(),
+        Status NVARCHAR(50) NOT NULL CONSTRAINT DF_PurchaseRequests_Status DEFAULT N'Рассматривается'
+    )
+    """,
+    """
+    IF OBJECT_ID('SalesSummary', 'U') IS NULL
+    CREATE TABLE SalesSummary (
+        SaleMonth CHAR(7) NOT NULL,
+        Brand NVARCHAR(100) NOT NULL,
+        Model NVARCHAR(100) NOT NULL,
+        EmployeeID INT NOT NULL,
+        Units INT NOT NULL,
+        Revenue DECIMAL(18, 2) NOT NULL,
+        CONSTRAINT PK_SalesSummary PRIMARY KEY (SaleMonth, Brand, Model, EmployeeID)
+    )
+    """,
+]
+
+SQLITE_TABLES = [
+    """
+    CREATE TABLE IF NOT EXISTS Cars (
+        CarID INTEGER PRIMARY KEY,
+        Brand TEXT NOT NULL,
+        Model TEXT NOT NULL,
+        Year INTEGER,
+        Color TEXT,
+        Price REAL CHECK (Price >= 0),
+        Status TEXT NOT NULL DEFAULT 'В наличии'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Clients (
+        ClientID INTEGER PRIMARY KEY,
+        FirstName TEXT NOT NULL,
+        LastName TEXT NOT NULL,
+        Phone TEXT,
+        Email TEXT,
+        Username TEXT NOT NULL,
+        PasswordHash TEXT NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Employees (
+        EmployeeID INTEGER PRIMARY KEY,
+        FirstName TEXT NOT NULL,
+        LastName TEXT NOT NULL,
+        Position TEXT,
+        Phone TEXT,
+        Email TEXT,
+        Username TEXT NOT NULL,
+        PasswordHash TEXT NOT NULL,
+        Role TEXT NOT NULL DEFAULT 'Manager'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS Sales (
+        SaleID INTEGER PRIMARY KEY,
+        CarID INTEGER NOT NULL REFERENCES Cars (CarID),
+        ClientID INTEGER NOT NULL REFERENCES Clients (ClientID),
+        EmployeeID INTEGER NOT NULL REFERENCES Employees (EmployeeID),
+        SaleDate TEXT NOT NULL DEFAULT (date('now')),
+        SalePrice REAL NOT NULL CHECK (SalePrice >= 0)
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS PurchaseRequests (
+        RequestID INTEGER PRIMARY KEY,
+        ClientID INTEGER NOT NULL REFERENCES Clients (ClientID),
+        CarID INTEGER REFERENCES Cars (CarID),
+        Brand TEXT,
+        Model TEXT,
+        MaxPrice REAL,
+        RequestDate TEXT NOT NULL DEFAULT (date('now')),
+        Status TEXT NOT NULL DEFAULT 'Рассматривается'
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS SalesSummary (
+        SaleMonth TEXT NOT NULL,
+        Brand TEXT NOT NULL,
+        Model TEXT NOT NULL,
+        EmployeeID INTEGER NOT NULL,
+        Units INTEGER NOT NULL,
+        Revenue REAL NOT NULL,
+        PRIMARY KEY (SaleMonth, Brand, Model, EmployeeID)
+    ) WITHOUT ROWID
+    """,
+]
+
+# Продажи, сгруппированные так же, как строки сводки SalesSummary
+SALES_ROLLUP_SQL = """
+    SELECT {month} AS SaleMonth, c.Brand, c.Model, s.EmployeeID,
+           COUNT(*) AS Units, SUM(s.SalePrice) AS Revenue
+    FROM Sales s
+    JOIN Cars c ON c.CarID = s.CarID
+    {where}
+    GROUP BY {month}, c.Brand, c.Model, s.EmployeeID
+"""
+
+# Месяц продажи в виде 'ГГГГ-ММ' (то же, что Backend.month('s.SaleDate'))
+SALES_MONTH = {
+    'sqlserver': "CONVERT(CHAR(7), s.SaleDate, 120)",
+    'sqlite': "substr(s.SaleDate, 1, 7)",
+}
+
+
+def fill_sales_summary(dialect):
+    """Заполнить пустую сводку по Sales.
+
+    Сводка, созданная в базе с продажами, иначе считала бы только новые
+    продажи; заполненную сводку шаг не трогает.
+    """
+    rollup = SALES_ROLLUP_SQL.format(month=SALES_MONTH[dialect],
+                                     where="WHERE NOT EXISTS (SELECT 1 FROM SalesSummary)")
+    return f"INSERT INTO SalesSummary (SaleMonth, Brand, Model, EmployeeID, Units, Revenue)\n{rollup}"
+
+
+# Индексы под запросы Database: (имя, таблица, ключ, включенные колонки, уникальный).
+# Включенные колонки делают индекс покрывающим: строку таблицы читать не нужно.
+# Индексы Cars узкие: add_cars и импорт платят за каждый индекс при записи,
+# а выборки автомобилей идут страницами по 100-200 строк.
+INDEXES = [
+    # get_available_cars, get_available_cars_by_model, query_cars(status=...), подбор заявок
+    ('IX_Cars_Status_Brand_Model', 'Cars', ['Status', 'Brand', 'Model'], [], False),
+    # query_cars и get_cars_page с фильтром по марке или сортировкой по ней
+    ('IX_Cars_Brand_Model', 'Cars', ['Brand', 'Model'], [], False),
+    # Сортировка списка автомобилей по цене
+    ('IX_Cars_Price', 'Cars', ['Price'], [], False),
+    # get_client_sales (по дате), delete_client
+    ('IX_Sales_ClientID', 'Sales', ['ClientID', 'SaleDate'], ['CarID', 'EmployeeID', 'SalePrice'], False),
+    # delete_car, перенос продаж автомобиля в сводке (update_car)
+    ('IX_Sales_CarID', 'Sales', ['CarID'], [], False),
+    # delete_employee
+    ('IX_Sales_EmployeeID', 'Sales', ['EmployeeID'], [], False),
+    # get_all_purchase_requests(client_id), delete_client
+    ('IX_PurchaseRequests_ClientID', 'PurchaseRequests', ['ClientID'], [], False),
+    # delete_car: проверка внешнего ключа заявок на автомобиль
+    ('IX_PurchaseRequests_CarID', 'PurchaseRequests', ['CarID'], [], False),
+    # Открытые заявки для подбора
+    ('IX_PurchaseRequests_Status', 'PurchaseRequests', ['Status'], ['Brand', 'Model', 'MaxPrice'], False),
+]
+
+# Уникальность логинов - отдельная миграция: в базах, созданных до миграций,
+# она не проверялась, и повторы нужно сначала разобрать вручную.
+# Те же индексы обслуживают login_user и register_user.
+UNIQUE_INDEXES = [
+    ('UX_Clients_Username', 'Clients', ['Username'], ['PasswordHash', 'FirstName', 'LastName'], True),
+    ('UX_Employees_Username', 'Employees', ['Username'], ['PasswordHash', 'FirstName', 'LastName', 'Role'], True),
+]
+
+
+def check_unique_usernames(cursor):
+    """Остановить миграцию, если у клиентов или сотрудников повторяются логины"""
+    problems = []
+    for table in ('Clients', 'Employees'):
+        duplicates = cursor.execute(f"""
+            SELECT Username, COUNT(*) FROM {table}
+            GROUP BY Username
+            HAVING COUNT(*) > 1
+            ORDER BY Username
+        """).fetchall()
+        if duplicates:
+            listed = ', '.join(f"{username} ({count})" for username, count in duplicates[:20])
+            more = f" и еще {len(duplicates) - 20}" if len(duplicates) > 20 else ""
+            problems.append(f"{table}: {listed}{more}")
+    if problems:
+        raise RuntimeError("Повторяющиеся логины, уникальный индекс не создан. "
+                           "Переименуйте или удалите повторы и повторите upgrade. " + '; '.join(problems))
+
+
+def sqlserver_index(name, table, key, include, unique):
+    """CREATE INDEX для SQL Server, если индекса еще нет"""
+    columns = ', '.join(key)
+    included = f" INCLUDE ({', '.join(include)})" if include else ""
+    return f"""
+        IF NOT EXISTS (SELECT 1 FROM sys.indexes WHERE name = '{name}' AND object_id = OBJECT_ID('{table}'))
+        CREATE {'UNIQUE ' if unique else ''}INDEX {name} ON {table} ({columns}){included}
+    """
+
+
+def sqlite_index(name, table, key, include, unique):
+    """CREATE INDEX для SQLite: включенные колонки становятся хвостом ключа.
+
+    У уникального индекса хвост изменил бы смысл уникальности, поэтому
+    он остается только по ключу.
+    """
+    columns = key if unique else key + include
+    return (f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} "
+            f"ON {table} ({', '.join(columns)})")
+
+
+# (версия, описание, {хранилище: [шаги]}); шаг - текст SQL или функция step(cursor)
+MIGRATIONS = [
+    (1, "Таблицы, первичные и внешние ключи, ограничения", {
+        'sqlserver': SQLSERVER_TABLES + [fill_sales_summary('sqlserver')],
+        'sqlite': SQLITE_TABLES + [fill_sales_summary('sqlite')],
+    }),
+    (2, "Покрывающие индексы под запросы Database", {
+        'sqlserver': [sqlserver_index(*index) for index in INDEXES],
+        'sqlite': [sqlite_index(*index) for index in INDEXES],
+    }),
+    (3, "Уникальные логины клиентов и сотрудников", {
+        'sqlserver': [check_unique_usernames] + [sqlserver_index(*index) for index in UNIQUE_INDEXES],
+        'sqlite': [check_unique_usernames] + [sqlite_index(*index) for index in UNIQUE_INDEXES],
+    }),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+VERSION_TABLE = {
+    'sqlserver': """
+        IF OBJECT_ID('SchemaVersion', 'U') IS NULL
+        CREATE TABLE SchemaVersion (
+            Version INT NOT NULL CONSTRAINT PK_SchemaVersion PRIMARY KEY,
+            Description NVARCHAR(200) NOT NULL,
+            AppliedAt DATETIME NOT NULL CONSTRAINT DF_SchemaVersion_AppliedAt DEFAULT GETDATE()
+        )
+    """,
+    'sqlite': """
+        CREATE TABLE IF NOT EXISTS SchemaVersion (
+            Version INTEGER PRIMARY KEY,
+            Description TEXT NOT NULL,
+            AppliedAt TEXT NOT NULL DEFAULT (datetime('now'))
+        )
+    """,
+}
+
+
+def current_version(conn, dialect):
+    """Номер последней примененной миграции (0 - схема не создавалась)"""
+    cursor = conn.cursor()
+    cursor.execute(VERSION_TABLE[dialect])
+    conn.commit()
+    return _applied_version(cursor)
+
+
+def _applied_version(cursor):
+    return cursor.execute("SELECT MAX(Version) FROM SchemaVersion").fetchone()[0] or 0
+
+
+def upgrade(conn, dialect, target=LATEST_VERSION):
+    """Применить миграции после текущей версии до target, вернуть список примененных версий.
+
+    conn - соединение в стиле pyodbc (cursor().execute(sql, *params)).
+    Каждая миграция выполняется в своей транзакции вместе с записью в SchemaVersion.
+    """
+    applied = []
+    version = current_version(conn, dialect)
+    for number, description, steps in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        cursor = conn.cursor()
+        try:
+            if dialect == 'sqlite':
+                # sqlite3 не открывает транзакцию перед DDL сам; IMMEDIATE
+                # не дает двум соединениям применять миграцию одновременно
+                cursor.execute("BEGIN IMMEDIATE")
+                if _applied_version(cursor) >= number:
+                    conn.rollback()
+                    continue
+            for step in steps[dialect]:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute("INSERT INTO SchemaVersion (Version, Description) VALUES (?, ?)", number, description)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        applied.append(number)
+    return applied
+
+
+# Физические операторы SHOWPLAN, читающие таблицу или индекс целиком
+SQLSERVER_SCAN_OPERATORS = {'Table Scan', 'Clustered Index Scan', 'Index Scan'}
+
+SHOWPLAN_NAMESPACE = '{http://schemas.microsoft.com/sqlserver/2004/07/showplan}'
+
+# Таблица и ее псевдоним в FROM/JOIN (SQLite пишет в плане псевдоним)
+_TABLE_ALIAS = re.compile(r'\b(?:FROM|JOIN|UPDATE|INTO)\s+(\w+)(?:\s+(?:AS\s+)?(?!(?:ON|WHERE|JOIN|LEFT|INNER|'
+                          r'CROSS|ORDER|GROUP|SET|VALUES|WITH|LIMIT|OUTPUT|SELECT)\b)(\w+))?', re.IGNORECASE)
+
+
+def _aliases(sql):
+    aliases = {}
+    for table, alias in _TABLE_ALIAS.findall(sql):
+        aliases[table] = table
+        if alias:
+            aliases[alias] = table
+    return aliases
+
+
+def query_plan(conn, dialect, sql, params=()):
+    """План запроса: список (таблица, операция, индекс или None).
+
+    Операция - 'scan' (полный просмотр таблицы или индекса), 'search'
+    (поиск по ключу) или 'sort' (сортировка результата, таблица пустая).
+    На SQL Server запрос не выполняется: план возвращает SET SHOWPLAN_XML.
+    """
+    cursor = conn.cursor()
+    steps = []
+    if dialect == 'sqlite':
+        aliases = _aliases(sql)
+        for row in cursor.execute(f"EXPLAIN QUERY PLAN {sql}", *params).fetchall():
+            detail = row[-1]
+            words = detail.split()
+            index = re.search(r'USING (?:COVERING )?INDEX (\w+)|USING (INTEGER )?PRIMARY KEY', detail)
+            index = index and (index.group(1) or 'PRIMARY KEY')
+            if words[0] in ('SCAN', 'SEARCH'):
+                # Подзапросы (SCAN d) в таблицы схемы не разворачиваются
+                steps.append((aliases.get(words[1], words[1]), words[0].lower(), index))
+            elif detail.startswith('USE TEMP B-TREE FOR ORDER BY'):
+                steps.append(('', 'sort', None))
+        return steps
+
+    cursor.execute("SET SHOWPLAN_XML ON")
+    try:
+        cursor.execute(sql, *params)
+        plans = []
+        while True:
+            plans.extend(row[0] for row in cursor.fetchall())
+            if not cursor.nextset():
+                break
+    finally:
+        cursor.execute("SET SHOWPLAN_XML OFF")
+    for plan in plans:
+        for relop in ElementTree.fromstring(plan).iter(f'{SHOWPLAN_NAMESPACE}RelOp'):
+            operator = relop.get('PhysicalOp')
+            if operator == 'Sort':
+                steps.append(('', 'sort', None))
+                continue
+            target = relop.find(f'./*/{SHOWPLAN_NAMESPACE}Object')
+            if target is None:
+                continue
+            table = target.get('Table', '').strip('[]')
+            index = target.get('Index', '').strip('[]') or None
+            steps.append((table, 'scan' if operator in SQLSERVER_SCAN_OPERATORS else 'search', index))
+    return steps
+
+
+def find_scans(sql, steps):
+    """Полные просмотры таблиц схемы, которых запрос мог бы избежать.
+
+    Запрос без WHERE читает таблицу целиком намеренно (get_all_*). Страница
+    (LIMIT или TOP) может идти просмотром по порядку индекса - тогда
+    читается только limit строк; если же результат сортируется, просмотр
+    проходит всю таблицу.
+    """
+    scans = [(table, index) for table, operation, index in steps
+             if operation == 'scan' and table in TABLES]
+    if re.search(r'\b(LIMIT|TOP)\b', sql, re.IGNORECASE):
+        return scans if any(operation == 'sort' for _, operation, _ in steps) else []
+    if not re.search(r'\bWHERE\b', sql, re.IGNORECASE):
+        return []
+    return scans
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('status', 'upgrade'))
+    parser.add_argument('--target', type=int, default=LATEST_VERSION, help="версия, до которой обновить схему")
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database()
+    try:
+        if not db.ensure_connection():
+            raise SystemExit("Нет соединения с базой данных")
+        dialect = db.backend.name
+        if args.command == 'status':
+            version = db._run(lambda conn: current_version(conn, dialect))
+            print(f"Версия схемы: {version}, последняя: {LATEST_VERSION}")
+            for number, description, _ in MIGRATIONS:
+                print(f"  {'+' if number <= version else ' '} {number}. {description}")
+        else:
+            applied = db._run(lambda conn: upgrade(conn, dialect, args.target))
+            print(f"Применены миграции: {', '.join(map(str, applied))}" if applied else "Схема уже актуальна")
+    finally:
+        db.close()
+
+
+if __name__ == '__main__':
+    main()
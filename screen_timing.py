@@ -0,0 +1,164 @@
+"""Замеры экранов приложения: сколько проходит от перехода до данных.
+
+Навигация начинается с внешнего вызова show_*/refresh_* (вложенные
+вызовы в нее входят) и заканчивается, когда выполнены все фоновые
+запросы, запущенные с этого экрана. Время делится на фазы:
+
+    build    - построение виджетов (синхронная часть show_*/refresh_*)
+    db       - запросы в рабочих потоках (run_in_background)
+    fetch    - дочитывание строк источника при отрисовке (в потоке Tk)
+    format   - форматирование строк таблиц (format_row)
+    populate - вставка и обновление элементов Treeview
+
+total - от начала навигации до завершения последнего запроса. db идет
+параллельно с остальными фазами, поэтому сумма фаз может быть больше total.
+"""
+import functools
+import statistics
+import threading
+import time
+from collections import deque
+
+PHASES = ('build', 'db', 'fetch', 'format', 'populate')
+
+
+class Navigation:
+    """Замер одного перехода на экран"""
+
+    def __init__(self, screen):
+        self.screen = screen
+        self.started = time.perf_counter()
+        self.times = dict.fromkeys(PHASES, 0.0)
+        self.rows = 0
+        self.pending = 0
+        self.total = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.total is not None
+
+    def add(self, phase, seconds):
+        # db добавляется из рабочих потоков
+        with self._lock:
+            self.times[phase] += seconds
+
+    def as_dict(self):
+        return {'screen': self.screen, 'total': self.total, 'rows': self.rows, **self.times}
+
+
+class ScreenTimer:
+    """Замеры навигаций по экранам; хранит последние history переходов.
+
+    Все методы, кроме обертки запроса из track(), вызываются из потока Tk.
+    on_finish(navigation) вызывается по завершении каждого перехода.
+    """
+
+    def __init__(self, history=500, on_finish=None):
+        self.history = deque(maxlen=history)
+        self.on_finish = on_finish
+        self.current = None
+        self.abandoned = 0
+        self._depth = 0
+
+    def instrument(self, obj, prefixes=('show_', 'refresh_'), exclude=()):
+        """Обернуть замером методы экрана obj с именами на prefixes"""
+        for name in dir(type(obj)):
+            if name.startswith(prefixes) and name not in exclude and callable(getattr(obj, name)):
+                setattr(obj, name, self.wrap(name, getattr(obj, name)))
+
+    def wrap(self, name, method):
+        @functools.wraps(method)
+        def wrapper(*args, **kwargs):
+            if self._depth:
+                return method(*args, **kwargs)
+            navigation = self._begin(name)
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self._depth -= 1
+                navigation.add('build', time.perf_counter() - started)
+                self._finish_if_done(navigation)
+        return wrapper
+
+    def _begin(self, screen):
+        if self.current is not None and not self.current.finished:
+            # Пользователь ушел раньше, чем экран загрузился
+            self.abandoned += 1
+        self.current = Navigation(screen)
+        return self.current
+
+    def _finish_if_done(self, navigation):
+        if navigation.finished or navigation.pending or self._depth:
+            return
+        navigation.total = time.perf_counter() - navigation.started
+        if navigation is self.current:
+            self.history.append(navigation)
+            if self.on_finish:
+                self.on_finish(navigation)
+
+    def track(self, func):
+        """Отметить фоновый запрос текущего экрана.
+
+        Возвращает (навигация, обертка func, замеряющая время в рабочем
+        потоке); по готовности результата нужно вызвать task_done(навигация).
+        """
+        navigation = self.current
+        if navigation is None or navigation.finished:
+            return None, func
+        navigation.pending += 1
+
+        @functools.wraps(func)
+        def timed(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                navigation.add('db', time.perf_counter() - started)
+        return navigation, timed
+
+    def task_done(self, navigation):
+        if navigation is None:
+            return
+        navigation.pending -= 1
+        self._finish_if_done(navigation)
+
+    def record_render(self, times, rows):
+        """Отрисовка таблицы: fetch, format и populate в секундах"""
+        navigation = self.current
+        if navigation is None or navigation.finished:
+            return  # прокрутка уже загруженного экрана
+        for phase, seconds in times.items():
+            navigation.add(phase, seconds)
+        navigation.rows = max(navigation.rows, rows)
+
+    def summary(self):
+        """Экран -> число переходов, медиана и p95 total, медианы фаз (в секундах)"""
+        by_screen = {}
+        for navigation in self.history:
+            by_screen.setdefault(navigation.screen, []).append(navigation)
+        result = {}
+        for screen, navigations in by_screen.items():
+            totals = sorted(navigation.total for navigation in navigations)
+            result[screen] = {
+                'count': len(navigations),
+                'total_p50': statistics.median(totals),
+                'total_p95': totals[min(len(totals) - 1, int(0.95 * len(totals)))],
+                **{phase: statistics.median(navigation.times[phase] for navigation in navigations)
+                   for phase in PHASES},
+            }
+        return result
+
+    def report(self):
+        """Сводка таблицей, самые медленные экраны сверху (время в мс)"""
+        summary = sorted(self.summary().items(), key=lambda item: item[1]['total_p50'], reverse=True)
+        lines = [f"Переходы по экранам (медианы), брошено до загрузки: {self.abandoned}",
+                 f"{'Экран':<32} {'раз':>5} {'total':>9} {'p95':>9} "
+                 + ' '.join(f"{phase:>9}" for phase in PHASES)]
+        for screen, s in summary:
+            lines.append(f"{screen[:32]:<32} {s['count']:>5} {s['total_p50'] * 1000:>9.1f} "
+                         f"{s['total_p95'] * 1000:>9.1f} "
+                         + ' '.join(f"{s[phase] * 1000:>9.1f}" for phase in PHASES))
+        return '\n'.join(lines)
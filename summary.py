@@ -0,0 +1,38 @@
+"""Сводка продаж (таблица SalesSummary) для панели руководителя.
+
+Продажи, оформленные приложением, попадают в сводку сразу, в той же
+транзакции. Продажи, внесенные в базу в обход приложения, требуют
+пересчета:
+
+    python summary.py rebuild   # пересчитать сводку по Sales
+    python summary.py verify    # сравнить сводку с полным пересчетом
+"""
+import argparse
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('command', choices=('rebuild', 'verify'))
+    args = parser.parse_args()
+
+    from database import Database
+
+    db = Database()
+    try:
+        if args.command == 'rebuild':
+            ok, message = db.rebuild_sales_summary()
+            print(message)
+        else:
+            ok, differences = db.verify_sales_summary()
+            for month, brand, model, employee_id, stored, expected in differences:
+                print(f"  {month} {brand} {model}, сотрудник {employee_id}: "
+                      f"в сводке {stored}, по продажам {expected}")
+            print("Сводка совпадает с продажами" if ok else f"Расхождений: {len(differences)}")
+    finally:
+        db.close()
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,24 @@
+"""Общие фикстуры: Database на временном файле SQLite."""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backends import SqliteBackend  # noqa: E402
+from database import Database  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'test.db')
+    database = Database(backend=SqliteBackend(path), cache_file=None, slow_query_log=None)
+    assert database.ensure_connection()
+    yield database
+    database.close()
+
+
+def car_id(db, brand, model):
+    """CarID последнего добавленного автомобиля этой марки и модели"""
+    return db._fetchone("SELECT MAX(CarID) FROM Cars WHERE Brand = ? AND Model = ?", brand, model)[0]
@@ -0,0 +1,6 @@
+def test_filter_values_without_snapshot(db):
+    for brand, color in [('Lada', 'Черный'), ('Kia', None), ('Lada', 'Белый'), ('Audi', 'Белый')]:
+        db.add_car(brand, 'Model', 2020, color, 1000)
+
+    assert db.get_car_brands() == ['Audi', 'Kia', 'Lada']
+    assert db.get_car_colors() == ['Белый', 'Черный']
@@ -0,0 +1,38 @@
+from identity import IdentityMap
+
+
+def test_least_recently_used_rows_are_evicted():
+    identity = IdentityMap(max_size=3)
+    identity.put_many('car', [(1, 'a'), (2, 'b'), (3, 'c')])
+    assert identity.get('car', 1) == (1, 'a')  # 1 становится самой свежей
+
+    identity.put('car', (4, 'd'))
+
+    assert identity.get('car', 2) is None
+    assert [identity.get('car', i) for i in (1, 3, 4)] == [(1, 'a'), (3, 'c'), (4, 'd')]
+    assert identity.stats()['size'] == 3
+    assert identity.stats()['evictions'] == 1
+
+
+def test_bulk_put_keeps_only_the_newest_rows():
+    identity = IdentityMap(max_size=100)
+    identity.put_many('client', [(i, f"client{i}") for i in range(1, 1001)])
+    assert identity.stats()['size'] == 100
+    assert identity.get('client', 1) is None
+    assert identity.get('client', 1000) == (1000, 'client1000')
+
+
+def test_writes_leave_no_per_entity_state():
+    identity = IdentityMap(max_size=10)
+    for car_id in range(1, 10001):
+        snapshot = identity.snapshot('car')
+        identity.put('car', (car_id, 'old'), snapshot)
+        identity.evict('car', car_id)
+    assert identity.stats()['size'] == 0
+    assert len(identity._kind_versions) == 1
+
+    # Запрос, начатый до записи, не кладет в карту старую строку
+    snapshot = identity.snapshot('car')
+    identity.evict('car', 1)
+    identity.put('car', (1, 'old'), snapshot)
+    assert identity.get('car', 1) is None
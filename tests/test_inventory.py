@@ -0,0 +1,55 @@
+import pytest
+
+from conftest import car_id
+from inventory import HAVE_NUMPY, InventorySnapshot
+from models import Car
+
+pytestmark = pytest.mark.skipif(not HAVE_NUMPY, reason="нужен numpy")
+
+
+def test_car_added_and_updated_between_refreshes_appears_once(db):
+    for i in range(3):
+        db.add_car('Ajax', f"Model {i}", 2018, 'Черный', 900 + i)
+    snapshot = InventorySnapshot(db)
+    snapshot.refresh()
+    assert len(snapshot) == 3
+
+    db.add_car('Zed', 'One', 2020, 'Белый', 1500)
+    new_id = car_id(db, 'Zed', 'One')
+    db.update_car(new_id, 'Zed', 'One', 2021, 'Белый', 1200, 'В наличии')
+    snapshot.refresh()
+
+    assert len(snapshot) == 4
+    assert len(set(snapshot.columns['car_id'].tolist())) == 4
+    ids = snapshot.query(brand='Zed')
+    assert list(ids) == [new_id]
+    assert snapshot.rows(ids)[0].price == 1200
+
+
+def test_load_rows_keeps_last_duplicate():
+    snapshot = InventorySnapshot()
+    snapshot.load_rows([Car(1, 'Zed', 'One', 2020, 'Белый', 1500.0, 'В наличии'),
+                        Car(1, 'Zed', 'One', 2020, 'Белый', 1200.0, 'В наличии')])
+    assert snapshot.columns['car_id'].tolist() == [1]
+    assert snapshot.columns['price'].tolist() == [1200.0]
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('sort_by', ['Year', 'Color', 'Price'])
+def test_null_values_sort_and_filter_like_query_cars(db, sort_by, descending):
+    def work(conn):
+        cursor = conn.cursor()
+        for i, (year, color, price) in enumerate([(2019, 'Белый', 700), (None, None, None), (2021, 'Черный', 500),
+                                                  (None, 'Белый', None), (2019, None, 500)]):
+            cursor.execute("INSERT INTO Cars (Brand, Model, Year, Color, Price) VALUES (?, ?, ?, ?, ?)",
+                           'Zed', f"Model {i}", year, color, price)
+        conn.commit()
+
+    db._run(work)
+    snapshot = InventorySnapshot(db)
+    snapshot.refresh()
+
+    expected = db.query_cars(sort_by=sort_by, descending=descending)
+    assert snapshot.rows(snapshot.query(sort_by, descending)) == expected
+    assert [car.year for car in snapshot.rows(snapshot.query(year_to=2020))] == [2019, 2019]
+    assert list(snapshot.query(price_to=600)) == [car.car_id for car in db.query_cars(price_to=600)]
@@ -0,0 +1,25 @@
+from conftest import car_id
+from matcher import RequestMatcher, match_key
+
+
+def test_car_added_and_updated_between_refreshes_counts_once(db):
+    db.register_user('Иван', 'Иванов', '+70000000000', 'ivan@example.com', 'ivan', 'secret', 'Client')
+    client_id = db._fetchone("SELECT ClientID FROM Clients WHERE Username = ?", 'ivan')[0]
+    db.add_car('Ajax', 'Two', 2018, 'Черный', 900)
+    db.add_purchase_request(client_id, car_id(db, 'Ajax', 'Two'), 'Zed', 'One', 2000)
+    request_id = db._fetchone("SELECT MAX(RequestID) FROM PurchaseRequests")[0]
+
+    matcher = RequestMatcher(db)
+    matcher.refresh()
+    assert matcher.match(request_id).count == 0
+
+    # Новый автомобиль попадает и в выборку CarID > последнего, и в перечитывание измененных
+    db.add_car('Zed', 'One', 2020, 'Белый', 1500)
+    new_id = car_id(db, 'Zed', 'One')
+    db.update_car(new_id, 'Zed', 'One', 2020, 'Белый', 1200, 'В наличии')
+    matcher.refresh()
+
+    assert matcher._stock[match_key('Zed', 'One')] == [(1200.0, new_id)]
+    match = matcher.match(request_id)
+    assert match.count == 1
+    assert match.best.price == 1200
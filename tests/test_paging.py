@@ -0,0 +1,48 @@
+import pytest
+
+from paging import seek_condition
+
+
+@pytest.fixture
+def cars(db):
+    prices = [None, 500, None, 700, 500, None, 900, 300]
+
+    def work(conn):
+        cursor = conn.cursor()
+        for i, price in enumerate(prices):
+            # add_car требует цену, а в базе она может быть NULL
+            cursor.execute("INSERT INTO Cars (Brand, Model, Year, Color, Price) VALUES (?, ?, ?, ?, ?)",
+                           'Zed', f"Model {i}", 2020, 'Белый', price)
+        conn.commit()
+
+    db._run(work)
+    return prices
+
+
+@pytest.mark.parametrize('descending', [False, True])
+@pytest.mark.parametrize('page_size', [1, 2, 3])
+def test_price_pages_include_null_prices(db, cars, descending, page_size):
+    expected = db.query_cars(sort_by='Price', descending=descending)
+    assert sum(car.price is None for car in expected) == 3
+
+    cursor = db.cars_cursor(page_size, 'Price', descending)
+    forward = list(cursor)
+    assert forward == expected
+
+    # Назад от последней страницы до первой
+    pages = [cursor.rows]
+    while True:
+        rows = cursor.previous()
+        if not rows:
+            break
+        pages.append(rows)
+    assert [car for page in reversed(pages) for car in page] == expected
+
+
+def test_seek_past_null_boundary():
+    condition, params = seek_condition(['Price', 'CarID'], [None, 5])
+    assert condition == "((Price IS NOT NULL) OR (Price IS NULL AND CarID > ?))"
+    assert params == [5]
+    condition, params = seek_condition(['Price', 'CarID'], [None, 5], descending=True)
+    assert condition == "((Price IS NULL AND CarID < ?))"
+    assert params == [5]
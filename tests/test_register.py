@@ -0,0 +1,49 @@
+from backends import SqliteBackend
+from database import Database
+
+
+class LostReply(Exception):
+    """Связь оборвалась после того, как сервер выполнил commit"""
+
+
+class FlakyBackend(SqliteBackend):
+    """SQLite, у которого первый commit записывается, но ответ теряется"""
+
+    def __init__(self, path):
+        super().__init__(path)
+        self.drop_next_reply = False
+
+    def connect(self, connection_string, timeout=None):
+        connection = super().connect(connection_string, timeout)
+        backend = self
+        commit = connection.commit
+
+        def flaky_commit():
+            commit()
+            if backend.drop_next_reply:
+                backend.drop_next_reply = False
+                raise LostReply()
+
+        connection.commit = flaky_commit
+        return connection
+
+    def is_disconnect_error(self, error):
+        return isinstance(error, LostReply)
+
+
+def test_retry_after_lost_commit_reply_reports_success(tmp_path):
+    backend = FlakyBackend(str(tmp_path / 'test.db'))
+    db = Database(backend=backend, cache_file=None, slow_query_log=None)
+    try:
+        assert db.ensure_connection()
+        backend.drop_next_reply = True
+        assert db.register_user('Иван', 'Иванов', '+70000000000', 'ivan@example.com', 'ivan',
+                                'secret', 'Client') == (True, "Регистрация успешна")
+        assert db.reconnects == 1
+        assert db.login_user('ivan', 'secret', 'Client')
+
+        # Другой человек с тем же логином по-прежнему получает отказ
+        assert db.register_user('Петр', 'Петров', '+70000000001', 'petr@example.com', 'ivan',
+                                'other', 'Client') == (False, "Логин уже занят")
+    finally:
+        db.close()
@@ -0,0 +1,48 @@
+import sqlite3
+
+import pytest
+
+import schema
+from backends import _SqliteConnection
+
+
+def test_duplicate_usernames_stop_unique_migration(tmp_path):
+    conn = _SqliteConnection(sqlite3.connect(str(tmp_path / 'old.db')))
+    assert schema.upgrade(conn, 'sqlite', target=2) == [1, 2]
+    cursor = conn.cursor()
+    for _ in range(2):
+        cursor.execute("INSERT INTO Clients (FirstName, LastName, Username, PasswordHash) VALUES (?, ?, ?, ?)",
+                       'Иван', 'Иванов', 'ivan', 'x')
+    conn.commit()
+
+    with pytest.raises(RuntimeError, match=r"Clients: ivan \(2\)"):
+        schema.upgrade(conn, 'sqlite')
+    assert schema.current_version(conn, 'sqlite') == 2
+
+    cursor.execute("UPDATE Clients SET Username = 'ivan2' WHERE ClientID = 2")
+    conn.commit()
+    assert schema.upgrade(conn, 'sqlite') == [3]
+    with pytest.raises(sqlite3.IntegrityError):
+        cursor.execute("INSERT INTO Clients (FirstName, LastName, Username, PasswordHash) VALUES (?, ?, ?, ?)",
+                       'Иван', 'Иванов', 'ivan', 'x')
+    conn.close()
+
+
+def test_first_migration_fills_summary_from_existing_sales(tmp_path):
+    # База, созданная до миграций: таблицы есть, SchemaVersion и сводки нет
+    conn = _SqliteConnection(sqlite3.connect(str(tmp_path / 'old.db')))
+    cursor = conn.cursor()
+    for step in schema.SQLITE_TABLES[:-1]:
+        cursor.execute(step)
+    cursor.execute("INSERT INTO Cars (Brand, Model, Price) VALUES ('Lada', 'Vesta', 100)")
+    cursor.execute("INSERT INTO Clients (FirstName, LastName, Username, PasswordHash) VALUES ('a', 'b', 'c', 'd')")
+    cursor.execute("INSERT INTO Employees (FirstName, LastName, Username, PasswordHash) VALUES ('a', 'b', 'c', 'd')")
+    for price in (100, 150):
+        cursor.execute("INSERT INTO Sales (CarID, ClientID, EmployeeID, SaleDate, SalePrice) "
+                       "VALUES (1, 1, 1, '2024-03-05', ?)", price)
+    conn.commit()
+
+    assert schema.upgrade(conn, 'sqlite') == [1, 2, 3]
+    rows = cursor.execute("SELECT SaleMonth, Brand, Model, EmployeeID, Units, Revenue FROM SalesSummary").fetchall()
+    assert rows == [('2024-03', 'Lada', 'Vesta', 1, 2, 250.0)]
+    conn.close()
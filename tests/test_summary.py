@@ -0,0 +1,22 @@
+from conftest import car_id
+
+
+def summary_keys(db):
+    return db._fetchall("SELECT Brand, Model, Units FROM SalesSummary ORDER BY Brand, Model")
+
+
+def test_emptied_summary_row_is_removed_and_others_kept(db):
+    db.register_user('Иван', 'Иванов', '+70000000000', 'ivan@example.com', 'ivan', 'secret', 'Client')
+    db.register_user('Петр', 'Петров', '+70000000001', 'petr@example.com', 'petr', 'secret', 'Manager', 'Менеджер')
+    client_id = db._fetchone("SELECT ClientID FROM Clients")[0]
+    employee_id = db._fetchone("SELECT EmployeeID FROM Employees")[0]
+    for model in ('One', 'Two'):
+        db.add_car('Zed', model, 2020, 'Белый', 1000)
+        assert db.create_sale_from_selection(client_id, car_id(db, 'Zed', model), employee_id, 1000)[0]
+    assert [tuple(row) for row in summary_keys(db)] == [('Zed', 'One', 1), ('Zed', 'Two', 1)]
+
+    # Перенос продажи на другую модель вычитает ее из строки One, и строка пустеет
+    db.update_car(car_id(db, 'Zed', 'One'), 'Zed', 'Three', 2020, 'Белый', 1000, 'Продано')
+
+    assert [tuple(row) for row in summary_keys(db)] == [('Zed', 'Three', 1), ('Zed', 'Two', 1)]
+    assert db.verify_sales_summary() == (True, [])
@@ -0,0 +1,418 @@
+from tkinter import messagebox, ttk
+import threading
+import time
+from itertools import islice
+from reconcile import TreeReconciler
+
+
+def _sort_key(index):
+    """Ключ сортировки по колонке, устойчивый к пустым значениям"""
+    return lambda row: (row[index] is None, row[index])
+
+
+class ListSource:
+    """Источник строк для VirtualTable из готового списка"""
+
+    def __init__(self, rows):
+        self.rows = rows if isinstance(rows, list) else list(rows)
+        self.complete = True
+
+    def count(self):
+        return len(self.rows)
+
+    def get(self, start, stop):
+        return self.rows[start:stop]
+
+    def loaded(self, start, stop):
+        """Уже прочитанные строки окна, без обращения к базе"""
+        return self.get(start, stop)
+
+    def load_all(self):
+        pass
+
+    def sort(self, index, descending=False):
+        self.rows.sort(key=_sort_key(index), reverse=descending)
+
+
+class IteratorSource(ListSource):
+    """Источник строк из генератора или постраничного курсора.
+
+    Строки читаются по мере прокрутки, с запасом buffer строк вперед,
+    поэтому первая страница показывается сразу, не дожидаясь всей выборки.
+    """
+
+    def __init__(self, iterable, buffer=500):
+        super().__init__([])
+        self.iterator = iter(iterable)
+        self.buffer = buffer
+        self.complete = False
+        # Строки могут дочитываться из рабочего потока (см. load_ahead)
+        self._lock = threading.Lock()
+
+    def _load(self, count):
+        with self._lock:
+            if self.complete or count <= 0:
+                return
+            chunk = list(islice(self.iterator, count))
+            self.rows.extend(chunk)
+            if len(chunk) < count:
+                self.complete = True
+
+    def preload(self, count):
+        """Прочитать первые count строк (удобно вызывать в рабочем потоке)"""
+        self.get(0, count)
+        return self
+
+    def load_ahead(self):
+        """Дочитать следующую порцию из buffer строк"""
+        self._load(self.buffer)
+        return self
+
+    def get(self, start, stop):
+        missing = stop - len(self.rows)
+        if missing > 0:
+            self._load(missing + self.buffer)
+        return self.rows[start:stop]
+
+    def loaded(self, start, stop):
+        return self.rows[start:stop]
+
+    def load_all(self):
+        with self._lock:
+            if not self.complete:
+                self.rows.extend(self.iterator)
+                self.complete = True
+
+    def sort(self, index, descending=False):
+        # Отсортировать можно только полностью прочитанную выборку
+        self.load_all()
+        super().sort(index, descending)
+
+
+class IndexedSource(ListSource):
+    """Источник строк по готовому списку ключей (например, CarID из снимка).
+
+    Строки собираются fetch_rows(keys) только для видимого окна.
+    """
+
+    def __init__(self, keys, fetch_rows):
+        self.keys = keys
+        self.fetch_rows = fetch_rows
+        self.complete = True
+
+    def count(self):
+        return len(self.keys)
+
+    def get(self, start, stop):
+        return self.fetch_rows(self.keys[start:stop])
+
+    def load_all(self):
+        pass
+
+    def sort(self, index, descending=False):
+        rows = self.fetch_rows(self.keys)
+        rows.sort(key=_sort_key(index), reverse=descending)
+        self.keys = [row[0] for row in rows]
+
+
+class VirtualTable(ttk.Frame):
+    """Таблица, в которой в Treeview существуют только видимые строки.
+
+    Данные берутся из источника (ListSource, IteratorSource), а при прокрутке
+    видимое окно заполняется заново, поэтому число элементов виджета не
+    зависит от размера выборки. Методы selection() и item() совместимы
+    с ttk.Treeview, так что обработчики кнопок работают с таблицей так же.
+    Если передан executor (BackgroundExecutor), источник читается только
+    в рабочем потоке: следующая порция дочитывается заранее, пока
+    пользователь прокручивает, а прокрутка за прочитанные строки, End и
+    сортировка всей выборки ждут чтения, не останавливая главный цикл.
+    """
+
+    # Обработчик замеров отрисовки всех таблиц: render_listener(times, rows),
+    # где times - секунды на fetch, format и populate (см. screen_timing)
+    render_listener = None
+
+    def __init__(self, parent, columns, widths=None, height=15, format_row=tuple,
+                 key=lambda row: row[0], on_sort=None, selectmode='browse', executor=None):
+        super().__init__(parent)
+        self.columns = columns
+        self.executor = executor
+        self._prefetching = None
+        self._loading = None
+        self._after_load = None
+        self.format_row = format_row
+        self.key = key
+        self.on_sort = on_sort
+        self.selectmode = selectmode
+
+        self.source = ListSource([])
+        self.offset = 0
+        self.visible = height
+        self.sort_state = (None, False)
+        self._visible_rows = {}
+        self._selected = {}
+        self.last_render = {}
+        self.last_render_times = {}
+        self._format_time = 0.0
+
+        self.tree = ttk.Treeview(self, columns=columns, show='headings', height=height,
+                                 selectmode=selectmode)
+        self.reconciler = TreeReconciler(self.tree, lambda row: self.key(row), self._format)
+        self.scrollbar = ttk.Scrollbar(self, orient="vertical", command=self._on_scrollbar)
+
+        widths = widths or {}
+        for index, col in enumerate(columns):
+            self.tree.heading(col, text=col, command=lambda i=index: self.sort_by(i))
+            self.tree.column(col, width=widths.get(col, 100))
+
+        self.scrollbar.pack(side='right', fill='y')
+        self.tree.pack(side='left', fill='both', expand=True)
+
+        style = ttk.Style()
+        self.row_height = int(style.lookup('Treeview', 'rowheight') or 20)
+
+        self.tree.bind('<Configure>', self._on_resize)
+        self.tree.bind('<<TreeviewSelect>>', self._on_select)
+        self.tree.bind('<MouseWheel>', self._on_mousewheel)
+        self.tree.bind('<Button-4>', lambda e: self._scroll_by(-3))
+        self.tree.bind('<Button-5>', lambda e: self._scroll_by(3))
+        self.tree.bind('<Up>', lambda e: self._move_selection(-1))
+        self.tree.bind('<Down>', lambda e: self._move_selection(1))
+        self.tree.bind('<Prior>', lambda e: self._scroll_by(-self.visible))
+        self.tree.bind('<Next>', lambda e: self._scroll_by(self.visible))
+        self.tree.bind('<Home>', lambda e: self._scroll_to(0))
+        self.tree.bind('<End>', self._on_end)
+
+    # --- источник данных ---
+
+    def set_source(self, source, keep_position=False):
+        """Показать строки из нового источника"""
+        self.source = source
+        if keep_position:
+            self.offset = self._clamp(self.offset)
+        else:
+            self.offset = 0
+            self.sort_state = (None, False)
+        self._render()
+
+    def set_rows(self, rows):
+        """Показать строки из списка"""
+        self.set_source(ListSource(rows))
+
+    def sort_by(self, index):
+        """Сортировка по колонке; повторный щелчок меняет направление"""
+        column, descending = self.sort_state
+        descending = not descending if column == index else False
+
+        def apply():
+            if self.on_sort is not None:
+                # Сортировка на стороне сервера: обработчик сам задает новый источник
+                self.on_sort(index, descending)
+            else:
+                self.source.sort(index, descending)
+            self.sort_state = (index, descending)
+            self.offset = 0
+            self._render()
+
+        # Отсортировать в памяти можно только полностью прочитанную выборку
+        self._load(None if self.on_sort is None else 0, apply)
+
+    def _load(self, stop, then):
+        """Дочитать источник до stop строк (None - целиком) и вызвать then() в потоке Tk.
+
+        С executor чтение идет в рабочем потоке. Пока порция читается, новые
+        запросы не ставятся в очередь: после нее выполняется последний then.
+        Чтение не привязано к поколению экрана (screen_bound=False): иначе
+        после смены экрана done не пришел бы и _loading остался бы занятым;
+        устаревший результат отбрасывает проверка источника.
+        """
+        source = self.source
+        if source.complete or (stop is not None and source.count() >= stop):
+            return then()
+        if self.executor is None:
+            if stop is None:
+                source.load_all()
+            else:
+                source.get(0, stop)
+            return then()
+
+        self._after_load = (stop, then)
+        if self._loading is source:
+            return None
+
+        def done(_):
+            self._loading = None
+            if not self.winfo_exists() or self.source is not source:
+                return
+            stop, then = self._after_load
+            self._after_load = None
+            self._load(stop, then)
+
+        def failed(error):
+            self._loading = self._after_load = None
+            if self.winfo_exists() and self.source is source:
+                messagebox.showerror("Ошибка", f"Ошибка обращения к базе данных: {error}", parent=self)
+
+        self._loading = source
+        if stop is None:
+            self.executor.submit(source.load_all, on_done=done, on_error=failed, screen_bound=False)
+        else:
+            self.executor.submit(source.get, 0, stop, on_done=done, on_error=failed, screen_bound=False)
+        return None
+
+    # --- совместимость с ttk.Treeview ---
+
+    def selection(self):
+        return tuple(self._selected)
+
+    def selected_rows(self):
+        """Исходные строки выбранных элементов, в том числе ушедших из окна"""
+        return list(self._selected.values())
+
+    def item(self, iid):
+        row = self._selected.get(iid) or self._visible_rows.get(iid)
+        return {'values': list(self.format_row(row)) if row is not None else ''}
+
+    def bind(self, sequence=None, func=None, add=None):
+        return self.tree.bind(sequence, func, add)
+
+    # --- прокрутка и отрисовка ---
+
+    def _total(self):
+        """Число строк для расчета полосы прокрутки"""
+        total = self.source.count()
+        if not self.source.complete:
+            # Еще не прочитанный хвост выборки
+            total += self.visible
+        return max(total, 1)
+
+    def _clamp(self, offset):
+        if self.executor is None:
+            self.source.get(offset, offset + self.visible)
+        last_start = max(self.source.count() - self.visible, 0)
+        return max(0, min(offset, last_start))
+
+    def _format(self, row):
+        started = time.perf_counter()
+        try:
+            return self.format_row(row)
+        finally:
+            self._format_time += time.perf_counter() - started
+
+    def _render(self):
+        started = time.perf_counter()
+        if self.executor is None:
+            rows = self.source.get(self.offset, self.offset + self.visible)
+        else:
+            # Недостающие строки дочитает _prefetch
+            rows = self.source.loaded(self.offset, self.offset + self.visible)
+        fetched = time.perf_counter()
+
+        # Элементы окна сопоставляются по ключу: при прокрутке на строку
+        # удаляется и вставляется по одному элементу, остальные не трогаются
+        self._format_time = 0.0
+        self.last_render = self.reconciler.apply(rows)
+        self.last_render_times = {
+            'fetch': fetched - started,
+            'format': self._format_time,
+            'populate': time.perf_counter() - fetched - self._format_time,
+        }
+        if VirtualTable.render_listener is not None:
+            VirtualTable.render_listener(self.last_render_times, len(rows))
+        self._visible_rows = {str(self.key(row)): row for row in rows}
+
+        visible_selected = [iid for iid in self._selected if iid in self._visible_rows]
+        self.tree.selection_set(visible_selected)
+        self._update_scrollbar()
+        self._prefetch()
+
+    def _prefetch(self):
+        """Дочитать источник в фоне, когда до конца прочитанных строк осталось мало"""
+        source = self.source
+        if self.executor is None or source.complete or self._prefetching is source:
+            return
+        if source.count() - (self.offset + self.visible) > getattr(source, 'buffer', 0) // 2:
+            return
+
+        def done(_):
+            if self._prefetching is source:
+                self._prefetching = None
+            if self.winfo_exists() and self.source is source:
+                if len(self._visible_rows) < self.visible and not self._loading:
+                    # Окно было показано не полностью
+                    self._render()
+                else:
+                    self._update_scrollbar()
+
+        self._prefetching = source
+        # Как и в _load, done должен прийти и после смены экрана
+        self.executor.submit(source.load_ahead, on_done=done, on_error=done, screen_bound=False)
+
+    def _update_scrollbar(self):
+        total = self._total()
+        first = self.offset / total
+        last = min((self.offset + self.visible) / total, 1.0)
+        self.scrollbar.set(first, last)
+
+    def _scroll_to(self, offset):
+        def scroll():
+            target = self._clamp(offset)
+            if target != self.offset:
+                self.offset = target
+                self._render()
+
+        self._load(offset + self.visible, scroll)
+        return "break"
+
+    def _scroll_by(self, delta):
+        return self._scroll_to(self.offset + delta)
+
+    def _on_scrollbar(self, action, value, unit=None):
+        if action == 'moveto':
+            self._scroll_to(int(float(value) * self._total()))
+        elif action == 'scroll':
+            step = self.visible if unit == 'pages' else 1
+            self._scroll_by(int(value) * step)
+
+    def _on_mousewheel(self, event):
+        return self._scroll_by(-3 if event.delta > 0 else 3)
+
+    def _on_end(self, event):
+        self._load(None, lambda: self._scroll_to(self.source.count()))
+        return "break"
+
+    def _on_resize(self, event):
+        visible = max(1, (event.height - self.row_height) // self.row_height)
+        if visible != self.visible:
+            self.visible = visible
+            self.offset = self._clamp(self.offset)
+            self._render()
+
+    def _on_select(self, event):
+        selected = {iid: self._visible_rows[iid] for iid in self.tree.selection()
+                    if iid in self._visible_rows}
+        if self.selectmode == 'browse':
+            # Пустой выбор возникает, когда выбранная строка ушла из окна
+            if selected:
+                self._selected = selected
+        else:
+            hidden = {iid: row for iid, row in self._selected.items() if iid not in self._visible_rows}
+            self._selected = {**hidden, **selected}
+
+    def _move_selection(self, delta):
+        """Перемещение выбора стрелками с прокруткой у края окна"""
+        order = list(self._visible_rows)
+        current = self.tree.focus() or (self.tree.selection() or (None,))[0]
+        if current not in self._visible_rows:
+            return None
+        position = order.index(current) + delta
+        if 0 <= position < len(order):
+            return None  # внутри окна стрелки обрабатывает сам Treeview
+
+        self._scroll_by(delta)
+        order = list(self._visible_rows)
+        if order:
+            iid = order[0] if delta < 0 else order[-1]
+            self.tree.selection_set(iid)
+            self.tree.focus(iid)
+        return "break"
@@ -0,0 +1,76 @@
+import queue
+from concurrent.futures import ThreadPoolExecutor
+
+
+class BackgroundExecutor:
+    """Выполнение запросов к базе данных в рабочих потоках.
+
+    Tk нельзя трогать из других потоков, поэтому результаты складываются
+    в очередь, а главный цикл забирает их через root.after и вызывает
+    обработчики уже в своем потоке. Задачи, привязанные к экрану
+    (screen_bound=True), запоминают поколение экрана: если пользователь
+    успел перейти на другой экран, их результат отбрасывается.
+    """
+
+    def __init__(self, root, max_workers=4, poll_interval=20):
+        self.root = root
+        self.poll_interval = poll_interval
+        self.generation = 0
+        self.pending = 0
+        self._results = queue.Queue()
+        self._polling = False
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='db-worker')
+
+    def new_generation(self):
+        """Отметить смену экрана: результаты запущенных ранее задач станут устаревшими"""
+        self.generation += 1
+
+    def submit(self, func, *args, on_done=None, on_error=None, screen_bound=True, **kwargs):
+        """Запустить func(*args, **kwargs) в рабочем потоке (вызывать из потока Tk)"""
+        generation = self.generation if screen_bound else None
+
+        def task():
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                self._results.put((generation, on_error, None, e))
+            else:
+                self._results.put((generation, on_done, result, None))
+
+        self.pending += 1
+        self._executor.submit(task)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_interval, self._poll)
+
+    def _poll(self):
+        """Передача готовых результатов обработчикам в потоке Tk"""
+        while True:
+            try:
+                generation, callback, result, error = self._results.get_nowait()
+            except queue.Empty:
+                break
+
+            self.pending -= 1
+            if generation is not None and generation != self.generation:
+                continue  # пользователь уже ушел с экрана
+
+            try:
+                if error is not None:
+                    if callback:
+                        callback(error)
+                    else:
+                        print(f"Ошибка фоновой задачи: {error}")
+                elif callback:
+                    callback(result)
+            except Exception as e:
+                print(f"Ошибка обработки результата фоновой задачи: {e}")
+
+        if self.pending > 0:
+            self.root.after(self.poll_interval, self._poll)
+        else:
+            self._polling = False
+
+    def shutdown(self):
+        """Остановить рабочие потоки, не дожидаясь завершения запросов"""
+        self._executor.shutdown(wait=False, cancel_futures=True)